@@ -1,7 +1,29 @@
-import os
+"""
+Market analysis over the listing archive.
+
+Every cycle appends the listings it parsed to the columnar archive (see
+archive.py), so this reads months of history with no network: prices,
+expensas and rooms are memory-mapped column arrays and every statistic is
+a vectorized NumPy call.
+
+The what-if sweep counts matches for every combination of max_price x
+max_expensas x min_rooms in one pass (see ``sweep``) and recommends the
+thresholds closest to a target number of matches per week.
+
+Usage:
+    python analyze_listings.py                  # Whole archive
+    python analyze_listings.py --days 30        # Last 30 days
+    python analyze_listings.py --source zonaprop
+    python analyze_listings.py --live           # Scrape 2 ArgenProp pages instead
+    python analyze_listings.py --target 10 --prices 400000:1000000:50000
+"""
+
+import argparse
 import logging
-from scrappers.argenprop import scrape_argenprop
-from filters import matches
+
+import numpy as np
+
+from archive import NUMERIC_COLUMNS, columns_from_listings, latest_only, load_columns
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,134 +35,352 @@ CRITERIA = {
     "max_expensas": 100000
 }
 
-def analyze_listings():
-    """Analyze scraped listings to understand why nothing matches."""
-    
+# Default what-if ranges (start:stop:step, stop included)
+SWEEP_PRICES = "300000:1200000:100000"
+SWEEP_EXPENSAS = "50000:250000:25000"
+SWEEP_ROOMS = "1:4:1"
+TARGET_PER_WEEK = 10  # Matches per week the recommendation aims for
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+ARCHIVE_COLUMNS = ("id", "scraped_at", "in_casco") + NUMERIC_COLUMNS
+
+
+def load_history(days=None, sources=None, every_row=False):
+    """
+    Load archived listings.
+
+    Args:
+        days: Only the last N days (None for the whole archive)
+        sources: Only these sources (None for all)
+        every_row: Keep every observation instead of the latest per listing
+
+    Returns:
+        dict: Column name -> numpy array
+    """
+    data = load_columns(ARCHIVE_COLUMNS, days=days, sources=sources)
+    return data if every_row else latest_only(data)
+
+
+def column_stats(values):
+    """
+    Summary statistics of one column, ignoring missing values.
+
+    Returns:
+        dict: count, min, max, mean and percentile -> value (None if empty)
+    """
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return None
+    stats = {"count": len(values), "min": values.min(), "max": values.max(), "mean": values.mean()}
+    stats.update(zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+    return stats
+
+
+def rooms_distribution(rooms):
+    """
+    Count listings per number of rooms.
+
+    Returns:
+        list: (rooms, count) pairs, fewest rooms first
+    """
+    rooms = rooms[~np.isnan(rooms)]
+    values, counts = np.unique(rooms.astype(int), return_counts=True)
+    return list(zip(values.tolist(), counts.tolist()))
+
+
+def match_mask(data, criteria):
+    """
+    Vectorized filters.matches over archived columns.
+
+    Missing price or rooms never match; missing expensas don't count
+    against the listing; locations outside the casco urbano don't match.
+
+    Returns:
+        numpy.ndarray: Boolean mask of matching rows
+    """
+    price, rooms, expensas = data["price"], data["rooms"], data["expensas"]
+    mask = (price <= criteria["max_price"]) & (rooms >= criteria["min_rooms"])
+    if criteria.get("min_price") is not None:
+        mask &= price >= criteria["min_price"]
+    if criteria.get("max_rooms") is not None:
+        mask &= rooms <= criteria["max_rooms"]
+    mask &= ~(expensas > criteria["max_expensas"])  # NaN compares False: unknown passes
+    return mask & data["in_casco"]
+
+
+def rejection_masks(data, criteria):
+    """
+    Why each listing fails the criteria, one mask per reason.
+
+    Returns:
+        dict: Reason -> boolean mask of the rows it rejects
+    """
+    price, rooms = data["price"], data["rooms"]
+    return {
+        "missing data": np.isnan(price) | np.isnan(rooms),
+        "price too high": price > criteria["max_price"],
+        "too few rooms": rooms < criteria["min_rooms"],
+        "expensas too high": data["expensas"] > criteria["max_expensas"],
+        "outside the casco urbano": ~data["in_casco"],
+    }
+
+
+def sweep(data, max_prices, max_expensas, min_rooms, base=None):
+    """
+    Count matches for every max_price x max_expensas x min_rooms combination.
+
+    Each listing is placed once in a 3-D grid of threshold indices: the
+    first max_price and max_expensas it fits under (searchsorted over the
+    sorted thresholds) and the number of min_rooms thresholds it meets. A
+    single bincount fills the grid, and cumulative sums turn it into match
+    counts: a listing counts for every price and expensas threshold at or
+    above its cell and every rooms threshold below it.
+
+    Args:
+        data: Columns (price, expensas, rooms, in_casco)
+        max_prices, max_expensas, min_rooms: Threshold values to try
+        base: Criteria whose min_price / max_rooms apply to every combination
+
+    Returns:
+        numpy.ndarray: counts[rooms, price, expensas], in the order of the
+            sorted thresholds
+    """
+    max_prices, max_expensas, min_rooms = (np.sort(np.asarray(values)) for values in (max_prices, max_expensas, min_rooms))
+    price, expensas, rooms = data["price"], data["expensas"], data["rooms"]
+
+    mask = ~(np.isnan(price) | np.isnan(rooms)) & data["in_casco"]
+    base = base or {}
+    if base.get("min_price") is not None:
+        mask &= price >= base["min_price"]
+    if base.get("max_rooms") is not None:
+        mask &= rooms <= base["max_rooms"]
+    price, expensas, rooms = price[mask], expensas[mask], rooms[mask]
+
+    # Index of the first threshold the listing fits under; len() when none does
+    price_idx = np.searchsorted(max_prices, price, side="left")
+    expensas_idx = np.where(np.isnan(expensas), 0, np.searchsorted(max_expensas, expensas, side="left"))
+    # Number of min_rooms thresholds the listing meets
+    rooms_idx = np.searchsorted(min_rooms, rooms, side="right")
+
+    shape = (len(min_rooms) + 1, len(max_prices) + 1, len(max_expensas) + 1)
+    cells = np.bincount(
+        np.ravel_multi_index((rooms_idx, price_idx, expensas_idx), shape),
+        minlength=np.prod(shape),
+    ).reshape(shape)
+
+    counts = cells.cumsum(axis=1).cumsum(axis=2)
+    counts = counts[::-1].cumsum(axis=0)[::-1]  # Meets threshold m <=> rooms_idx > m
+    return counts[1:, :-1, :-1]
+
+
+def weeks_covered(data, days=None):
+    """Weeks of history behind the data (the --days window, or the span of scraped_at)."""
+    if days:
+        return days / 7
+    if not len(data["scraped_at"]):
+        return 1.0
+    span = data["scraped_at"].max() - data["scraped_at"].min()
+    return max(span / (7 * 86400), 1 / 7)  # At least one day
+
+
+def recommend(counts, max_prices, max_expensas, min_rooms, target):
+    """
+    Strictest thresholds reaching ``target`` matches.
+
+    Picks the combination with the fewest matches that still reaches the
+    target, preferring more rooms, then lower price, then lower expensas.
+
+    Args:
+        counts: Output of sweep (matches per week or in total)
+        max_prices, max_expensas, min_rooms: The thresholds passed to sweep
+        target: Matches wanted
+
+    Returns:
+        dict: max_price, max_expensas, min_rooms and count, or None if no
+            combination reaches the target
+    """
+    max_prices, max_expensas, min_rooms = (np.sort(np.asarray(values)) for values in (max_prices, max_expensas, min_rooms))
+    rooms_idx, price_idx, expensas_idx = np.nonzero(counts >= target)
+    if not len(rooms_idx):
+        return None
+    best = np.lexsort((expensas_idx, price_idx, -rooms_idx, counts[rooms_idx, price_idx, expensas_idx]))[0]
+    r, p, e = rooms_idx[best], price_idx[best], expensas_idx[best]
+    return {
+        "max_price": int(max_prices[p]),
+        "max_expensas": int(max_expensas[e]),
+        "min_rooms": int(min_rooms[r]),
+        "count": counts[r, p, e],
+    }
+
+
+def parse_range(text):
+    """Parse "start:stop:step" (stop included) or "a,b,c" into a sorted array."""
+    if ":" in text:
+        start, stop, step = (float(part) for part in text.split(":"))
+        return np.arange(start, stop + step / 2, step)
+    return np.sort(np.array([float(part) for part in text.split(",")]))
+
+
+def _print_sweep(counts, max_prices, max_expensas, min_rooms, current):
+    """One table per min_rooms: rows are max_price, columns max_expensas."""
+    shades = " ░▒▓█"
+    top = counts.max() or 1
+    for r, rooms in enumerate(min_rooms):
+        print(f"\n   Rooms ≥ {int(rooms)} (matches per week)")
+        print("   " + " " * 12 + "".join(f"{int(e) // 1000:>7}k" for e in max_expensas))
+        for p, price in enumerate(max_prices):
+            cells = []
+            for e, expensas in enumerate(max_expensas):
+                shade = shades[int(counts[r, p, e] / top * (len(shades) - 1))]
+                marker = "*" if (price, expensas, rooms) == current else shade
+                cells.append(f"{counts[r, p, e]:>7.1f}{marker}")
+            print(f"   ${int(price):>10,}" + "".join(cells))
+
+
+def _print_stats(title, stats):
+    print("\n" + "="*70)
+    print(title)
+    print("="*70)
+    print(f"   Min:     ${int(stats['min']):,}")
+    print(f"   Max:     ${int(stats['max']):,}")
+    print(f"   Average: ${int(stats['mean']):,}")
+    for p in PERCENTILES:
+        print(f"   P{p:<2}:     ${int(stats[p]):,}")
+
+
+def _print_histogram(values, label):
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    top = counts.max() if len(counts) else 0
+    print(f"\n   {label} histogram:")
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        bar = "█" * (count * 30 // top) if top else ""
+        print(f"   ${int(low):>10,} - ${int(high):>10,}: {bar} ({count})")
+
+
+def analyze_listings(days=None, sources=None, every_row=False, live=False,
+                     price_range=SWEEP_PRICES, expensas_range=SWEEP_EXPENSAS, rooms_range=SWEEP_ROOMS,
+                     target=TARGET_PER_WEEK):
+    """Analyze archived (or freshly scraped) listings to understand why nothing matches."""
+
     print("\n" + "="*70)
-    print("📊 ANALYZING ARGENPROP LISTINGS")
+    print("📊 ANALYZING LISTINGS")
     print("="*70)
-    
+
     print("\n🔍 Your current criteria:")
     print(f"   • Max Price: ${CRITERIA['max_price']:,}")
     print(f"   • Min Rooms: {CRITERIA['min_rooms']}")
     print(f"   • Max Expensas: ${CRITERIA['max_expensas']:,}")
-    
-    print("\n⏳ Scraping first 2 pages (this may take a moment)...")
-    listings = scrape_argenprop(max_pages=2)
-    
-    print(f"\n✅ Found {len(listings)} total listings\n")
-    
-    # Filter out listings with missing data
-    complete = [l for l in listings if l['price'] and l['rooms'] and l['expensas']]
-    incomplete = len(listings) - len(complete)
-    
-    print(f"📋 Listings with complete data: {len(complete)}")
-    print(f"⚠️  Listings with missing data: {incomplete}")
-    
-    if not complete:
-        print("\n❌ No listings with complete data found!")
-        print("   Try scraping more pages or check the scraper.")
+
+    if live:
+        from scrappers.argenprop import scrape_argenprop
+
+        print("\n⏳ Scraping first 2 ArgenProp pages (this may take a moment)...")
+        data = columns_from_listings(scrape_argenprop(max_pages=2), columns=ARCHIVE_COLUMNS)
+    else:
+        window = f"last {days} days" if days else "whole archive"
+        print(f"\n⏳ Loading archived listings ({window})...")
+        data = load_history(days=days, sources=sources, every_row=every_row)
+
+    total = len(data["id"])
+    print(f"\n✅ Found {total} listings\n")
+    if not total:
+        print("❌ No listings archived yet!")
+        print("   The archive fills up as cron_job.py / main.py run; or try --live.")
         return
-    
-    # Statistics
-    prices = [l['price'] for l in complete]
-    expensas = [l['expensas'] for l in complete]
-    rooms = [l['rooms'] for l in complete]
-    
-    print("\n" + "="*70)
-    print("📈 PRICE ANALYSIS")
-    print("="*70)
-    print(f"   Min Price:     ${min(prices):,}")
-    print(f"   Max Price:     ${max(prices):,}")
-    print(f"   Average Price: ${int(sum(prices)/len(prices)):,}")
-    print(f"   Median Price:  ${sorted(prices)[len(prices)//2]:,}")
-    
-    print("\n" + "="*70)
-    print("💰 EXPENSAS ANALYSIS")
-    print("="*70)
-    print(f"   Min Expensas:     ${min(expensas):,}")
-    print(f"   Max Expensas:     ${max(expensas):,}")
-    print(f"   Average Expensas: ${int(sum(expensas)/len(expensas)):,}")
-    print(f"   Median Expensas:  ${sorted(expensas)[len(expensas)//2]:,}")
-    
+
+    complete = ~(np.isnan(data["price"]) | np.isnan(data["rooms"]) | np.isnan(data["expensas"]))
+    print(f"📋 Listings with complete data: {int(complete.sum())}")
+    print(f"⚠️  Listings with missing data: {int(total - complete.sum())}")
+
+    price_stats = column_stats(data["price"])
+    expensas_stats = column_stats(data["expensas"])
+    if price_stats:
+        _print_stats("📈 PRICE ANALYSIS", price_stats)
+        _print_histogram(data["price"], "Price")
+    if expensas_stats:
+        _print_stats("💰 EXPENSAS ANALYSIS", expensas_stats)
+
     print("\n" + "="*70)
     print("🛏️  ROOMS DISTRIBUTION")
     print("="*70)
-    from collections import Counter
-    room_counts = Counter(rooms)
-    for room, count in sorted(room_counts.items()):
-        bar = "█" * (count * 30 // max(room_counts.values()))
+    distribution = rooms_distribution(data["rooms"])
+    top = max((count for _, count in distribution), default=0)
+    for room, count in distribution:
+        bar = "█" * (count * 30 // top)
         print(f"   {room} amb: {bar} ({count} listings)")
-    
-    # Check how many would match with different criteria
+
+    # Match counts for every combination of thresholds, in one pass
     print("\n" + "="*70)
-    print("🎯 CRITERIA TESTING")
+    print("🎯 WHAT-IF SWEEP")
     print("="*70)
-    
-    scenarios = [
-        {"max_price": 600000, "min_rooms": 2, "max_expensas": 100000, "name": "Current (very strict)"},
-        {"max_price": 800000, "min_rooms": 2, "max_expensas": 150000, "name": "Relaxed"},
-        {"max_price": 1000000, "min_rooms": 2, "max_expensas": 200000, "name": "More relaxed"},
-        {"max_price": 600000, "min_rooms": 1, "max_expensas": 100000, "name": "Current but 1+ rooms"},
-        {"max_price": 800000, "min_rooms": 1, "max_expensas": 100000, "name": "Higher price, same expensas"},
-    ]
-    
-    for scenario in scenarios:
-        matched = [l for l in complete if matches(l, scenario)]
-        print(f"\n   {scenario['name']}:")
-        print(f"      Price ≤ ${scenario['max_price']:,}, Rooms ≥ {scenario['min_rooms']}, Expensas ≤ ${scenario['max_expensas']:,}")
-        print(f"      ✓ Matches: {len(matched)} listings")
-    
+
+    max_prices, max_expensas, min_rooms = parse_range(price_range), parse_range(expensas_range), parse_range(rooms_range)
+    weeks = weeks_covered(data, days) if not live else 1.0
+    per_week = sweep(data, max_prices, max_expensas, min_rooms, base=CRITERIA) / weeks
+    current = (CRITERIA["max_price"], CRITERIA["max_expensas"], CRITERIA["min_rooms"])
+    print(f"\n   {weeks:.1f} weeks of listings; * marks your current criteria")
+    _print_sweep(per_week, max_prices, max_expensas, min_rooms, current)
+
     # Show some example listings
     print("\n" + "="*70)
     print("📋 SAMPLE LISTINGS (showing 10 cheapest)")
     print("="*70)
-    
-    sorted_by_price = sorted(complete, key=lambda x: x['price'])[:10]
-    
-    for i, ap in enumerate(sorted_by_price, 1):
-        total = ap['price'] + ap['expensas']
-        match = "✅" if matches(ap, CRITERIA) else "❌"
-        print(f"\n{i}. {match} ${ap['price']:,} + ${ap['expensas']:,} = ${total:,} | {ap['rooms']} amb")
-        print(f"   {ap['url']}")
-        
-        # Explain why it doesn't match
-        if not matches(ap, CRITERIA):
-            reasons = []
-            if ap['price'] > CRITERIA['max_price']:
-                reasons.append(f"Price too high (${ap['price']:,} > ${CRITERIA['max_price']:,})")
-            if ap['rooms'] < CRITERIA['min_rooms']:
-                reasons.append(f"Too few rooms ({ap['rooms']} < {CRITERIA['min_rooms']})")
-            if ap['expensas'] > CRITERIA['max_expensas']:
-                reasons.append(f"Expensas too high (${ap['expensas']:,} > ${CRITERIA['max_expensas']:,})")
-            print(f"   Why: {', '.join(reasons)}")
-    
+
+    rows = np.flatnonzero(complete)
+    cheapest = rows[np.argsort(data["price"][rows], kind="stable")[:10]]
+    reasons = rejection_masks(data, CRITERIA)
+
+    for i, row in enumerate(cheapest, 1):
+        price, expensas, rooms = (int(data[name][row]) for name in ("price", "expensas", "rooms"))
+        why = [reason for reason, mask in reasons.items() if mask[row]]
+        match = "❌" if why else "✅"
+        print(f"\n{i}. {match} ${price:,} + ${expensas:,} = ${price + expensas:,} | {rooms} amb")
+        print(f"   {data['id'][row]}")
+        if why:
+            print(f"   Why: {', '.join(why)}")
+
+    # How many listings each check rejects on its own
+    print("\n   Rejected by your criteria:")
+    for reason, mask in reasons.items():
+        print(f"   • {reason}: {int(mask.sum())} listings")
+
     # Recommendations
     print("\n" + "="*70)
     print("💡 RECOMMENDATIONS")
     print("="*70)
-    
-    # Find a reasonable criteria that would match some listings
-    median_price = sorted(prices)[len(prices)//2]
-    median_expensas = sorted(expensas)[len(expensas)//2]
-    
-    print(f"\n   Based on the market, consider:")
-    print(f"   • Max Price: ${int(median_price * 1.2):,} (current: ${CRITERIA['max_price']:,})")
-    print(f"   • Max Expensas: ${int(median_expensas * 1.2):,} (current: ${CRITERIA['max_expensas']:,})")
-    print(f"   • Min Rooms: {CRITERIA['min_rooms']} (keep as is)")
-    
-    suggested = {
-        "max_price": int(median_price * 1.2),
-        "min_rooms": CRITERIA['min_rooms'],
-        "max_expensas": int(median_expensas * 1.2)
-    }
-    
-    suggested_matches = [l for l in complete if matches(l, suggested)]
-    print(f"\n   This would match: {len(suggested_matches)} listings")
-    
+
+    suggested = recommend(per_week, max_prices, max_expensas, min_rooms, target)
+    if suggested is None:
+        print(f"\n   No combination reaches {target} matches per week; widen the ranges.")
+        return
+
+    print(f"\n   Strictest criteria with at least {target} matches per week:")
+    print(f"   • Max Price: ${suggested['max_price']:,} (current: ${CRITERIA['max_price']:,})")
+    print(f"   • Max Expensas: ${suggested['max_expensas']:,} (current: ${CRITERIA['max_expensas']:,})")
+    print(f"   • Min Rooms: {suggested['min_rooms']} (current: {CRITERIA['min_rooms']})")
+
+    print(f"\n   This would match: {suggested['count']:.1f} listings per week")
+
     print("\n" + "="*70)
-    print("\n✅ Analysis complete! Update your criteria in main.py")
+    print("\n✅ Analysis complete! Update your criteria with /start in the bot")
     print("="*70 + "\n")
 
+
 if __name__ == "__main__":
-    analyze_listings()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Analyze archived listings")
+    parser.add_argument("--days", type=int, help="Only the last N days")
+    parser.add_argument("--source", action="append", dest="sources", help="Only this source (repeatable)")
+    parser.add_argument("--every-row", action="store_true", help="Count every observation, not one per listing")
+    parser.add_argument("--live", action="store_true", help="Scrape 2 ArgenProp pages instead of reading the archive")
+    parser.add_argument("--prices", default=SWEEP_PRICES, help="max_price values, start:stop:step or a,b,c")
+    parser.add_argument("--expensas", default=SWEEP_EXPENSAS, help="max_expensas values, start:stop:step or a,b,c")
+    parser.add_argument("--rooms", default=SWEEP_ROOMS, help="min_rooms values, start:stop:step or a,b,c")
+    parser.add_argument("--target", type=float, default=TARGET_PER_WEEK, help="Matches per week to aim for")
+    args = parser.parse_args()
+
+    analyze_listings(
+        days=args.days, sources=args.sources, every_row=args.every_row, live=args.live,
+        price_range=args.prices, expensas_range=args.expensas, rooms_range=args.rooms, target=args.target,
+    )
@@ -0,0 +1,312 @@
+"""
+Columnar archive of every parsed listing, for market analytics.
+
+Each cycle appends the listings it parsed, one chunk per source, under a
+day partition:
+
+    archive/2026-10-19/zonaprop/081500123456-4242/price.npy
+                                                 /expensas.npy
+                                                 ...
+
+Every column is a plain .npy file, so the analysis only reads (memory-maps)
+the columns it needs, and a whole chunk is written to a temporary directory
+and renamed into place so readers never see a partial one. Missing values
+are stored as NaN. The same listing is archived on every cycle it is seen;
+use ``latest_only`` to keep one row per listing.
+
+A cycle every 15 minutes leaves ~100 chunks per source per day, so once a
+day is over its chunks are merged into a single ``day`` chunk
+(compact_archive), and day partitions older than ARCHIVE_RETENTION_DAYS
+are deleted. Both run after each flush (save_archive); a day that is
+already compacted costs one directory listing.
+
+NumPy is imported when a chunk is written or read, so importing this module
+stays cheap for the cron cold start.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from filters import location_ok
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
+
+# Day partitions kept before they are deleted (0 keeps everything)
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "180"))
+
+# Name of the chunk a finished day's chunks are merged into
+COMPACTED_CHUNK = "day"
+
+# Column -> NumPy dtype
+COLUMNS = {
+    "id": "U64",
+    "scraped_at": "f8",   # Unix time
+    "price": "f8",
+    "expensas": "f8",
+    "rooms": "f8",
+    "in_casco": "?",      # Location check of filters.matches (unknown counts as inside)
+}
+
+NUMERIC_COLUMNS = ("price", "expensas", "rooms")
+
+
+def _row(ap, scraped_at):
+    """Column values of one listing."""
+    return {
+        "id": ap["id"],
+        "scraped_at": scraped_at,
+        "price": ap.get("price"),
+        "expensas": ap.get("expensas"),
+        "rooms": ap.get("rooms"),
+        "in_casco": location_ok(ap.get("address") or ""),
+    }
+
+
+def columns_from_listings(listings, scraped_at=None, columns=COLUMNS):
+    """
+    Build column arrays from listing dicts.
+
+    Args:
+        listings: Iterable of apartment listings
+        scraped_at: Unix time to record (defaults to now)
+        columns: Columns to build
+
+    Returns:
+        dict: Column name -> numpy array (None values become NaN)
+    """
+    scraped_at = time.time() if scraped_at is None else scraped_at
+    return _to_arrays([_row(ap, scraped_at) for ap in listings], columns)
+
+
+def _to_arrays(rows, columns=COLUMNS):
+    """Column arrays of row dicts; missing numeric values become NaN."""
+    import numpy as np
+
+    arrays = {}
+    for name in columns:
+        dtype = COLUMNS[name]
+        values = [row[name] for row in rows]
+        if dtype == "f8":
+            values = [float("nan") if value is None else value for value in values]
+        arrays[name] = np.array(values, dtype=dtype)
+    return arrays
+
+
+class ListingArchive:
+    """
+    Collects a cycle's listings and writes them as one chunk per source.
+
+    Args:
+        root: Archive directory
+    """
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root is not None else ARCHIVE_DIR
+        self.pending = {}  # source -> list of rows
+
+    def __len__(self):
+        return sum(len(rows) for rows in self.pending.values())
+
+    def add(self, ap, scraped_at=None):
+        """Queue one listing for the next flush."""
+        scraped_at = time.time() if scraped_at is None else scraped_at
+        self.pending.setdefault(ap.get("source") or "unknown", []).append(_row(ap, scraped_at))
+
+    def flush(self, day=None):
+        """
+        Write the queued listings and clear them.
+
+        Args:
+            day: Partition date (defaults to today)
+
+        Returns:
+            list: Paths of the chunks written
+        """
+        day = (day or date.today()).isoformat()
+        stamp = f"{datetime.now():%H%M%S%f}-{os.getpid()}"
+        written = []
+        for source, rows in self.pending.items():
+            if not rows:
+                continue
+            written.append(_write_chunk(self.root / day / source, stamp, _to_arrays(rows)))
+        self.pending = {}
+        return written
+
+
+def _write_chunk(partition, name, arrays):
+    """Write column arrays as one chunk, renamed into place when complete."""
+    import numpy as np
+
+    partition.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=partition, prefix=".tmp-"))
+    try:
+        for column, values in arrays.items():
+            np.save(tmp / f"{column}.npy", values)
+        chunk = partition / name
+        tmp.rename(chunk)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return chunk
+
+
+def _partition_chunks(partition):
+    """Readable chunks of one day/source partition, oldest first."""
+    chunks = sorted(
+        chunk for chunk in partition.iterdir() if chunk.is_dir() and not chunk.name.startswith(".")
+    )
+    compacted = partition / COMPACTED_CHUNK
+    if compacted in chunks:
+        return [compacted]  # Anything else is left over from an interrupted compaction
+    return chunks
+
+
+def compact_archive(root=None, today=None, retention_days=None):
+    """
+    Merge each finished day's chunks and delete expired days.
+
+    Every source of a day before ``today`` ends up with a single chunk
+    holding all its rows in archive order. The merged chunk is renamed into
+    place before the originals are removed, and readers ignore leftovers
+    next to it, so an interrupted run never loses or duplicates rows.
+
+    Args:
+        root: Archive directory
+        today: Reference date (defaults to today); its partition is left alone
+        retention_days: Day partitions to keep (defaults to ARCHIVE_RETENTION_DAYS, 0 keeps all)
+
+    Returns:
+        dict: Counts of "compacted" partitions and "expired" days
+    """
+    import numpy as np
+
+    root = Path(root) if root is not None else ARCHIVE_DIR
+    today = today or date.today()
+    retention_days = ARCHIVE_RETENTION_DAYS if retention_days is None else retention_days
+    stats = {"compacted": 0, "expired": 0}
+    if not root.exists():
+        return stats
+
+    oldest = (today - timedelta(days=retention_days - 1)).isoformat() if retention_days > 0 else None
+    for day_dir in sorted(root.iterdir()):
+        if not day_dir.is_dir() or day_dir.name >= today.isoformat():
+            continue
+        if oldest is not None and day_dir.name < oldest:
+            shutil.rmtree(day_dir)
+            stats["expired"] += 1
+            continue
+        for partition in sorted(day_dir.iterdir()):
+            if not partition.is_dir():
+                continue
+            chunks = sorted(chunk for chunk in partition.iterdir() if chunk.is_dir() and not chunk.name.startswith("."))
+            if not chunks or [chunk.name for chunk in chunks] == [COMPACTED_CHUNK]:
+                continue
+            if COMPACTED_CHUNK not in {chunk.name for chunk in chunks}:
+                merged = {
+                    name: np.concatenate([np.load(chunk / f"{name}.npy") for chunk in chunks])
+                    for name in COLUMNS
+                }
+                _write_chunk(partition, COMPACTED_CHUNK, merged)
+                stats["compacted"] += 1
+            for chunk in chunks:
+                if chunk.name != COMPACTED_CHUNK:
+                    shutil.rmtree(chunk, ignore_errors=True)
+    return stats
+
+
+def save_archive(archive):
+    """Write a cycle's listings to the archive and compact finished days (errors are logged, not raised)."""
+    try:
+        count = len(archive)
+        chunks = archive.flush()
+        if chunks:
+            logger.debug(f"Archived {count} listings in {len(chunks)} chunks")
+        stats = compact_archive(archive.root)
+        if any(stats.values()):
+            logger.info(f"Archive: compacted {stats['compacted']} partitions, expired {stats['expired']} days")
+    except Exception as e:
+        logger.error(f"Failed to archive listings: {e}")
+
+
+def iter_chunks(root=None, days=None, sources=None, today=None):
+    """
+    Find archived chunks.
+
+    Args:
+        root: Archive directory
+        days: Only the last N day partitions (None for all)
+        sources: Only these sources (None for all)
+        today: Reference date for ``days`` (defaults to today)
+
+    Yields:
+        Path: Chunk directory, oldest partition first
+    """
+    root = Path(root) if root is not None else ARCHIVE_DIR
+    if not root.exists():
+        return
+    oldest = None
+    if days is not None:
+        oldest = ((today or date.today()) - timedelta(days=days - 1)).isoformat()
+    for day_dir in sorted(root.iterdir()):
+        if not day_dir.is_dir() or (oldest is not None and day_dir.name < oldest):
+            continue
+        for source_dir in sorted(day_dir.iterdir()):
+            if not source_dir.is_dir() or (sources is not None and source_dir.name not in sources):
+                continue
+            yield from _partition_chunks(source_dir)
+
+
+def load_columns(columns=NUMERIC_COLUMNS, root=None, days=None, sources=None, today=None):
+    """
+    Read columns of every matching chunk, memory-mapped.
+
+    Finished days are compacted (see compact_archive), so a selection
+    spans about one chunk per source per day. A selection of a single
+    chunk is returned as its memory maps; otherwise only the requested
+    columns are copied into one array each.
+
+    Args:
+        columns: Column names to read
+        root, days, sources, today: Chunk selection (see iter_chunks)
+
+    Returns:
+        dict: Column name -> numpy array (empty if nothing is archived)
+    """
+    import numpy as np
+
+    parts = {name: [] for name in columns}
+    for chunk in iter_chunks(root, days, sources, today):
+        for name in columns:
+            parts[name].append(np.load(chunk / f"{name}.npy", mmap_mode="r"))
+
+    def joined(name, arrays):
+        if not arrays:
+            return np.empty(0, dtype=COLUMNS[name])
+        return arrays[0] if len(arrays) == 1 else np.concatenate(arrays)
+
+    return {name: joined(name, arrays) for name, arrays in parts.items()}
+
+
+def latest_only(data):
+    """
+    Keep the last archived row of every listing.
+
+    Args:
+        data: Columns from load_columns, including "id" and "scraped_at"
+
+    Returns:
+        dict: The same columns, one row per listing
+    """
+    import numpy as np
+
+    order = np.argsort(data["scraped_at"], kind="stable")[::-1]
+    _, first = np.unique(data["id"][order], return_index=True)
+    keep = np.sort(order[first])
+    return {name: values[keep] for name, values in data.items()}
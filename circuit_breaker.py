@@ -0,0 +1,235 @@
+"""
+Per-source circuit breaker.
+
+When a site blocks us (Cloudflare challenge, captcha, 403/429), every
+cycle used to wait for full page load and selector timeouts before giving
+up. Scrapers now raise SourceBlocked as soon as detect_block() recognizes
+a challenge, and each source has a breaker:
+
+- closed: the source is scraped normally
+- open: after FAILURE_THRESHOLD consecutive failures the source is skipped
+  (costing nothing) until its cooldown has passed
+- half-open: after the cooldown one probe scrape is allowed; success
+  closes the breaker, failure reopens it with twice the cooldown
+
+Breaker state is persisted in breakers.json so it survives cron runs.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BREAKER_FILE = Path("breakers.json")
+
+FAILURE_THRESHOLD = 3            # Consecutive failures that open the breaker
+BASE_COOLDOWN = 30 * 60          # First cooldown of an open breaker (seconds)
+MAX_COOLDOWN = 24 * 60 * 60      # Cooldown never grows past this (seconds)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BLOCK_STATUSES = (403, 429, 503)
+
+# Markers of challenge/block pages (Cloudflare, captchas, MercadoLibre verification)
+BLOCK_PATTERN = re.compile(
+    r"just a moment|attention required|cf-challenge|challenge-platform|cf_chl_"
+    r"|captcha|verify you are human|access denied|account-verification|suspicious.traffic",
+    re.IGNORECASE
+)
+
+
+class SourceBlocked(Exception):
+    """Raised by a scraper when the site serves a block or challenge page."""
+
+
+def detect_block(status=None, text="", url=""):
+    """
+    Check if a response looks like a block or challenge page.
+
+    Args:
+        status: HTTP status code (if known)
+        text: Page title
+        url: Final URL after redirects
+
+    Returns:
+        str: Reason the page is considered blocked, or None
+    """
+    if status in BLOCK_STATUSES:
+        return f"HTTP {status}"
+    match = BLOCK_PATTERN.search(str(text or "")) or BLOCK_PATTERN.search(str(url or ""))
+    if match:
+        return f"challenge page ({match.group(0)})"
+    return None
+
+
+def page_title(html):
+    """Get the <title> of an HTML document (only the head is searched)."""
+    match = re.search(r"<title[^>]*>(.*?)</title>", str(html)[:5000], re.IGNORECASE | re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+
+def raise_if_blocked(response):
+    """
+    Fail fast if an HTTP response is a block or challenge page.
+
+    Only the status, title and final URL are checked, since regular pages
+    may mention captchas elsewhere (e.g. contact forms).
+
+    Raises:
+        SourceBlocked: If the response looks like a block
+    """
+    reason = detect_block(response.status_code, page_title(response.text), response.url)
+    if reason:
+        raise SourceBlocked(reason)
+
+
+def allow(breakers, name, now=None):
+    """
+    Check if a source may be scraped now, moving open breakers to half-open.
+
+    Args:
+        breakers: Breaker state dict from load_breakers()
+        name: Source name
+        now: Current time (defaults to now)
+    """
+    now = time.time() if now is None else now
+    state = breakers.get(name)
+    if not state or state["state"] == CLOSED:
+        return True
+    if state["state"] == OPEN and now < state["opened_at"] + state["cooldown"]:
+        return False
+    state["state"] = HALF_OPEN
+    return True
+
+
+def record_success(breakers, name):
+    """Close a source's breaker after a successful scrape."""
+    state = breakers.get(name)
+    if state and state["state"] != CLOSED:
+        logger.info(f"{name}: circuit closed")
+    breakers[name] = {"state": CLOSED, "failures": 0, "opened_at": None, "cooldown": BASE_COOLDOWN}
+
+
+def record_failure(breakers, name, reason, now=None):
+    """
+    Count a failed scrape, opening the breaker when needed.
+
+    Returns:
+        str: The breaker state after the failure
+    """
+    now = time.time() if now is None else now
+    state = breakers.setdefault(
+        name, {"state": CLOSED, "failures": 0, "opened_at": None, "cooldown": BASE_COOLDOWN}
+    )
+    state["failures"] += 1
+    state["reason"] = reason
+
+    if state["state"] == HALF_OPEN:
+        state["cooldown"] = min(state["cooldown"] * 2, MAX_COOLDOWN)
+        state["state"] = OPEN
+        state["opened_at"] = now
+    elif state["failures"] >= FAILURE_THRESHOLD:
+        state["state"] = OPEN
+        state["opened_at"] = now
+
+    if state["state"] == OPEN:
+        logger.warning(f"{name}: circuit open for {state['cooldown'] // 60} min ({reason})")
+    return state["state"]
+
+
+class GuardedSource:
+    """
+    Wraps a SourceSpec with its circuit breaker.
+
+    Exposes the same attributes the pipeline engine uses (name, label,
+    needs_browser, scrape). A scrape that raises or yields no listings
+    counts as a failure.
+    """
+
+    def __init__(self, spec, breakers):
+        self.spec = spec
+        self.breakers = breakers
+        self.name = spec.name
+        self.label = spec.label
+        self.needs_browser = spec.needs_browser
+
+    def scrape(self, max_pages=None, **kwargs):
+        """Stream listings unless the breaker is open."""
+        if not allow(self.breakers, self.name):
+            state = self.breakers[self.name]
+            wait = state["opened_at"] + state["cooldown"] - time.time()
+            logger.info(f"Skipping {self.label}: circuit open ({int(wait // 60)} min left)")
+            return
+
+        count = 0
+        failure = None
+        try:
+            for ap in self.spec.scrape(max_pages=max_pages, **kwargs):
+                count += 1
+                yield ap
+        except GeneratorExit:
+            raise  # Consumer stopped early: not a failure
+        except SourceBlocked as e:
+            failure = f"blocked: {e}"
+            raise
+        except Exception as e:
+            failure = f"error: {e}"
+            raise
+        finally:
+            if count:
+                record_success(self.breakers, self.name)
+            else:
+                record_failure(self.breakers, self.name, failure or "no listings")
+
+
+def guarded_sources(specs, breakers):
+    """Wrap each source with its circuit breaker."""
+    return [GuardedSource(spec, breakers) for spec in specs]
+
+
+def load_breakers():
+    """
+    Load per-source breaker state.
+
+    Returns:
+        dict: Source name -> state dict (state, failures, opened_at, cooldown)
+    """
+    try:
+        if BREAKER_FILE.exists():
+            data = json.loads(BREAKER_FILE.read_text(encoding='utf-8'))
+            if isinstance(data, dict):
+                return data
+            logger.warning("breakers.json contains invalid data, resetting")
+        return {}
+    except Exception as e:
+        logger.error(f"Failed to load breakers.json: {e}. Resetting breakers.")
+        return {}
+
+
+def save_breakers(breakers):
+    """Save per-source breaker state to disk using atomic write."""
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            dir=BREAKER_FILE.parent,
+            delete=False,
+            suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(breakers, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        temp_path.replace(BREAKER_FILE)
+        logger.debug(f"Saved breaker state for {len(breakers)} sources")
+
+    except Exception as e:
+        logger.error(f"Failed to save breakers.json: {e}", exc_info=True)
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """
 Cron job script for apartment notifications.
-Designed to run hourly via Railway Cron, GitHub Actions, or system cron.
+Designed to run every 15 minutes via Railway Cron, GitHub Actions, or system
+cron. Each run only scrapes the sources whose adaptive polling interval has
+elapsed (see scheduler.py).
 
 This script:
 1. Scrapes all apartment sources
@@ -9,15 +11,29 @@ This script:
 3. Sends Telegram notifications
 4. Exits (no persistent process)
 
+Steps 1-3 are streamed: each listing is sent as soon as it is parsed.
+
+With --daemon the same cycle runs every MIN_INTERVAL in one resident
+process instead: imported modules, the Playwright browser, HTTP
+keep-alive connections and the loaded sent/user/schedule data stay warm
+between cycles. Memory is checked after every cycle; the browser is
+closed when Chromium grows past DAEMON_BROWSER_RSS_MB and the worker
+re-executes itself when its own RSS grows past DAEMON_WORKER_RSS_MB.
+
 Usage:
     python cron_job.py
+    python cron_job.py --daemon
 """
 
 import os
 import sys
 import gc
+import signal
+import threading
+import time
 import logging
 from datetime import datetime
+from functools import partial
 from dotenv import load_dotenv
 
 # Change to script directory for relative imports
@@ -25,36 +41,47 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 load_dotenv()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('cron_job.log'),
-        logging.StreamHandler()
-    ]
-)
+# Logging is configured in __main__ (written by a background thread, rotated
+# and compressed), not on import: notifier shards spawned by fanout.py
+# re-import this module and must not rotate the same file
+from log_setup import setup_logging, stop_logging
+
 logger = logging.getLogger(__name__)
 
-# Import after changing directory
-from scrappers.argenprop import scrape_argenprop
-from scrappers.zonaprop import scrape_zonaprop
-from scrappers.mercadolibre import scrape_mercadolibre
-from scrappers.inmobusqueda import scrape_inmobusqueda
-from scrappers.browser_manager import close_browser
-from filters import matches
-from storage import load_sent, save_sent, load_queue, save_queue
-from user_config import get_all_user_ids, get_user_config
-from notifier import send_message
+# Import after changing directory. Scraper modules (requests, bs4, Playwright)
+# are imported lazily by the source registry, only when a source runs.
+from sources import enabled_sources, close_browser_if_loaded
+from pipeline import (
+    run_pipeline, iter_snapshot_diff, iter_archived, iter_new, iter_unique, iter_top_k,
+    iter_enriched, iter_indexed_matches, iter_price_drops, notify_sink, load_active_user_configs
+)
+from storage import load_sent, save_sent, load_queue, save_queue, DB_FILE, WarmCache
+from archive import ListingArchive, save_archive
+from scheduler import (
+    load_schedule, save_schedule, scheduled_sources, cycle_lock,
+    SCHEDULE_FILE, MIN_INTERVAL
+)
+from user_config import get_store
+from dedup import load_fingerprints, save_fingerprints, FINGERPRINT_FILE
+from snapshots import load_snapshots, save_snapshots, SNAPSHOT_FILE
+from enrichment import DetailEnricher, load_detail_cache, save_detail_cache, CACHE_FILE
+from circuit_breaker import guarded_sources, load_breakers, save_breakers, BREAKER_FILE
+from notifier import send_message, send_price_drop
 
 # Configuration
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-MAX_LISTINGS_PER_SOURCE = 2
+# Notifier processes; with more than one, matching and sending are fanned
+# out to processes that each own a shard of the users (see fanout.py)
+NOTIFY_SHARDS = int(os.getenv("NOTIFY_SHARDS", "1"))
 
 # Quiet hours - don't send notifications between these hours (0-23)
 QUIET_HOURS_START = 0   # midnight
 QUIET_HOURS_END = 8     # 8 AM
 
+# Daemon mode memory watermarks (MB)
+DAEMON_BROWSER_RSS_MB = int(os.getenv("DAEMON_BROWSER_RSS_MB", "500"))
+DAEMON_WORKER_RSS_MB = int(os.getenv("DAEMON_WORKER_RSS_MB", "300"))
+
 
 def is_quiet_hours():
     """Check if current time is within quiet hours."""
@@ -62,8 +89,14 @@ def is_quiet_hours():
     return QUIET_HOURS_START <= current_hour < QUIET_HOURS_END
 
 
-def main():
-    """Main cron job function."""
+def main(state=None, keep_browser=False):
+    """
+    Main cron job function.
+
+    Args:
+        state: WarmCache kept between cycles (daemon mode)
+        keep_browser: Leave the Playwright browser running after the cycle
+    """
     logger.info("=" * 50)
     logger.info(f"Cron job started at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 
@@ -77,127 +110,213 @@ def main():
         logger.error("TELEGRAM_BOT_TOKEN not set!")
         return 1
 
+    with cycle_lock() as acquired:
+        if not acquired:
+            logger.warning("Previous cycle is still running - skipping")
+            logger.info("=" * 50)
+            return 0
+        return run_cycle(state, keep_browser)
+
+
+def run_cycle(state=None, keep_browser=False):
+    """Scrape the due sources and notify users (runs under cycle_lock)."""
+    if state is not None:
+        load = state.get
+    else:
+        load = lambda path, loader: loader()
+
     try:
         # Load previously sent IDs and queue
-        sent = load_sent()
+        sent = load(DB_FILE, load_sent)
         queue = load_queue()
         logger.info(f"Loaded {len(sent)} previously sent listings")
         logger.info(f"Loaded {len(queue)} apartments in queue")
 
-        # Scrape all sources
-        logger.info("Scraping all sources...")
-        sources = {}
+        # Fingerprints of recent listings, to skip cross-source duplicates
+        fingerprints = load(FINGERPRINT_FILE, load_fingerprints)
+
+        # Last known price/expensas/rooms of every listing, to detect changes
+        snapshots = load(SNAPSHOT_FILE, load_snapshots)
+        events = []
+
+        # Every parsed listing is appended to the columnar archive (analyze_listings.py)
+        archive = ListingArchive()
+
+        # Get all registered users. Read from the user store every cycle (one
+        # indexed query), so the daemon sees changes made by the bot
+        user_configs = load_active_user_configs()
+        logger.info(f"Processing for {len(user_configs)} active users")
+
+        # Fills missing fields of promising listings from their detail pages
+        enricher = DetailEnricher(cache=load(CACHE_FILE, load_detail_cache))
+
+        # Listings flow through dedup -> enrich -> cross-source dedup -> match -> rank -> notify.
+        # Each user gets their best-scoring matches of the cycle, up to their
+        # budget (ranking.user_budget), sent as each source finishes; matches
+        # no user kept go to the queue, replacing the old one.
+        # Only sources whose polling interval has elapsed are scraped, and
+        # sources that keep blocking us are skipped until their cooldown ends.
+        schedule = load(SCHEDULE_FILE, load_schedule)
+        breakers = load(BREAKER_FILE, load_breakers)
+        specs = scheduled_sources(guarded_sources(enabled_sources(), breakers), schedule)
+        logger.info(f"Scraping {len(specs)} due sources...")
+
+        new_overflow = []  # Matching new apartments outside every user's top-k
+        stats = {}
+        stages = [
+            partial(iter_snapshot_diff, store=snapshots, events=events),
+            partial(iter_archived, archive=archive),
+            partial(iter_new, sent=sent),
+            partial(iter_enriched, user_configs=user_configs, enricher=enricher),
+            # After enrichment: rooms/expensas missing from cards are needed to fingerprint
+            partial(iter_unique, index=fingerprints),
+        ]
+        published = []  # Listings handed to the notifier shards
+        if NOTIFY_SHARDS > 1:
+            sink = published.append
+        else:
+            stages.append(partial(iter_indexed_matches, store=get_store()))
+            stages.append(partial(
+                iter_top_k, user_configs=user_configs, overflow=new_overflow, sources=len(specs)
+            ))
+            sink = notify_sink(partial(send_message, TOKEN), stats)
+        try:
+            run_pipeline(specs, stages=stages, sink=sink, keep_browser=keep_browser)
+        finally:
+            enricher.close()
 
-        logger.info("  - ArgenProp...")
-        sources["argenprop"] = scrape_argenprop()
+        if NOTIFY_SHARDS > 1:
+            from fanout import fan_out, MAX_ATTEMPTS
 
-        # ZonaProp and MercadoLibre only work locally (Cloudflare blocks Railway IPs)
-        if not os.getenv("RAILWAY_ENVIRONMENT"):
-            logger.info("  - ZonaProp...")
-            sources["zonaprop"] = scrape_zonaprop()
+            stats.update(fan_out(published, TOKEN, NOTIFY_SHARDS))
+            overflow_ids = set(stats.pop("overflow"))
+            new_overflow = [ap for ap in published if ap["id"] in overflow_ids]
+            if stats["crashed"]:
+                logger.error(f"{stats['crashed']} notifier shards did not finish; they resume next run (up to {MAX_ATTEMPTS} attempts)")
+        to_send_count = stats["listings"]
 
-            logger.info("  - MercadoLibre...")
-            sources["mercadolibre"] = scrape_mercadolibre()
-        else:
-            logger.info("  - Skipping ZonaProp/MercadoLibre (Railway environment)")
+        # Price drops of known listings, for users who opted in
+        drop_sink = notify_sink(partial(send_price_drop, TOKEN), stats)
+        for item in iter_price_drops(events, user_configs):
+            drop_sink(item)
 
-        # Close Playwright browser to free memory
-        close_browser()
-        gc.collect()  # Force garbage collection to release memory
+        gone = snapshots.gone(spec.name for spec in specs)
+        if gone:
+            logger.info(f"{len(gone)} listings are gone (not seen for a while)")
+        total_sent = stats["sent"]
 
-        logger.info("  - Inmobusqueda...")
-        sources["inmobusqueda"] = scrape_inmobusqueda()
+        logger.info(f"Found {to_send_count + len(new_overflow)} matching NEW apartments, {to_send_count} selected for sending")
 
-        total = sum(len(v) for v in sources.values())
-        logger.info(f"Found {total} total listings")
+        # New queue is ONLY the overflow from new apartments (LIFO - old queue discarded)
+        queue = new_overflow
 
-        # Find new apartments (not seen before)
-        new_apartments = []
-        for source_name, listings in sources.items():
-            for ap in listings:
-                if ap["id"] not in sent:
-                    sent.add(ap["id"])
-                    new_apartments.append(ap)
+        if queue:
+            logger.info(f"{len(queue)} apartments queued for next cycle")
 
-        logger.info(f"Found {len(new_apartments)} NEW apartments")
+        # Save updated sent set, queue and schedule
+        kept = save_sent(sent)
+        save_queue(queue)
+        save_schedule(schedule)
+        save_breakers(breakers)
+        save_fingerprints(fingerprints)
+        save_snapshots(snapshots)
+        save_detail_cache(enricher.cache)
+        save_archive(archive)
+        if state is not None:
+            state.mark_saved(DB_FILE, kept if kept is not None else sent)
+            state.mark_saved(SCHEDULE_FILE, schedule)
+            state.mark_saved(BREAKER_FILE, breakers)
+            state.mark_saved(FINGERPRINT_FILE, fingerprints)
+            state.mark_saved(SNAPSHOT_FILE, snapshots)
+            state.mark_saved(CACHE_FILE, enricher.cache)
 
-        # Get all registered users
-        user_ids = get_all_user_ids()
-        logger.info(f"Processing for {len(user_ids)} users")
+        logger.info(f"Sent {total_sent} notifications, {len(queue)} in queue")
+        logger.info("=" * 50)
+        return 0
 
-        # Priority: New apartments first, then queue (LIFO - newest first)
-        # 1. Send new apartments (up to 2 per source)
-        # 2. Excess new apartments go to FRONT of queue (LIFO)
-        # 3. Old queue items that didn't get sent are discarded (too old)
+    except Exception as e:
+        logger.error(f"Cron job failed: {e}", exc_info=True)
+        if state is not None:
+            state.clear()  # Cached data may hold unsaved changes; reload from disk
+        return 1
+    finally:
+        # Ensure browser is closed
+        if not keep_browser:
+            try:
+                close_browser_if_loaded()
+            except:
+                pass
 
-        source_counts = {}
-        to_send = []
-        new_overflow = []  # New apartments that exceed per-source limit
 
-        # Select from NEW apartments (priority)
-        for ap in new_apartments:
-            source_name = ap.get("source", "unknown")
-            current_count = source_counts.get(source_name, 0)
+def check_memory():
+    """
+    Apply the daemon's memory watermarks after a cycle.
 
-            if current_count >= MAX_LISTINGS_PER_SOURCE:
-                new_overflow.append(ap)
-                continue
+    Closes the browser if Chromium uses more than DAEMON_BROWSER_RSS_MB.
 
-            to_send.append(ap)
-            source_counts[source_name] = current_count + 1
+    Returns:
+        bool: True if the worker itself is over DAEMON_WORKER_RSS_MB and
+            should be restarted
+    """
+    from memory import process_rss_mb, chromium_rss_mb
 
-        # New queue is ONLY the overflow from new apartments (LIFO - old queue discarded)
-        queue = new_overflow
+    worker_mb = process_rss_mb()
+    browser_mb = chromium_rss_mb()
+    if worker_mb is None:
+        return False  # No /proc: memory checks unavailable
 
-        if not to_send:
-            logger.info("No apartments to send")
-            save_sent(sent)
-            save_queue(queue)
-            logger.info("=" * 50)
-            return 0
+    logger.info(f"Memory: worker {worker_mb:.0f} MB, browser {browser_mb or 0:.0f} MB")
 
-        logger.info(f"Sending {len(to_send)} apartments to {len(user_ids)} users")
+    if browser_mb and browser_mb > DAEMON_BROWSER_RSS_MB:
+        logger.warning(f"Browser over {DAEMON_BROWSER_RSS_MB} MB - closing it")
+        close_browser_if_loaded()
+        gc.collect()
 
-        # Send selected apartments to ALL users
-        total_sent = 0
-        for user_id in user_ids:
-            config = get_user_config(user_id)
-            if not config.get("active", True):
-                continue
+    return worker_mb > DAEMON_WORKER_RSS_MB
 
-            matched_count = sum(1 for ap in to_send if matches(ap, config))
-            logger.info(f"User {user_id}: {matched_count}/{len(to_send)} apartments match filters")
 
-            for ap in to_send:
-                if matches(ap, config):
-                    logger.info(f"  Sending to {user_id}: {ap['url']}")
-                    try:
-                        send_message(TOKEN, user_id, ap)
-                        total_sent += 1
-                    except Exception as e:
-                        logger.error(f"Failed to send to {user_id}: {e}")
+def run_daemon():
+    """Run a cycle every MIN_INTERVAL in one resident process."""
+    import http_session
 
-        if queue:
-            logger.info(f"{len(queue)} apartments queued for next hour")
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
 
-        # Save updated sent set and queue
-        save_sent(sent)
-        save_queue(queue)
+    http_session.use_session()
+    state = WarmCache()
+    restart = False
+    logger.info(f"Daemon started (cycle every {MIN_INTERVAL // 60} min)")
 
-        logger.info(f"Sent {total_sent} notifications, {len(queue)} in queue")
-        logger.info("=" * 50)
-        return 0
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            main(state, keep_browser=True)
 
-    except Exception as e:
-        logger.error(f"Cron job failed: {e}", exc_info=True)
-        return 1
+            if is_quiet_hours():
+                close_browser_if_loaded()  # Nothing will use it for hours
+
+            if check_memory():
+                logger.warning(f"Worker over {DAEMON_WORKER_RSS_MB} MB - restarting")
+                restart = True
+                break
+
+            stop.wait(max(MIN_INTERVAL - (time.monotonic() - started), 0))
     finally:
-        # Ensure browser is closed
-        try:
-            close_browser()
-        except:
-            pass
+        close_browser_if_loaded()
+        http_session.use_session(False)
+
+    if restart:
+        # State is already on disk; a fresh process starts with clean memory
+        stop_logging()  # Flush queued records; execv skips atexit handlers
+        logging.shutdown()
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__), "--daemon"])
+
+    logger.info("Daemon stopped")
+    return 0
 
 
 if __name__ == "__main__":
+    setup_logging('cron_job.log')
+    if "--daemon" in sys.argv[1:]:
+        sys.exit(run_daemon())
     sys.exit(main())
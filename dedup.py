@@ -0,0 +1,240 @@
+"""
+Cross-source duplicate detection.
+
+The same apartment is often published on several sites under different
+IDs. Each listing is reduced to a fingerprint (rooms, price, expensas and
+a normalized address) and stored in a FingerprintIndex bucketed by rooms
+and log-scaled price. A new listing is only compared with the fingerprints
+in its own and the neighbouring price buckets, so lookups stay cheap as
+the history grows.
+
+Two listings from different sources are duplicates when they have the
+same rooms, prices within PRICE_TOLERANCE, compatible expensas and
+similar addresses.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import time
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+
+from location_filter import extract_street_numbers
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FILE = Path("fingerprints.json")
+MAX_FINGERPRINTS = 500        # Recent fingerprints kept as history
+MAX_AGE_DAYS = 30             # Fingerprints older than this are dropped
+
+PRICE_BUCKET_WIDTH = 0.05     # Width of a price bucket (log scale, ~5%)
+PRICE_TOLERANCE = 0.03        # Max relative price difference of duplicates
+EXPENSAS_TOLERANCE = 0.10     # Max relative expensas difference of duplicates
+ADDRESS_SIMILARITY = 0.5      # Min Jaccard similarity of address tokens
+
+# Words that carry no location information
+_ADDRESS_STOPWORDS = {
+    "la", "plata", "buenos", "aires", "provincia", "departamento", "depto",
+    "dpto", "en", "de", "del", "al", "y", "e", "entre", "calle", "av",
+    "avenida", "nro", "n", "no", "numero", "alquiler", "venta", "piso",
+}
+
+
+def normalize_address(address):
+    """
+    Normalize an address for comparison.
+
+    Lowercases, strips accents and punctuation and drops words that do not
+    identify a location ("La Plata", "calle", "entre", ...).
+
+    Returns:
+        str: Space-separated address tokens (empty if unknown)
+    """
+    if not address:
+        return ""
+    text = unicodedata.normalize("NFKD", address.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    tokens = re.findall(r"[a-z0-9]+", text)
+    return " ".join(token for token in tokens if token not in _ADDRESS_STOPWORDS)
+
+
+def fingerprint(ap):
+    """
+    Build the fingerprint of a listing.
+
+    Returns:
+        dict: Fingerprint, or None if price or rooms are unknown
+    """
+    if ap.get("price") is None or ap.get("rooms") is None:
+        return None
+    return {
+        "id": ap["id"],
+        "source": ap.get("source", "unknown"),
+        "price": ap["price"],
+        "rooms": ap["rooms"],
+        "expensas": ap.get("expensas"),
+        "address": normalize_address(ap.get("address")),
+        "seen": time.time(),
+    }
+
+
+def _price_bucket(price):
+    """Log-scaled price bucket, so neighbouring buckets differ by ~5%."""
+    return int(math.log(max(price, 1)) / math.log1p(PRICE_BUCKET_WIDTH))
+
+
+def _close(a, b, tolerance):
+    """Check if two amounts differ by at most ``tolerance`` (relative)."""
+    return abs(a - b) <= tolerance * max(a, b, 1)
+
+
+def _address_tokens(address):
+    """Tokens of a normalized address plus the street numbers it mentions."""
+    tokens = set(address.split())
+    tokens.update(f"#{n}" for n in extract_street_numbers(address))
+    return tokens
+
+
+def address_similarity(a, b):
+    """
+    Jaccard similarity of two normalized addresses.
+
+    Returns:
+        float: Similarity in [0, 1], or None if either address is unknown
+    """
+    if not a or not b:
+        return None
+    tokens_a, tokens_b = _address_tokens(a), _address_tokens(b)
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+
+def is_duplicate(fp, other):
+    """
+    Check if two fingerprints describe the same apartment.
+
+    Listings from the same source are never duplicates (the site's ID is
+    authoritative there). Without addresses, expensas must be known and
+    equal on both sides.
+    """
+    if fp["source"] == other["source"] or fp["rooms"] != other["rooms"]:
+        return False
+    if not _close(fp["price"], other["price"], PRICE_TOLERANCE):
+        return False
+
+    expensas, other_expensas = fp["expensas"], other["expensas"]
+    if expensas is not None and other_expensas is not None:
+        if not _close(expensas, other_expensas, EXPENSAS_TOLERANCE):
+            return False
+
+    similarity = address_similarity(fp["address"], other["address"])
+    if similarity is None:
+        return expensas is not None and expensas == other_expensas
+    return similarity >= ADDRESS_SIMILARITY
+
+
+class FingerprintIndex:
+    """
+    Fingerprints of recently seen listings, bucketed for fast lookup.
+
+    Use find() to get the listing a new one duplicates and add() to
+    register a listing as the representative of its cluster.
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._buckets = defaultdict(list)
+        for fp in entries:
+            self._insert(fp)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _insert(self, fp):
+        self.entries.append(fp)
+        self._buckets[(fp["rooms"], _price_bucket(fp["price"]))].append(fp)
+
+    def find(self, ap):
+        """
+        Find a known listing that ``ap`` duplicates.
+
+        Returns:
+            dict: Fingerprint of the matching listing, or None
+        """
+        fp = fingerprint(ap)
+        if fp is None:
+            return None
+        bucket = _price_bucket(fp["price"])
+        for offset in (0, -1, 1):
+            for other in self._buckets.get((fp["rooms"], bucket + offset), ()):
+                if other["id"] != fp["id"] and is_duplicate(fp, other):
+                    return other
+        return None
+
+    def add(self, ap):
+        """Register a listing (ignored if price or rooms are unknown)."""
+        fp = fingerprint(ap)
+        if fp is not None:
+            self._insert(fp)
+
+    def recent(self, now=None):
+        """Get the fingerprints worth keeping, newest last."""
+        now = time.time() if now is None else now
+        cutoff = now - MAX_AGE_DAYS * 86400
+        return [fp for fp in self.entries if fp["seen"] >= cutoff][-MAX_FINGERPRINTS:]
+
+    def trim(self, now=None):
+        """Drop the fingerprints not worth keeping (see recent()), in place."""
+        kept = self.recent(now)
+        if len(kept) < len(self.entries):
+            self.entries = []
+            self._buckets = defaultdict(list)
+            for fp in kept:
+                self._insert(fp)
+
+
+def load_fingerprints():
+    """
+    Load the fingerprint history.
+
+    Returns:
+        FingerprintIndex: Index of recently seen listings (empty on error)
+    """
+    try:
+        if FINGERPRINT_FILE.exists():
+            data = json.loads(FINGERPRINT_FILE.read_text(encoding='utf-8'))
+            if isinstance(data, list):
+                return FingerprintIndex(data)
+            logger.warning("fingerprints.json contains invalid data, resetting")
+        return FingerprintIndex()
+    except Exception as e:
+        logger.error(f"Failed to load fingerprints.json: {e}. Resetting history.")
+        return FingerprintIndex()
+
+
+def save_fingerprints(index):
+    """Trim a fingerprint index to its recent part and save it using atomic write."""
+    try:
+        index.trim()
+        entries = index.entries
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            dir=FINGERPRINT_FILE.parent,
+            delete=False,
+            suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(entries, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        temp_path.replace(FINGERPRINT_FILE)
+        logger.debug(f"Saved {len(entries)} listing fingerprints")
+
+    except Exception as e:
+        logger.error(f"Failed to save fingerprints.json: {e}", exc_info=True)
@@ -0,0 +1,258 @@
+"""
+Detail-page enrichment for incomplete listings.
+
+Listing cards often lack expensas (MercadoLibre), rooms or a usable
+address. Only listings that are missing one of these and still pass the
+cheap checks for at least one user are candidates; their detail page is
+fetched by a small worker pool, the missing fields are filled in and the
+listing is matched again downstream. Results are cached per URL for
+CACHE_TTL_DAYS and each cycle fetches at most MAX_FETCHES_PER_CYCLE pages,
+so the cost follows the number of candidates, not of listings.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import http_session
+from location_filter import filter_by_location
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = Path("details.json")
+CACHE_TTL_DAYS = 7            # Detail page results are reused this long
+FAILED_TTL_HOURS = 6          # Failed fetches are retried after this long
+MAX_FETCHES_PER_CYCLE = 10    # Detail pages fetched per cycle at most
+WORKERS = 4                   # Concurrent detail page fetches
+
+ENRICHED_FIELDS = ("rooms", "expensas", "address")
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+}
+
+
+def missing_fields(ap):
+    """Get the enrichable fields a listing lacks."""
+    return [field for field in ENRICHED_FIELDS if ap.get(field) in (None, "")]
+
+
+def could_match(ap, criteria):
+    """
+    Check the criteria that can be decided with the fields a listing has.
+
+    Like filters.matches, but unknown rooms and expensas do not reject the
+    listing, since a detail page may still provide them.
+    """
+    if ap.get("price") is None:
+        return False
+    if criteria.get("min_price") is not None and ap["price"] < criteria["min_price"]:
+        return False
+    if ap["price"] > criteria["max_price"]:
+        return False
+
+    rooms = ap.get("rooms")
+    if rooms is not None:
+        if rooms < criteria["min_rooms"]:
+            return False
+        if criteria.get("max_rooms") is not None and rooms > criteria["max_rooms"]:
+            return False
+
+    if ap.get("expensas") is not None and ap["expensas"] > criteria["max_expensas"]:
+        return False
+
+    return filter_by_location(ap, include_unknown=True)
+
+
+def _parse_amount(text):
+    digits = text.replace(".", "").replace(",", "")
+    return int(digits) if digits.isdigit() else None
+
+
+def parse_detail(text):
+    """
+    Extract rooms and expensas from the text of a detail page.
+
+    Returns:
+        dict: Fields found (rooms, expensas)
+    """
+    text = text.lower()
+    fields = {}
+
+    match = re.search(r'(\d+)\s*amb(?:iente)?s?\b', text)
+    if match:
+        fields["rooms"] = int(match.group(1))
+    else:
+        match = re.search(r'(\d+)\s*dorm(?:itorio)?s?\b', text)
+        if match:
+            fields["rooms"] = int(match.group(1)) + 1  # Bedrooms + living room
+
+    match = (
+        re.search(r'expensas[:\s]*\$\s*([\d.,]+)', text)
+        or re.search(r'\$\s*([\d.,]+)\s*(?:de\s+)?expensas', text)
+    )
+    if match:
+        amount = _parse_amount(match.group(1))
+        if amount is not None:
+            fields["expensas"] = amount
+
+    return fields
+
+
+def fetch_detail(url):
+    """
+    Fetch a listing's detail page and extract its fields.
+
+    Returns:
+        dict: Fields found (rooms, expensas, address)
+    """
+    from bs4 import BeautifulSoup  # Only needed when a candidate is enriched
+
+    r = http_session.get(url, headers=HEADERS, timeout=15)
+    r.raise_for_status()
+    soup = BeautifulSoup(r.text, "lxml")
+
+    fields = parse_detail(soup.get_text(" ", strip=True))
+
+    address_elem = soup.select_one(
+        '[itemprop="streetAddress"], .property-main__address, .section-location-property, '
+        '.ui-vip-location__subtitle, .titlebar__address'
+    )
+    if address_elem:
+        address = address_elem.get_text(" ", strip=True)
+        if address:
+            fields["address"] = address
+
+    return fields
+
+
+class DetailEnricher:
+    """
+    Fills missing listing fields from detail pages.
+
+    Use is_candidate() to pick listings worth enriching, cached() for a
+    result already known, and submit() to fetch one in the worker pool.
+    """
+
+    def __init__(self, cache=None, budget=MAX_FETCHES_PER_CYCLE, workers=WORKERS, fetch=fetch_detail):
+        self.cache = cache if cache is not None else {}
+        self.budget = budget
+        self.workers = workers
+        self.fetch = fetch
+        self.fetched = 0
+        self._pool = None
+
+    def is_candidate(self, ap, user_configs):
+        """Check if a listing lacks fields and could match some user."""
+        if not ap.get("url") or not missing_fields(ap):
+            return False
+        return any(could_match(ap, config) for _, config in user_configs)
+
+    def cached(self, ap, now=None):
+        """
+        Get a listing enriched from the cache.
+
+        Returns:
+            dict: Enriched listing, or None if the URL is not cached (or expired)
+        """
+        now = time.time() if now is None else now
+        entry = self.cache.get(ap["url"])
+        if entry is None:
+            return None
+        ttl = CACHE_TTL_DAYS * 86400 if entry.get("ok") else FAILED_TTL_HOURS * 3600
+        if now - entry["fetched"] > ttl:
+            return None
+        return self._merge(ap, entry["fields"])
+
+    def submit(self, ap):
+        """
+        Fetch a listing's detail page in the worker pool.
+
+        Returns:
+            Future: Resolves to the enriched listing (never raises), or None
+                if this cycle's budget is spent
+        """
+        if self.fetched >= self.budget:
+            return None
+        self.fetched += 1
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="enrich")
+        return self._pool.submit(self._enrich, ap)
+
+    def _enrich(self, ap):
+        try:
+            fields = self.fetch(ap["url"])
+            self.cache[ap["url"]] = {"fields": fields, "fetched": time.time(), "ok": True}
+            if fields:
+                logger.debug("Enriched %s with %s", ap["id"], sorted(fields))
+        except Exception as e:
+            logger.warning(f"Detail page fetch failed for {ap['url']}: {e}")
+            self.cache[ap["url"]] = {"fields": {}, "fetched": time.time(), "ok": False}
+            fields = {}
+        return self._merge(ap, fields)
+
+    @staticmethod
+    def _merge(ap, fields):
+        """Fill only the fields the listing lacks."""
+        missing = missing_fields(ap)
+        updates = {field: fields[field] for field in missing if fields.get(field) not in (None, "")}
+        return dict(ap, **updates) if updates else ap
+
+    def close(self):
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self.fetched:
+            logger.info(f"Fetched {self.fetched} detail pages (budget {self.budget})")
+
+
+def load_detail_cache():
+    """
+    Load cached detail page results.
+
+    Returns:
+        dict: URL -> {"fields", "fetched", "ok"} (empty on error)
+    """
+    try:
+        if CACHE_FILE.exists():
+            data = json.loads(CACHE_FILE.read_text(encoding='utf-8'))
+            if isinstance(data, dict):
+                return data
+            logger.warning("details.json contains invalid data, resetting")
+        return {}
+    except Exception as e:
+        logger.error(f"Failed to load details.json: {e}. Resetting cache.")
+        return {}
+
+
+def save_detail_cache(cache, now=None):
+    """Drop expired results from the cache and save it using atomic write."""
+    now = time.time() if now is None else now
+    cutoff = now - CACHE_TTL_DAYS * 86400
+    try:
+        for url in [url for url, entry in cache.items() if entry["fetched"] < cutoff]:
+            del cache[url]
+        entries = dict(cache)
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            dir=CACHE_FILE.parent,
+            delete=False,
+            suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(entries, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        temp_path.replace(CACHE_FILE)
+        logger.debug(f"Saved {len(entries)} cached detail pages")
+
+    except Exception as e:
+        logger.error(f"Failed to save details.json: {e}", exc_info=True)
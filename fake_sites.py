@@ -0,0 +1,427 @@
+"""
+Local stand-in for the listing sites, for offline end-to-end and load tests.
+
+Serves synthetic result and detail pages for ArgenProp, Inmobusqueda,
+ZonaProp and MercadoLibre in each site's URL scheme, one site per path
+prefix (http://HOST:PORT/argenprop, /inmobusqueda, ...). Listings are
+generated deterministically from a seed, newest first, and CHURN new ones
+are published per site every minute, so repeated cycles see a realistic
+trickle of new listings.
+
+Slow or flaky sites are simulated with:
+- latency: fixed delay plus random jitter per request
+- error rate: fraction of requests answered with HTTP 500
+- block rate: fraction of requests answered with a Cloudflare-like challenge
+- pages: pagination depth (later pages return no results)
+
+ZonaProp and MercadoLibre result pages also embed their listings as page
+state, like the real sites; with embedded_state off (--dom-only) the
+scrapers have to fall back to parsing the cards.
+
+Point the scrapers at it through their base-URL env vars:
+
+    python fake_sites.py --port 8765 --latency 0.2 --jitter 0.3 --error-rate 0.05
+    export ARGENPROP_BASE_URL=http://127.0.0.1:8765/argenprop   (all four are printed on start)
+    python run_once.py
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("argenprop", "inmobusqueda", "zonaprop", "mercadolibre")
+
+# Base-URL env var read by each scraper
+BASE_URL_ENV = {
+    "argenprop": "ARGENPROP_BASE_URL",
+    "inmobusqueda": "INMOBUSQUEDA_BASE_URL",
+    "zonaprop": "ZONAPROP_BASE_URL",
+    "mercadolibre": "MERCADOLIBRE_BASE_URL",
+}
+
+PER_PAGE = {"argenprop": 20, "inmobusqueda": 20, "zonaprop": 20, "mercadolibre": 48}
+INITIAL_LISTINGS = 200       # Listings per site when the server starts
+FIRST_ID = 10_000_000        # Listing IDs count up from here
+
+_CHALLENGE = (
+    "<html><head><title>Just a moment...</title></head>"
+    "<body><div id='challenge-platform'>Checking your browser</div></body></html>"
+)
+
+_STREETS = list(range(1, 33)) + list(range(35, 73))
+_OUTSKIRTS = ["City Bell", "Gonnet", "Villa Elisa", "Tolosa", "Los Hornos", "Ringuelet"]
+
+
+def make_listing(source, k, seed=0):
+    """
+    Build the k-th synthetic listing of a site (same inputs, same listing).
+
+    Returns:
+        dict: Listing fields (id, price, expensas, rooms, address)
+    """
+    rng = random.Random(f"{seed}:{source}:{k}")
+    rooms = rng.choice((1, 1, 2, 2, 2, 3, 3, 4))
+    price = rng.randrange(150, 450 + 150 * rooms, 5) * 1000
+    expensas = rng.choice((None, 0)) if rng.random() < 0.15 else rng.randrange(20, 160, 5) * 1000
+
+    if rng.random() < 0.1:
+        address = f"Calle {rng.randrange(400, 520)} {rng.randrange(1000, 3000)}, {rng.choice(_OUTSKIRTS)}"
+    else:
+        street = rng.choice(_STREETS)
+        cross = rng.choice(_STREETS)
+        address = f"{street} e/ {cross} y {cross + 1}, La Plata"
+
+    return {"id": FIRST_ID + k, "price": price, "expensas": expensas, "rooms": rooms, "address": address}
+
+
+def _money(amount):
+    return f"{amount:,}".replace(",", ".")
+
+
+class FakeSites:
+    """
+    Synthetic listing catalog shared by every site.
+
+    Args:
+        latency: Fixed delay per request (seconds)
+        jitter: Extra random delay per request, up to this many seconds
+        error_rate: Fraction of requests answered with HTTP 500
+        block_rate: Fraction of requests answered with a challenge page
+        pages: Pagination depth; later pages have no results
+        churn: New listings published per site per minute
+        seed: Seed for listings and simulated failures
+        embedded_state: Embed ZonaProp and MercadoLibre listings as page state
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, block_rate=0.0,
+                 pages=5, churn=1.0, seed=0, embedded_state=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.block_rate = block_rate
+        self.pages = pages
+        self.churn = churn
+        self.seed = seed
+        self.embedded_state = embedded_state
+        self.started = time.time()
+        self.stats = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def total(self, now=None):
+        """Number of listings published on each site so far."""
+        now = time.time() if now is None else now
+        return INITIAL_LISTINGS + int((now - self.started) * self.churn / 60)
+
+    def page_listings(self, source, page, now=None):
+        """Get the listings shown on a result page, newest first."""
+        if page < 1 or page > self.pages:
+            return []
+        per_page = PER_PAGE[source]
+        newest = self.total(now) - 1
+        start = newest - (page - 1) * per_page
+        return [make_listing(source, k, self.seed) for k in range(start, max(start - per_page, -1), -1)]
+
+    def fault(self):
+        """
+        Pick the simulated outcome of a request after its delay.
+
+        Returns:
+            str: "error", "blocked" or None for a regular answer
+        """
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            roll = self._rng.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.error_rate:
+            return "error"
+        if roll < self.error_rate + self.block_rate:
+            return "blocked"
+        return None
+
+    def record(self, source, outcome):
+        with self._lock:
+            self.stats[(source, outcome)] += 1
+
+
+# --- Result pages, one renderer per site -------------------------------------
+
+def _render_argenprop(listings, base):
+    cards = []
+    for ap in listings:
+        expensas = f"+ ${_money(ap['expensas'])} expensas" if ap["expensas"] else ""
+        cards.append(
+            f'<div class="listing__item"><a href="/departamento-en-alquiler-en-la-plata--{ap["id"]}">'
+            f'<p class="card__price">${_money(ap["price"])}{expensas}</p>'
+            f'<p class="card__address">{ap["address"]}</p>'
+            f'<ul class="card__main-features"><li>{ap["rooms"]} amb.</li></ul></a></div>'
+        )
+    return cards
+
+
+def _render_inmobusqueda(listings, base):
+    cards = []
+    for ap in listings:
+        expensas = f" Expensas : ${ap['expensas']}" if ap["expensas"] else ""
+        cards.append(
+            f'<div class="resultadoContenedorDatosResultados">'
+            f'<a href="/ficha-departamento-alquiler-la-plata?id={ap["id"]}">Departamento en alquiler</a>'
+            f'<div class="resultadoPrecio">${_money(ap["price"])}{expensas}</div>'
+            f'<div class="resultadoTipo">{ap["rooms"]} amb</div>'
+            f'<div class="resultadoLocalidad">{ap["address"]}</div></div>'
+        )
+    return cards
+
+
+def _render_zonaprop(listings, base):
+    cards = []
+    for ap in listings:
+        expensas = f'<div>$ {_money(ap["expensas"])} Expensas</div>' if ap["expensas"] else ""
+        cards.append(
+            f'<div data-posting-type="PROPERTY">'
+            f'<a href="/propiedades/departamento-en-alquiler-la-plata-{ap["id"]}.html">Ver</a>'
+            f'<div>$ {_money(ap["price"])}</div>{expensas}'
+            f'<div>{ap["rooms"]} amb.</div><div>{ap["address"]}</div></div>'
+        )
+    return cards
+
+
+def _render_mercadolibre(listings, base):
+    cards = []
+    for ap in listings:
+        url = f"{base}/MLA-{ap['id']}-departamento-en-alquiler-la-plata-_JM"
+        cards.append(
+            f'<li class="ui-search-layout__item"><div class="poly-card">'
+            f'<a href="{url}">Departamento en alquiler</a>'
+            f'<span class="andes-money-amount__fraction">{_money(ap["price"])}</span>'
+            f'<ul><li>{ap["rooms"]} ambientes</li></ul>'
+            f'<span class="poly-component__location">{ap["address"]}</span></div></li>'
+        )
+    return cards
+
+
+def _zonaprop_state(listings, base):
+    postings = [
+        {
+            "postingId": str(ap["id"]),
+            "url": f"/propiedades/departamento-en-alquiler-la-plata-{ap['id']}.html",
+            "priceOperationTypes": [{"prices": [{"amount": ap["price"], "currency": "$"}]}],
+            "expenses": {"amount": ap["expensas"], "currency": "$"} if ap["expensas"] else None,
+            "mainFeatures": {"CFT1": {"label": "Ambientes", "value": str(ap["rooms"])}},
+            "postingLocation": {"address": {"name": ap["address"]}},
+        }
+        for ap in listings
+    ]
+    state = json.dumps({"listStore": {"listPostings": postings}})
+    return f"<script>window.__PRELOADED_STATE__ = {state};</script>"
+
+
+def _mercadolibre_state(listings, base):
+    results = [
+        {"polycard": {
+            "metadata": {"id": f"MLA{ap['id']}", "url": f"{base}/MLA-{ap['id']}-departamento-en-alquiler-la-plata-_JM"},
+            "components": [
+                {"type": "price", "price": {"current_price": {"value": ap["price"], "currency": "ARS"}}},
+                {"type": "attributes_list", "attributes_list": {"texts": [f"{ap['rooms']} ambientes"]}},
+                {"type": "location", "location": {"text": ap["address"]}},
+            ],
+        }}
+        for ap in listings
+    ]
+    state = json.dumps({"pageState": {"initialState": {"results": results}}})
+    return f'<script id="__PRELOADED_STATE__" type="application/json">{state}</script>'
+
+
+_STATE_RENDERERS = {
+    "zonaprop": _zonaprop_state,
+    "mercadolibre": _mercadolibre_state,
+}
+
+_RENDERERS = {
+    "argenprop": _render_argenprop,
+    "inmobusqueda": _render_inmobusqueda,
+    "zonaprop": _render_zonaprop,
+    "mercadolibre": _render_mercadolibre,
+}
+
+
+def _result_page_number(source, path, query):
+    """
+    Map a request to a result page number in the site's URL scheme.
+
+    Returns:
+        int: Page number, or None if the URL is not a result page
+    """
+    if source == "argenprop":
+        if path != "/departamentos/alquiler/la-plata":
+            return None
+        match = re.search(r"-pagina-(\d+)$", query)
+        return int(match.group(1)) if match else 1
+    if source == "inmobusqueda":
+        match = re.fullmatch(r"/departamento-alquiler-la-plata-casco-urbano(?:-pagina-(\d+))?\.html", path)
+    elif source == "zonaprop":
+        match = re.fullmatch(r"/departamentos-alquiler-la-plata-orden-publicado-descendente(?:-pagina-(\d+))?\.html", path)
+    else:
+        match = re.fullmatch(r"/departamentos/alquiler/la-plata_OrderId_BEGINS\*DESC(?:_Desde_(\d+))?", path)
+        if match and match.group(1):
+            return (int(match.group(1)) - 1) // PER_PAGE[source] + 1
+    if not match:
+        return None
+    return int(match.group(1)) if match.group(1) else 1
+
+
+def _detail_listing_id(path, query):
+    """Get the listing ID a detail page URL refers to (None if not a detail page)."""
+    match = (
+        re.search(r"--(\d+)$", path)
+        or re.search(r"/propiedades/.*-(\d+)\.html$", path)
+        or re.search(r"/MLA-(\d+)-", path)
+        or (path.startswith("/ficha") and re.search(r"id=(\d+)", query))
+    )
+    return int(match.group(1)) if match else None
+
+
+def render(sites, source, path, query, base):
+    """
+    Render the page for a request to one site.
+
+    Returns:
+        tuple: (HTTP status, HTML body, page kind for stats)
+    """
+    page = _result_page_number(source, path, query)
+    if page is not None:
+        listings = sites.page_listings(source, page)
+        cards = _RENDERERS[source](listings, base)
+        if sites.embedded_state and source in _STATE_RENDERERS:
+            cards.append(_STATE_RENDERERS[source](listings, base))
+        body = f"<html><head><title>Departamentos en alquiler</title></head><body>{''.join(cards)}</body></html>"
+        return 200, body, "results"
+
+    listing_id = _detail_listing_id(path, query)
+    if listing_id is not None and FIRST_ID <= listing_id < FIRST_ID + sites.total():
+        ap = make_listing(source, listing_id - FIRST_ID, sites.seed)
+        expensas = f"Expensas: ${_money(ap['expensas'])}" if ap["expensas"] else ""
+        body = (
+            f"<html><head><title>Departamento en alquiler</title></head><body>"
+            f"<h1>Departamento de {ap['rooms']} ambientes</h1>"
+            f"<p>Alquiler ${_money(ap['price'])}</p><p>{expensas}</p>"
+            f'<span itemprop="streetAddress">{ap["address"]}</span></body></html>'
+        )
+        return 200, body, "detail"
+
+    return 404, "<html><head><title>Not found</title></head></html>", "not_found"
+
+
+def _make_handler(sites):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real sites
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            source, _, rest = parts.path.lstrip("/").partition("/")
+            if source not in SOURCES:
+                self._send(404, "<html><head><title>Not found</title></head></html>")
+                return
+
+            outcome = sites.fault()
+            if outcome == "error":
+                status, body = 500, "<html><head><title>Internal Server Error</title></head></html>"
+            elif outcome == "blocked":
+                status, body = 403, _CHALLENGE
+            else:
+                base = f"http://{self.headers.get('Host', '127.0.0.1')}/{source}"
+                status, body, outcome = render(sites, source, "/" + rest, parts.query, base)
+            sites.record(source, outcome)
+            self._send(status, body)
+
+        def _send(self, status, body):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return Handler
+
+
+def start_server(sites, host="127.0.0.1", port=0):
+    """
+    Serve the stand-in sites from a background thread.
+
+    Args:
+        sites: FakeSites catalog and fault settings
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+
+    Returns:
+        ThreadingHTTPServer: Running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(sites))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-sites", daemon=True).start()
+    return server
+
+
+def base_urls(server):
+    """
+    Get the base-URL env vars that point every scraper at a running server.
+
+    Returns:
+        dict: Env var name -> base URL
+    """
+    host, port = server.server_address[:2]
+    return {BASE_URL_ENV[source]: f"http://{host}:{port}/{source}" for source in SOURCES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve stand-in listing sites for offline testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay per request, up to (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Fraction of requests answered with a challenge page")
+    parser.add_argument("--pages", type=int, default=5, help="Pagination depth")
+    parser.add_argument("--churn", type=float, default=1.0, help="New listings per site per minute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dom-only", action="store_true", help="Don't embed page state (forces the scrapers' card parsing)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    sites = FakeSites(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        block_rate=args.block_rate, pages=args.pages, churn=args.churn, seed=args.seed,
+        embedded_state=not args.dom_only,
+    )
+    server = start_server(sites, args.host, args.port)
+
+    print("Point the scrapers at the stand-in sites with:")
+    for name, url in base_urls(server).items():
+        print(f"  export {name}={url}")
+
+    try:
+        while True:
+            time.sleep(60)
+            summary = ", ".join(f"{source}/{outcome}={count}" for (source, outcome), count in sorted(sites.stats.items()))
+            logger.info(f"{sites.total()} listings per site | requests: {summary or 'none'}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
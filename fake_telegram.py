@@ -0,0 +1,312 @@
+"""
+Local stand-in for the Telegram Bot API, with rate-limit emulation.
+
+Implements sendMessage and getUpdates (plus getMe and a generic "ok" for
+other methods, enough for python-telegram-bot to start) and enforces
+Telegram-like flood control:
+
+- at most GLOBAL_RATE messages per second across all chats
+- at most CHAT_RATE messages per second to the same chat
+
+Messages over a limit get HTTP 429 with ``parameters.retry_after``, like
+the real API. Latency, jitter and a 5xx error rate can be injected, and
+every accepted message is recorded with its chat and delivery time, so the
+notifier's throughput and retry behavior can be measured without a network.
+
+Point the notifier (and the bot) at it with TELEGRAM_API_BASE:
+
+    python fake_telegram.py --port 8081 --latency 0.05 --error-rate 0.02
+    export TELEGRAM_API_BASE=http://127.0.0.1:8081
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30      # Messages per second across all chats
+CHAT_RATE = 1         # Messages per second to one chat
+WINDOW = 1.0          # Rate limit window (seconds)
+MAX_POLL_TIMEOUT = 5  # Longest getUpdates long-poll served (seconds)
+
+
+class FakeTelegram:
+    """
+    Bot API state: rate limit windows, delivered messages and pending updates.
+
+    Args:
+        global_rate: Messages per WINDOW across all chats
+        chat_rate: Messages per WINDOW to one chat
+        latency: Fixed delay per request (seconds)
+        jitter: Extra random delay per request, up to this many seconds
+        error_rate: Fraction of requests answered with HTTP 502
+        seed: Seed for latency and injected errors
+    """
+
+    def __init__(self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, latency=0.0, jitter=0.0,
+                 error_rate=0.0, seed=0):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.delivered = []            # {"message_id", "chat_id", "text", "time"} in delivery order
+        self.stats = Counter()
+        self._sent = deque()           # Delivery times within the window, all chats
+        self._sent_per_chat = defaultdict(deque)
+        self._updates = []
+        self._next_update_id = 1
+        self._rng = random.Random(seed)
+        self._lock = threading.Condition()
+
+    def delay(self):
+        """
+        Sleep for the request's simulated latency.
+
+        Returns:
+            bool: True if the request should fail with a server error
+        """
+        with self._lock:
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+            failed = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        return failed
+
+    def send_message(self, chat_id, text, now=None):
+        """
+        Deliver a message unless it breaks a rate limit.
+
+        Returns:
+            tuple: (delivered message dict or None, retry_after seconds or None)
+        """
+        now = time.monotonic() if now is None else now
+        chat_id = str(chat_id)
+        with self._lock:
+            chat_sent = self._sent_per_chat[chat_id]
+            for window in (self._sent, chat_sent):
+                while window and window[0] <= now - WINDOW:
+                    window.popleft()
+
+            wait = 0.0
+            if len(self._sent) >= self.global_rate:
+                wait = self._sent[0] + WINDOW - now
+            if len(chat_sent) >= self.chat_rate:
+                wait = max(wait, chat_sent[0] + WINDOW - now)
+            if wait > 0:
+                self.stats["rate_limited"] += 1
+                return None, max(1, math.ceil(wait))
+
+            self._sent.append(now)
+            chat_sent.append(now)
+            message = {
+                "message_id": len(self.delivered) + 1,
+                "chat_id": chat_id,
+                "text": text,
+                "time": time.time(),
+            }
+            self.delivered.append(message)
+            self.stats["delivered"] += 1
+            return message, None
+
+    def push_update(self, chat_id, text):
+        """Queue an incoming message for getUpdates (e.g. a user's /start)."""
+        with self._lock:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append({
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": int(chat_id), "type": "private"},
+                    "from": {"id": int(chat_id), "is_bot": False, "first_name": "Test"},
+                    "text": text,
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+                    if text.startswith("/") else [],
+                },
+            })
+            self._lock.notify_all()
+            return update_id
+
+    def get_updates(self, offset=0, timeout=0):
+        """
+        Get updates from ``offset`` on, waiting up to ``timeout`` for one.
+
+        Updates before ``offset`` are confirmed and dropped, like the real API.
+        """
+        deadline = time.monotonic() + min(timeout, MAX_POLL_TIMEOUT)
+        with self._lock:
+            if offset:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._lock.wait(deadline - time.monotonic())
+            return list(self._updates)
+
+    def throughput(self):
+        """
+        Summarize the delivered messages.
+
+        Returns:
+            dict: Delivered count, messages per second and the largest gap
+                between consecutive deliveries (seconds)
+        """
+        times = [message["time"] for message in self.delivered]
+        if len(times) < 2:
+            return {"delivered": len(times), "per_second": None, "max_gap": None}
+        span = times[-1] - times[0]
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        return {
+            "delivered": len(times),
+            "per_second": (len(times) - 1) / span if span else None,
+            "max_gap": max(gaps),
+        }
+
+
+def _error(code, description, **parameters):
+    body = {"ok": False, "error_code": code, "description": description}
+    if parameters:
+        body["parameters"] = parameters
+    return code, body
+
+
+def handle(api, method, params):
+    """
+    Answer one Bot API call.
+
+    Returns:
+        tuple: (HTTP status, JSON body)
+    """
+    if method == "sendMessage":
+        if not params.get("chat_id") or not params.get("text"):
+            return _error(400, "Bad Request: chat_id and text are required")
+        message, retry_after = api.send_message(params["chat_id"], params["text"])
+        if message is None:
+            return _error(429, f"Too Many Requests: retry after {retry_after}", retry_after=retry_after)
+        return 200, {"ok": True, "result": {
+            "message_id": message["message_id"],
+            "date": int(message["time"]),
+            "chat": {"id": int(message["chat_id"]) if message["chat_id"].lstrip("-").isdigit()
+                     else message["chat_id"], "type": "private"},
+            "text": message["text"],
+        }}
+
+    if method == "getUpdates":
+        updates = api.get_updates(int(params.get("offset") or 0), float(params.get("timeout") or 0))
+        return 200, {"ok": True, "result": updates}
+
+    if method == "getMe":
+        return 200, {"ok": True, "result": {
+            "id": 1, "is_bot": True, "first_name": "Fake Bot", "username": "fake_bot",
+            "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False,
+        }}
+
+    return 200, {"ok": True, "result": True}  # setMyCommands, deleteWebhook, ...
+
+
+def _parse_params(handler, query):
+    """Read call parameters from the query string and a JSON or form body."""
+    params = dict(parse_qsl(query))
+    length = int(handler.headers.get("Content-Length") or 0)
+    if not length:
+        return params
+    body = handler.rfile.read(length).decode("utf-8")
+    if "json" in (handler.headers.get("Content-Type") or ""):
+        params.update(json.loads(body or "{}"))
+    else:
+        params.update(parse_qsl(body))
+    return params
+
+
+def _make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _call(self):
+            parts = urlsplit(self.path)
+            token, _, method = parts.path.lstrip("/").partition("/")
+            params = _parse_params(self, parts.query)
+            if not token.startswith("bot") or not method:
+                status, body = _error(404, "Not Found")
+            elif api.delay():
+                status, body = _error(502, "Bad Gateway")
+            else:
+                status, body = handle(api, method, params)
+            api.stats[f"{method or '?'}:{status}"] += 1
+
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = _call
+        do_POST = _call
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return Handler
+
+
+def start_server(api, host="127.0.0.1", port=0):
+    """
+    Serve the fake Bot API from a background thread.
+
+    Returns:
+        ThreadingHTTPServer: Running server (call shutdown() to stop it)
+    """
+    server = ThreadingHTTPServer((host, port), _make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-telegram", daemon=True).start()
+    return server
+
+
+def api_base(server):
+    """Get the TELEGRAM_API_BASE value for a running server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Telegram Bot API with rate limits")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--global-rate", type=int, default=GLOBAL_RATE, help="Messages per second, all chats")
+    parser.add_argument("--chat-rate", type=int, default=CHAT_RATE, help="Messages per second to one chat")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fixed delay per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay per request, up to (seconds)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 502")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    api = FakeTelegram(
+        global_rate=args.global_rate, chat_rate=args.chat_rate, latency=args.latency,
+        jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+    )
+    server = start_server(api, args.host, args.port)
+    print(f"export TELEGRAM_API_BASE={api_base(server)}")
+
+    try:
+        while True:
+            time.sleep(30)
+            summary = api.throughput()
+            rate = f"{summary['per_second']:.1f}/s" if summary["per_second"] else "n/a"
+            logger.info(f"{summary['delivered']} delivered ({rate}) | {dict(api.stats)}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Fan-out of a cycle's listings to sharded notifier processes.
+
+With NOTIFY_SHARDS > 1 the cron job scrapes once and, instead of matching
+and sending in its own process, publishes the cycle's new listings to
+OUTBOX_DIR and starts one notifier process per shard. Users are
+hash-partitioned by user ID, so every shard matches and sends for its own
+users in parallel:
+
+    outbox/<cycle>/manifest.json      shard count
+                  /listings.json      listings to match
+                  /shard-0.progress   one "listing_id user_id" line per message delivered
+                  /shard-0.done       shard stats, written when the shard finished
+
+The publisher waits for every shard to finish (the completion barrier) and
+removes the cycle once all of them are done. A shard that crashed leaves no
+.done file; the next run resumes it and skips the messages its progress
+file records, so nobody gets a message twice. A cycle is run at most
+MAX_ATTEMPTS times; after that its unfinished shards are given up.
+
+Shard processes log to stderr (inherited from the publisher), not to the
+publisher's rotating log file. They read their users straight from the
+user store: if that fails the shard exits non-zero without a .done file,
+so its messages are retried instead of lost. The USER_CONFIGS env var is
+applied once, by the publisher, before the shards start.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from functools import partial
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DIR = Path(os.getenv("OUTBOX_DIR", "outbox"))
+
+MANIFEST_FILE = "manifest.json"
+LISTINGS_FILE = "listings.json"
+
+MAX_ATTEMPTS = int(os.getenv("FANOUT_MAX_ATTEMPTS", "3"))  # Runs of a cycle before it is dropped
+
+
+def shard_of(user_id, shards):
+    """Shard that owns a user (stable across processes, unlike hash())."""
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+def _write_json(path, data):
+    """Write JSON atomically."""
+    with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=path.parent, delete=False, suffix='.tmp') as f:
+        temp_path = Path(f.name)
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    temp_path.replace(path)
+
+
+def publish(listings, shards, root=None):
+    """
+    Publish a cycle's listings for the notifier shards.
+
+    Args:
+        listings: Listings to match and send
+        shards: Number of notifier shards
+        root: Outbox directory
+
+    Returns:
+        Path: The cycle directory
+    """
+    root = Path(root) if root is not None else OUTBOX_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=root, prefix=".tmp-"))
+    _write_json(tmp / LISTINGS_FILE, list(listings))
+    _write_json(tmp / MANIFEST_FILE, {"shards": shards, "created": time.time()})
+    cycle = root / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    tmp.rename(cycle)  # Shards never see a half-written cycle
+    return cycle
+
+
+def pending_cycles(root=None):
+    """Get published cycles that still have unfinished shards, oldest first."""
+    root = Path(root) if root is not None else OUTBOX_DIR
+    if not root.exists():
+        return []
+    return sorted(
+        path for path in root.iterdir()
+        if path.is_dir() and not path.name.startswith(".") and (path / MANIFEST_FILE).exists()
+    )
+
+
+def load_manifest(cycle):
+    """Get a cycle's manifest (shard count, creation time, attempts)."""
+    return json.loads((cycle / MANIFEST_FILE).read_text(encoding='utf-8'))
+
+
+def incomplete_shards(cycle):
+    """Get the shards of a cycle that have not written their .done file."""
+    shards = load_manifest(cycle)["shards"]
+    return [shard for shard in range(shards) if not (cycle / f"shard-{shard}.done").exists()]
+
+
+def load_progress(cycle, shard):
+    """
+    Get the messages a shard already delivered.
+
+    Returns:
+        set: (listing_id, user_id) pairs
+    """
+    path = cycle / f"shard-{shard}.progress"
+    if not path.exists():
+        return set()
+    delivered = set()
+    for line in path.read_text(encoding='utf-8').splitlines():
+        parts = line.split(" ")
+        if len(parts) == 2:  # A crash mid-write can leave a partial last line
+            delivered.add(tuple(parts))
+    return delivered
+
+
+def run_shard(cycle, shard, send):
+    """
+    Match, rank and send a cycle's listings for the users of one shard.
+
+    Args:
+        cycle: Cycle directory
+        shard: Shard number
+        send: Callable send(user_id, listing)
+
+    Returns:
+        dict: "listings", "sent", "failed" and "skipped" counts, plus the IDs
+            of the listings selected for this shard's users ("selected") and
+            of the matched ones none of them kept ("overflow")
+
+    Raises:
+        Exception: If the user store can't be read (the shard stays unfinished)
+    """
+    from pipeline import iter_matches, iter_top_k, notify_sink
+    from user_config import get_store
+
+    cycle = Path(cycle)
+    shards = load_manifest(cycle)["shards"]
+    listings = json.loads((cycle / LISTINGS_FILE).read_text(encoding='utf-8'))
+    # Errors propagate: a shard that can't read its users must not write .done
+    user_configs = [
+        (user_id, config) for user_id, config in get_store(import_env=False).active_configs()
+        if shard_of(user_id, shards) == shard
+    ]
+    delivered = load_progress(cycle, shard)
+    logger.info(f"Shard {shard}/{shards}: {len(listings)} listings, {len(user_configs)} users, "
+                f"{len(delivered)} already delivered")
+
+    stats = {"skipped": 0}
+    selected = []
+    overflow = []
+    with open(cycle / f"shard-{shard}.progress", "a", encoding='utf-8') as progress:
+        def send_once(user_id, ap):
+            if (ap["id"], str(user_id)) in delivered:
+                stats["skipped"] += 1
+                return
+            send(user_id, ap)
+            progress.write(f"{ap['id']} {user_id}\n")
+            progress.flush()
+
+        sink = notify_sink(send_once, stats)
+        for item in iter_top_k(iter_matches(listings, user_configs), user_configs, overflow=overflow):
+            selected.append(item[0]["id"])
+            sink(item)
+
+    stats["sent"] -= stats["skipped"]
+    stats["selected"] = selected
+    stats["overflow"] = [ap["id"] for ap in overflow]
+    _write_json(cycle / f"shard-{shard}.done", stats)
+    return stats
+
+
+def _shard_main(cycle, shard, token):
+    """Entry point of a notifier process."""
+    from notifier import send_message
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - shard {shard} - %(levelname)s - %(message)s'
+    )
+    run_shard(cycle, shard, partial(send_message, token))
+
+
+def run_cycle(cycle, token):
+    """
+    Run the unfinished shards of a cycle in parallel and wait for all of them.
+
+    The cycle is removed when every shard is done; otherwise it stays in
+    the outbox to be resumed, unless it has been run MAX_ATTEMPTS times.
+
+    Args:
+        cycle: Cycle directory
+        token: Telegram bot token
+
+    Returns:
+        dict: "sent", "failed" and "skipped" counts summed over the shards,
+            "crashed" (shards that did not finish), "listings" (listings
+            selected for some user) and "overflow" (IDs of matched listings
+            no user kept)
+    """
+    from user_config import get_store
+
+    manifest = load_manifest(cycle)
+    attempts = manifest.get("attempts", 0) + 1
+    _write_json(cycle / MANIFEST_FILE, dict(manifest, attempts=attempts))
+
+    try:
+        get_store()  # Applies USER_CONFIGS here, once, instead of in every shard
+    except Exception as e:
+        logger.error(f"Failed to open the user store: {e}")
+
+    # Spawn, not fork: the parent runs a logging thread and maybe Playwright
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=_shard_main, args=(str(cycle), shard, token), name=f"notify-shard-{shard}")
+        for shard in incomplete_shards(cycle)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:  # Completion barrier
+        worker.join()
+        if worker.exitcode != 0:
+            logger.error(f"{worker.name} exited with code {worker.exitcode}; it will resume next run")
+
+    stats = {"sent": 0, "failed": 0, "skipped": 0}
+    selected, overflow = set(), set()
+    for done in cycle.glob("shard-*.done"):
+        shard_stats = json.loads(done.read_text(encoding='utf-8'))
+        for key in stats:
+            stats[key] += shard_stats.get(key, 0)
+        selected.update(shard_stats.get("selected", ()))
+        overflow.update(shard_stats.get("overflow", ()))
+    stats["listings"] = len(selected)
+    stats["overflow"] = sorted(overflow - selected)
+    stats["crashed"] = len(incomplete_shards(cycle))
+    if not stats["crashed"]:
+        shutil.rmtree(cycle, ignore_errors=True)
+    elif attempts >= MAX_ATTEMPTS:
+        logger.error(f"Giving up on notification cycle {cycle.name} after {attempts} attempts "
+                     f"({stats['crashed']} shards unfinished)")
+        shutil.rmtree(cycle, ignore_errors=True)
+    return stats
+
+
+def fan_out(listings, token, shards, root=None):
+    """
+    Resume unfinished cycles, then publish and send this cycle's listings.
+
+    Args:
+        listings: Listings to match and send
+        token: Telegram bot token
+        shards: Number of notifier processes
+        root: Outbox directory
+
+    Returns:
+        dict: Stats of this cycle (see run_cycle)
+    """
+    for cycle in pending_cycles(root):
+        logger.info(f"Resuming unfinished notification cycle {cycle.name}")
+        run_cycle(cycle, token)
+
+    cycle = publish(listings, shards, root)
+    return run_cycle(cycle, token)
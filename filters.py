@@ -1,3 +1,6 @@
+import threading
+from functools import lru_cache
+
 from location_filter import filter_by_location
 
 
@@ -28,3 +31,68 @@ def matches(ap, criteria):
         return False
 
     return True
+
+
+# Rejections per check, observed across all compiled predicates. Checks that
+# reject more listings run first in predicates compiled later. Predicates run
+# in the pipeline's worker threads, so updates hold _rejections_lock.
+rejections = {"min_rooms": 0, "max_rooms": 0, "min_price": 0, "max_price": 0, "max_expensas": 0}
+_rejections_lock = threading.Lock()
+
+# Check name -> (criteria key, factory of a test that rejects the listing)
+_CHECKS = {
+    "min_rooms": ("min_rooms", lambda limit: lambda ap: ap["rooms"] < limit),
+    "max_rooms": ("max_rooms", lambda limit: lambda ap: ap["rooms"] > limit),
+    "min_price": ("min_price", lambda limit: lambda ap: ap["price"] < limit),
+    "max_price": ("max_price", lambda limit: lambda ap: ap["price"] > limit),
+    "max_expensas": (
+        "max_expensas",
+        lambda limit: lambda ap: ap.get("expensas") is not None and ap["expensas"] > limit,
+    ),
+}
+
+# Required keys; the others are skipped when missing or None
+_REQUIRED = ("min_rooms", "max_price", "max_expensas")
+
+
+@lru_cache(maxsize=4096)
+def location_ok(address):
+    """Location check of filter_by_location, cached per address (same for every user)."""
+    return filter_by_location({"address": address}, include_unknown=True)
+
+
+def _record_rejection(name):
+    with _rejections_lock:
+        rejections[name] += 1
+
+
+def compile_criteria(criteria):
+    """
+    Compile criteria into a predicate equivalent to matches(ap, criteria).
+
+    Each threshold is bound into its own check once and checks for unset
+    optional criteria are left out, so the predicate does no criteria
+    lookups. The numeric checks run in order of observed rejections (see
+    ``rejections``) and the location check, the most expensive, runs last
+    and is cached per address.
+
+    Returns:
+        callable: predicate(ap) -> bool
+    """
+    names = [
+        name for name, (key, _) in _CHECKS.items()
+        if criteria.get(key) is not None or (key in _REQUIRED and key in criteria)
+    ]
+    names.sort(key=lambda name: -rejections[name])  # Stable: ties keep matches() order
+    checks = [(name, _CHECKS[name][1](criteria[_CHECKS[name][0]])) for name in names]
+
+    def predicate(ap):
+        if ap["price"] is None or ap["rooms"] is None:
+            return False
+        for name, rejects in checks:
+            if rejects(ap):
+                _record_rejection(name)
+                return False
+        return location_ok(ap.get("address", ""))
+
+    return predicate
@@ -0,0 +1,60 @@
+"""
+Shared HTTP access for scrapers and the notifier.
+
+By default requests are sent with plain ``requests.get``/``requests.post``.
+Long-running processes (cron_job --daemon, the bot) call use_session() to
+switch to one pooled ``requests.Session``, so TCP/TLS connections to the
+listing sites and the Telegram API stay open between cycles.
+
+``requests`` is imported on the first request, not at import time, so
+cron_job does not pay for it on runs that skip every source.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = 8   # Distinct hosts kept alive
+POOL_MAXSIZE = 8       # Connections kept alive per host
+
+_session = None
+
+
+def use_session(enabled=True):
+    """
+    Enable (or disable and close) the shared keep-alive session.
+
+    Args:
+        enabled: True to route requests through a pooled session
+    """
+    global _session
+
+    if enabled and _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+        logger.info("Using shared HTTP session")
+    elif not enabled and _session is not None:
+        _session.close()
+        _session = None
+
+
+def get(url, **kwargs):
+    """Send a GET request through the shared session if enabled."""
+    if _session is not None:
+        return _session.get(url, **kwargs)
+    import requests
+    return requests.get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Send a POST request through the shared session if enabled."""
+    if _session is not None:
+        return _session.post(url, **kwargs)
+    import requests
+    return requests.post(url, **kwargs)
@@ -0,0 +1,128 @@
+"""
+Responsiveness measurements for the bot's event loop.
+
+Updates and the scheduled check share one asyncio loop, so any blocking
+call in a job (file I/O, matching, waiting on threads) delays every
+command. Two measurements show whether that happens:
+
+- LoopLagMonitor: a task that sleeps LAG_INTERVAL and records how late it
+  wakes up. Lag above a few milliseconds means something blocked the loop.
+- timed(): wraps a handler and records how long each call took, so command
+  latency can be compared with and without a check running.
+"""
+
+import asyncio
+import functools
+import logging
+import time
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+LAG_INTERVAL = 0.05       # Seconds between loop lag samples
+MAX_SAMPLES = 2000        # Samples kept per series
+SLOW_HANDLER_MS = 500     # Handler calls slower than this are logged
+
+# Handler name -> recent call durations (ms)
+handler_latency = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+
+
+def percentile(values, fraction):
+    """Get the value below which ``fraction`` of ``values`` fall (nearest rank)."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Summarize latency samples.
+
+    Returns:
+        dict: count, p50, p99 and max (ms), or None without samples
+    """
+    if not samples:
+        return None
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 0.5),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples),
+    }
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop runs a periodic wake-up.
+
+    Call start() from inside the loop, summary() to read (and reset) the
+    samples and stop() on shutdown.
+    """
+
+    def __init__(self, interval=LAG_INTERVAL):
+        self.interval = interval
+        self.samples = deque(maxlen=MAX_SAMPLES)
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - started - self.interval) * 1000)
+
+    def start(self):
+        """Start sampling on the running loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        """Stop sampling."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def summary(self, reset=True):
+        """
+        Summarize the loop lag since the last reset.
+
+        Returns:
+            dict: count, p50, p99 and max lag (ms), or None without samples
+        """
+        result = summarize(self.samples)
+        if reset:
+            self.samples.clear()
+        return result
+
+
+def timed(handler):
+    """Record the duration of every call to an async handler."""
+    name = handler.__name__
+
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            handler_latency[name].append(elapsed)
+            if elapsed > SLOW_HANDLER_MS:
+                logger.warning(f"Handler {name} took {elapsed:.0f} ms")
+
+    return wrapper
+
+
+def handler_summary(reset=True):
+    """
+    Summarize handler durations since the last reset.
+
+    Returns:
+        dict: Handler name -> summary dict (see summarize)
+    """
+    result = {name: summarize(samples) for name, samples in handler_latency.items() if samples}
+    if reset:
+        handler_latency.clear()
+    return result
@@ -0,0 +1,291 @@
+"""
+Synthetic load test for the dedup -> match -> rank -> notify stages.
+
+Generates listings and user configs at a configurable scale and runs one
+cycle's stages over them (as cron_job does, without scraping or a network)
+with a no-op sender. Each stage is run to completion before the next, so
+its cycle time and peak memory can be reported on their own.
+
+Listings follow rough La Plata rental distributions: rooms skewed to 1-3,
+price growing with rooms (log-normal), mostly non-zero expensas, and the
+address forms the sites use ("7 e/ 45 y 46", "Calle 7 entre 45 y 46",
+"Av. 44 N° 1234", "Diagonal 74 n 1500", outskirts, missing addresses).
+A share of listings are cross-source duplicates or were seen in an
+earlier cycle (some with a lower price now).
+
+Usage:
+    python load_test.py --users 10000 --listings 5000
+"""
+
+import argparse
+import logging
+import math
+import random
+import time
+import tracemalloc
+from functools import partial
+
+from dedup import FingerprintIndex
+from memory import process_rss_mb
+from pipeline import (
+    iter_indexed_matches, iter_matches, iter_new, iter_price_drops, iter_snapshot_diff, iter_top_k,
+    iter_unique, notify_sink
+)
+from snapshots import SnapshotStore
+from user_store import UserStore
+
+logger = logging.getLogger(__name__)
+
+SOURCES = ("argenprop", "inmobusqueda", "zonaprop", "mercadolibre")
+
+# Median rent per number of rooms (ARS); prices are log-normal around it
+MEDIAN_PRICE = {1: 280000, 2: 380000, 3: 520000, 4: 700000, 5: 900000}
+ROOM_WEIGHTS = {1: 30, 2: 35, 3: 22, 4: 10, 5: 3}
+PRICE_SIGMA = 0.25
+
+OUTSKIRTS = ("City Bell", "Gonnet", "Villa Elisa", "Tolosa", "Los Hornos", "Ringuelet", "Villa Elvira")
+
+
+def _street(rng):
+    """A casco street: calles 1-31 or avenidas 32-72."""
+    return rng.randint(1, 72)
+
+
+def random_address(rng):
+    """Build an address in one of the forms the listing sites use."""
+    roll = rng.random()
+    street, cross = _street(rng), _street(rng)
+    if roll < 0.30:
+        return f"{street} e/ {cross} y {cross + 1}, La Plata"
+    if roll < 0.45:
+        return f"Calle {street} entre {cross} y {cross + 1}"
+    if roll < 0.60:
+        return f"Av. {rng.randint(32, 72)} N° {rng.randint(100, 2500)}, La Plata"
+    if roll < 0.67:
+        return f"Diagonal {rng.randint(73, 80)} n {rng.randint(100, 2500)}"
+    if roll < 0.75:
+        return f"{street} y {cross}"
+    if roll < 0.88:
+        return f"Calle {rng.randint(400, 530)} {rng.randint(1000, 4000)}, {rng.choice(OUTSKIRTS)}"
+    if roll < 0.94:
+        return "Centro, La Plata, Buenos Aires"
+    return ""
+
+
+def random_listing(rng, source, listing_id):
+    """Build one synthetic listing."""
+    rooms = rng.choices(list(ROOM_WEIGHTS), weights=list(ROOM_WEIGHTS.values()))[0]
+    price = int(MEDIAN_PRICE[rooms] * math.exp(rng.gauss(0, PRICE_SIGMA)) / 1000) * 1000
+
+    roll = rng.random()
+    if roll < 0.10:
+        expensas = None
+    elif roll < 0.18:
+        expensas = 0
+    else:
+        expensas = int(rng.lognormvariate(math.log(60000), 0.5) / 1000) * 1000
+
+    return {
+        "id": f"{source}_{listing_id}",
+        "price": price,
+        "rooms": None if rng.random() < 0.03 else rooms,
+        "expensas": expensas,
+        "address": random_address(rng),
+        "url": f"https://example.com/{source}/{listing_id}",
+        "source": source,
+    }
+
+
+def generate_listings(count, seed=0, duplicate_rate=0.1):
+    """
+    Generate a cycle's worth of scraped listings.
+
+    Args:
+        count: Number of listings
+        seed: Random seed (same seed, same listings)
+        duplicate_rate: Share of listings that repost an earlier one on
+            another source (same apartment, price within 1%)
+
+    Returns:
+        list: Apartment listing dictionaries
+    """
+    rng = random.Random(seed)
+    listings = []
+    for n in range(count):
+        source = rng.choice(SOURCES)
+        if listings and rng.random() < duplicate_rate:
+            original = rng.choice(listings)
+            source = rng.choice([s for s in SOURCES if s != original["source"]])
+            listing = dict(
+                original,
+                id=f"{source}_{n}",
+                price=int(original["price"] * rng.uniform(0.99, 1.01)),
+                url=f"https://example.com/{source}/{n}",
+                source=source,
+            )
+        else:
+            listing = random_listing(rng, source, n)
+        listings.append(listing)
+    return listings
+
+
+def generate_user_configs(count, seed=0, price_drop_rate=0.2, inactive_rate=0.05):
+    """
+    Generate registered users with varied search criteria.
+
+    Returns:
+        list: (user_id, config) pairs, like pipeline.load_active_user_configs
+    """
+    rng = random.Random(f"users:{seed}")
+    user_configs = []
+    for n in range(count):
+        min_rooms = rng.choices((1, 2, 3), weights=(40, 45, 15))[0]
+        max_price = int(MEDIAN_PRICE[min_rooms] * rng.uniform(0.8, 1.6) / 10000) * 10000
+        config = {
+            "min_price": rng.choice((0, 100000, 150000, 200000)),
+            "max_price": max_price,
+            "min_rooms": min_rooms,
+            "max_rooms": rng.choice((None, min_rooms + 1, min_rooms + 2)),
+            "max_expensas": rng.choice((50000, 80000, 100000, 150000)),
+            "active": rng.random() >= inactive_rate,
+            "price_drops": rng.random() < price_drop_rate,
+        }
+        if config["active"]:
+            user_configs.append((str(100000000 + n), config))
+    return user_configs
+
+
+def generate_history(listings, seen_rate=0.5, drop_rate=0.1, seed=0):
+    """
+    Build the state an earlier cycle would have left.
+
+    Args:
+        listings: This cycle's listings
+        seen_rate: Share of listings already seen (sent and snapshotted)
+        drop_rate: Share of the seen listings whose price dropped since
+
+    Returns:
+        tuple: (sent ID set, SnapshotStore)
+    """
+    rng = random.Random(f"history:{seed}")
+    sent = set()
+    store = SnapshotStore()
+    earlier = time.time() - 86400
+    for ap in listings:
+        if rng.random() >= seen_rate:
+            continue
+        sent.add(ap["id"])
+        previous = dict(ap)
+        if rng.random() < drop_rate:
+            previous["price"] = int(ap["price"] * rng.uniform(1.05, 1.2))
+        store.update(previous, now=earlier)
+    return sent, store
+
+
+def _noop_send(user_id, ap):
+    pass
+
+
+def profile_cycle(listings, user_configs, seen_rate=0.5, seed=0, trace_memory=False, sql=False):
+    """
+    Run one cycle's stages over synthetic data, one stage at a time.
+
+    Args:
+        listings: Listings from generate_listings
+        user_configs: Users from generate_user_configs
+        seen_rate: Share of listings already seen in an earlier cycle
+        seed: Seed for the earlier cycle's state
+        trace_memory: Measure each stage's peak Python allocations with
+            tracemalloc (slows the stages down, so timings are less accurate)
+        sql: Match with range queries against an in-memory UserStore (as
+            the cycles do) instead of compiled per-user predicates
+
+    Returns:
+        list: (stage name, seconds, peak MB or None, items out) per stage;
+            for "notify" the items out are the messages sent
+    """
+    sent, store = generate_history(listings, seen_rate=seen_rate, seed=seed)
+    index = FingerprintIndex()
+    events = []
+    overflow = []
+    stats = {}
+    sink = notify_sink(_noop_send, stats)
+
+    if sql:
+        users = UserStore(":memory:")
+        users.import_configs(dict(user_configs))
+        match = partial(iter_indexed_matches, store=users)
+    else:
+        match = partial(iter_matches, user_configs=user_configs)
+
+    def _notify(items):
+        for item in items:
+            sink(item)
+        for item in iter_price_drops(events, user_configs):
+            sink(item)
+        return stats["sent"]
+
+    stages = [
+        ("snapshot_diff", partial(iter_snapshot_diff, store=store, events=events)),
+        ("new", partial(iter_new, sent=sent)),
+        ("dedup", partial(iter_unique, index=index)),
+        ("match", match),
+        # Generated listings interleave their sources, the worst case for the per-source budget
+        ("top_k", partial(iter_top_k, user_configs=user_configs, overflow=overflow, sources=len(SOURCES))),
+    ]
+
+    results = []
+    items = listings
+    for name, stage in stages + [("notify", None)]:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if stage is None:
+            items = _notify(items)
+            count = items
+        else:
+            items = list(stage(items))
+            count = len(items)
+        elapsed = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            tracemalloc.stop()
+        results.append((name, elapsed, peak, count))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the pipeline stages on synthetic listings and users")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--listings", type=int, default=1000)
+    parser.add_argument("--seen", type=float, default=0.5, help="Share of listings seen in an earlier cycle")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Share of cross-source duplicates")
+    parser.add_argument("--sql", action="store_true", help="Match with the SQLite user store")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    start = time.perf_counter()
+    listings = generate_listings(args.listings, seed=args.seed, duplicate_rate=args.duplicates)
+    user_configs = generate_user_configs(args.users, seed=args.seed)
+    print(f"Generated {len(listings)} listings and {len(user_configs)} active users "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    # Timings and memory come from separate runs: tracemalloc slows every allocation
+    timings = profile_cycle(listings, user_configs, args.seen, args.seed, sql=args.sql)
+    peaks = profile_cycle(listings, user_configs, args.seen, args.seed, trace_memory=True, sql=args.sql)
+
+    print(f"\n{'stage':<15}{'time (s)':>10}{'peak (MB)':>12}{'items out':>12}")
+    for (name, elapsed, _, count), (_, _, peak, _) in zip(timings, peaks):
+        print(f"{name:<15}{elapsed:>10.3f}{peak:>12.1f}{count:>12}")
+    print(f"{'total':<15}{sum(t[1] for t in timings):>10.3f}")
+
+    rss = process_rss_mb()
+    if rss is not None:
+        print(f"\nProcess RSS: {rss:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
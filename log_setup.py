@@ -0,0 +1,191 @@
+"""
+Logging setup shared by the entry points (main.py, cron_job.py, run_once.py).
+
+Log calls merge the message with its arguments and put the record on an
+in-memory queue; a listener thread formats it and writes it to the console
+and the log file, so a slow disk never stalls a scrape or a send. The log
+file is rotated when it reaches LOG_MAX_BYTES or its first record is older
+than LOG_ROTATE_HOURS, and rotated files are gzip-compressed (bot.log.1.gz,
+bot.log.2.gz, ...).
+
+Repetitive warnings (e.g. one per unparseable card) are sampled: at most
+SAMPLE_BURST records per call site every SAMPLE_PERIOD seconds get
+through, and the next one that does reports how many were suppressed.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+
+SAMPLE_PERIOD = 60    # Seconds per sampling window
+SAMPLE_BURST = 5      # Warnings per call site let through per window
+
+_listener = None
+
+
+class CompressedRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotates on size or age and gzips the rotated files.
+
+    Args:
+        filename: Log file
+        max_bytes: Rotate when the file would grow past this size
+        backups: Rotated files kept
+        max_age: Rotate when the file's first record is older (seconds). The
+            age is read from the file, so it also applies to short-lived
+            processes (one cron run every 15 minutes) appending to it
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 max_age=LOG_ROTATE_HOURS * 3600):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+        self.max_age = max_age
+        self.started_at = _first_record_time(self.baseFilename)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record):
+        if self.max_age and time.time() - self.started_at >= self.max_age:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.started_at = time.time()
+
+
+def _first_record_time(path):
+    """
+    Get the time of the first record in a log file.
+
+    Records start with their asctime (as in every format the entry points
+    use). A missing, empty or unparseable file counts as started now.
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            first_line = f.readline()
+        return time.mktime(time.strptime(first_line[:19], "%Y-%m-%d %H:%M:%S"))
+    except (OSError, ValueError):
+        return time.time()
+
+
+def _gzip_rotator(source, dest):
+    """Compress a rotated log file."""
+    import gzip
+    import shutil
+
+    if not os.path.exists(source):
+        return
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class SampledWarningsFilter(logging.Filter):
+    """
+    Lets through at most ``burst`` warnings per call site per ``period``.
+
+    Errors and higher always pass; lower levels are not sampled either.
+    """
+
+    def __init__(self, period=SAMPLE_PERIOD, burst=SAMPLE_BURST):
+        super().__init__()
+        self.period = period
+        self.burst = burst
+        self._sites = {}  # (pathname, lineno) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno != logging.WARNING:
+            return True
+
+        now = record.created
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.period:
+                suppressed = site[2] if site else 0
+                self._sites[key] = [now, 1, 0]
+            elif site[1] < self.burst:
+                site[1] += 1
+                suppressed = 0
+            else:
+                site[2] += 1
+                return False
+
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar messages suppressed]"
+        return True
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Queues records with their message already merged with its arguments.
+
+    Merging happens in the caller's thread, so a mutable argument is logged
+    as it was at the call; the rest of the formatting (timestamp, level,
+    traceback) happens in the listener thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(log_file, fmt='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO):
+    """
+    Configure the root logger to log through a background thread.
+
+    Args:
+        log_file: File to write (rotated and compressed)
+        fmt: Record format for the file and the console
+        level: Root logger level
+
+    Returns:
+        QueueListener: The running listener (stopped automatically at exit)
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    formatter = logging.Formatter(fmt)
+    file_handler = CompressedRotatingFileHandler(log_file)
+    console_handler = logging.StreamHandler()
+    for handler in (file_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    records = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(records)
+    queue_handler.addFilter(SampledWarningsFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from datetime import datetime
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
@@ -6,15 +7,25 @@ from telegram.ext import (
     Application, CommandHandler, MessageHandler,
     ConversationHandler, ContextTypes, filters
 )
-from scrappers.argenprop import scrape_argenprop
-from scrappers.zonaprop import scrape_zonaprop
-from scrappers.mercadolibre import scrape_mercadolibre
-from scrappers.inmobusqueda import scrape_inmobusqueda
-from scrappers.browser_manager import close_browser
-from filters import matches
-from notifier import send_message
+from functools import partial
+from sources import enabled_sources, close_browser_if_loaded
+from pipeline import (
+    arun_pipeline, iter_snapshot_diff, iter_archived, iter_new, iter_unique, iter_enriched,
+    iter_matches, iter_indexed_matches, iter_top_k, iter_price_drops, async_notify_sink, load_active_user_configs
+)
 from storage import load_sent, save_sent
-from user_config import get_user_config, set_user_config, get_all_user_ids, DEFAULT_CONFIG
+from dedup import load_fingerprints, save_fingerprints
+from snapshots import load_snapshots, save_snapshots
+from enrichment import DetailEnricher, load_detail_cache, save_detail_cache
+from archive import ListingArchive, save_archive
+from circuit_breaker import guarded_sources, load_breakers, save_breakers
+from notifier import format_price_drop, API_BASE
+from scheduler import load_schedule, save_schedule, scheduled_sources, cycle_lock, MIN_INTERVAL
+from user_config import get_user_config, set_user_config, get_store, DEFAULT_CONFIG
+from latency import LoopLagMonitor, timed, handler_summary
+from ranking import user_budget, MAX_USER_BUDGET
+from scrape_cache import ScrapeCache, cached_sources
+from log_setup import setup_logging
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -22,15 +33,8 @@ load_dotenv()
 # Change to script directory
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (written by a background thread, rotated and compressed)
+setup_logging('bot.log', fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -39,6 +43,13 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "8515341054:AAGLbPYICYimfzknKl5MaC8Qdmfw
 # Conversation states
 CHOOSING, SET_MAX_PRICE, SET_MIN_ROOMS, SET_MAX_EXPENSAS = range(4)
 
+# Samples event loop lag, to check that checks don't stall command handling
+loop_lag = LoopLagMonitor()
+
+# Listings of the last complete scrape of each source, shared by the
+# scheduled check and /run; concurrent scrapes of a source are coalesced
+scrape_cache = ScrapeCache()
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command - show welcome and prompt configuration."""
@@ -56,8 +67,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>Comandos disponibles:</b>\n"
         "/config - Modificar tus filtros de búsqueda\n"
         "/run - Buscar departamentos ahora (1 por fuente)\n"
+        "/bajas - Activar/desactivar avisos de bajas de precio\n"
+        "/cantidad - Cambiar cuántos avisos recibís por búsqueda\n"
         "/start - Ver este mensaje de ayuda\n\n"
-        "📬 Recibirás notificaciones automáticas cada hora (máx. 4 mensajes).",
+        f"📬 Recibirás notificaciones automáticas (máx. {user_budget(config)} por búsqueda).",
         parse_mode="HTML"
     )
 
@@ -65,6 +78,43 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     set_user_config(user_id, "active", True)
 
 
+async def toggle_price_drops(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /bajas command - opt in or out of price drop notifications."""
+    user_id = update.effective_user.id
+    enabled = not get_user_config(user_id).get("price_drops", False)
+    set_user_config(user_id, "price_drops", enabled)
+
+    if enabled:
+        await update.message.reply_text(
+            "📉 Te avisaré cuando baje el precio de un departamento que coincida con tus filtros."
+        )
+    else:
+        await update.message.reply_text("🔕 Ya no recibirás avisos de bajas de precio.")
+
+
+async def set_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /cantidad N command - set how many listings a user gets per check."""
+    user_id = update.effective_user.id
+    try:
+        value = int(context.args[0])
+        if not 1 <= value <= MAX_USER_BUDGET:
+            raise ValueError("Out of range")
+    except (IndexError, ValueError):
+        current = user_budget(get_user_config(user_id))
+        await update.message.reply_text(
+            f"📬 Recibís hasta <b>{current}</b> avisos por búsqueda (los mejores).\n"
+            f"Para cambiarlo: /cantidad N (entre 1 y {MAX_USER_BUDGET})",
+            parse_mode="HTML"
+        )
+        return
+
+    set_user_config(user_id, "max_per_cycle", value)
+    await update.message.reply_text(
+        f"✅ Recibirás hasta <b>{value}</b> avisos por búsqueda.",
+        parse_mode="HTML"
+    )
+
+
 async def config_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /config command - start configuration conversation."""
     keyboard = [
@@ -258,34 +308,31 @@ async def run_manual_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
     try:
-        # Load previously seen apartments
-        sent = load_sent()
-
-        # Scrape all sources (1 page each, sorted by most recent)
-        sources = {"argenprop": scrape_argenprop()}
-
-        # ZonaProp and MercadoLibre only work locally (Cloudflare blocks Railway IPs)
-        if not os.getenv("RAILWAY_ENVIRONMENT"):
-            sources["zonaprop"] = scrape_zonaprop()
-            sources["mercadolibre"] = scrape_mercadolibre()
-
-        # Close browser after Playwright-based scraping
-        close_browser()
-
-        # Add Inmobusqueda (uses requests, not Playwright)
-        sources["inmobusqueda"] = scrape_inmobusqueda()
+        # Load previously seen apartments (file I/O off the event loop)
+        sent, fingerprints = await asyncio.gather(
+            asyncio.to_thread(load_sent), asyncio.to_thread(load_fingerprints)
+        )
 
-        # Get first NEW matching listing from each source
+        # Scrape all sources (1 page each, sorted by most recent) and keep
+        # the first NEW matching listing from each source. Sources scraped
+        # recently (by the scheduled check or another /run) come from the cache
         results = []
 
-        for source_name, listings in sources.items():
-            for ap in listings:
-                if ap["id"] in sent:
-                    continue  # Skip already seen apartments
-                if matches(ap, config):
-                    results.append(ap)
-                    sent.add(ap["id"])  # Mark as seen
-                    break  # Only 1 per source
+        async def collect(item):
+            ap, user_ids = item
+            if user_ids:
+                results.append(ap)
+                sent.add(ap["id"])  # Mark as seen
+
+        await arun_pipeline(
+            cached_sources(enabled_sources(), scrape_cache),
+            stages=[
+                partial(iter_new, sent=sent, mark_seen=False),  # Skip already seen apartments
+                partial(iter_unique, index=fingerprints),  # Skip cross-source duplicates
+                partial(iter_matches, user_configs=[(user_id, config)], per_user_source_limit=1),
+            ],
+            sink=collect,
+        )
 
         if not results:
             await update.message.reply_text(
@@ -307,7 +354,7 @@ async def run_manual_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await send_telegram_message(context.bot, user_id, ap)
 
         # Save the updated sent set
-        save_sent(sent)
+        await asyncio.to_thread(save_sent, sent)
 
     except Exception as e:
         logger.error(f"Error in run_manual_search: {e}", exc_info=True)
@@ -316,9 +363,6 @@ async def run_manual_search(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
-# Maximum listings to send per source per cycle (2 per source = max 8 messages/hour)
-MAX_LISTINGS_PER_SOURCE = 2
-
 # Quiet hours - don't send notifications between these hours (0-23)
 QUIET_HOURS_START = 0   # midnight
 QUIET_HOURS_END = 8     # 8 AM
@@ -342,77 +386,129 @@ async def check_and_notify(context: ContextTypes.DEFAULT_TYPE):
             logger.info("=" * 50)
             return
 
-        sent = load_sent()
-        logger.info(f"Loaded {len(sent)} previously sent listings")
-
-        # Scrape all sources and keep them separate for per-source limiting
-        sources = {}
-
-        # Scrape all sources (1 page each by default, sorted by most recent)
-        logger.info("Scraping ArgenProp...")
-        sources["argenprop"] = scrape_argenprop()
-
-        # ZonaProp and MercadoLibre only work locally (Cloudflare blocks Railway IPs)
-        if not os.getenv("RAILWAY_ENVIRONMENT"):
-            logger.info("Scraping ZonaProp...")
-            sources["zonaprop"] = scrape_zonaprop()
-
-            logger.info("Scraping MercadoLibre...")
-            sources["mercadolibre"] = scrape_mercadolibre()
-        else:
-            logger.info("Skipping ZonaProp/MercadoLibre (Railway environment)")
-
-        # Close browser after Playwright-based scraping to free memory
-        close_browser()
-
-        logger.info("Scraping Inmobusqueda...")
-        sources["inmobusqueda"] = scrape_inmobusqueda()
-
-        total = sum(len(v) for v in sources.values())
-        logger.info(f"Found {total} total listings from all sources")
-
-        # Get all registered users
-        user_ids = get_all_user_ids()
-        logger.info(f"Checking for {len(user_ids)} registered users")
-
-        # First, mark ALL scraped apartments as seen (to prevent re-checking non-matching ones)
-        new_apartments = []
-        for source_name, listings in sources.items():
-            for ap in listings:
-                if ap["id"] not in sent:
-                    sent.add(ap["id"])
-                    new_apartments.append(ap)
-
-        logger.info(f"Found {len(new_apartments)} new apartments (not seen before)")
-
-        # Now process only new apartments for each user
-        for user_id in user_ids:
-            config = get_user_config(user_id)
-            if not config.get("active", True):
-                continue
-
-            # Group new apartments by source and apply per-source limit
-            source_counts = {}
-            for ap in new_apartments:
-                source_name = ap.get("source", "unknown")
-                if source_counts.get(source_name, 0) >= MAX_LISTINGS_PER_SOURCE:
-                    continue
-
-                if matches(ap, config):
-                    logger.info(f"Sending to user {user_id} from {source_name}: {ap['url']}")
-                    try:
-                        await send_telegram_message(context.bot, user_id, ap)
-                        source_counts[source_name] = source_counts.get(source_name, 0) + 1
-                    except Exception as e:
-                        logger.error(f"Failed to send to user {user_id}: {e}")
-
-        save_sent(sent)
-        logger.info("=" * 50)
+        with cycle_lock() as acquired:
+            if not acquired:
+                logger.warning("Previous check is still running - skipping")
+                return
+            await run_check_cycle(context)
 
     except Exception as e:
         logger.error(f"Error in check_and_notify: {e}", exc_info=True)
 
 
+def _load_cycle_state():
+    """
+    Load everything a check cycle reads (blocking, run in a worker thread).
+
+    Returns:
+        dict: sent, user_store, user_configs, fingerprints, snapshots,
+            enricher, archive, schedule, breakers and the due source specs
+    """
+    sent = load_sent()
+    logger.info(f"Loaded {len(sent)} previously sent listings")
+
+    # Get all registered users
+    user_configs = load_active_user_configs()
+    logger.info(f"Checking for {len(user_configs)} registered users")
+
+    # Only scrape sources whose polling interval has elapsed; sources that
+    # keep blocking us are skipped until their cooldown ends
+    schedule = load_schedule()
+    breakers = load_breakers()
+
+    return {
+        "sent": sent,
+        "user_store": get_store(),
+        "user_configs": user_configs,
+        # Fingerprints of recent listings, to skip cross-source duplicates
+        "fingerprints": load_fingerprints(),
+        # Last known price/expensas/rooms of every listing, to detect changes
+        "snapshots": load_snapshots(),
+        # Fills missing fields of promising listings from their detail pages
+        "enricher": DetailEnricher(cache=load_detail_cache()),
+        # Every parsed listing is appended to the columnar archive
+        "archive": ListingArchive(),
+        "schedule": schedule,
+        "breakers": breakers,
+        # Complete scrapes are stored in the scrape cache for /run
+        "specs": scheduled_sources(
+            guarded_sources(cached_sources(enabled_sources(), scrape_cache, refresh=True), breakers), schedule
+        ),
+    }
+
+
+def _save_cycle_state(state):
+    """Save everything a check cycle updated (blocking, run in a worker thread)."""
+    gone = state["snapshots"].gone(spec.name for spec in state["specs"])
+    if gone:
+        logger.info(f"{len(gone)} listings are gone (not seen for a while)")
+
+    save_sent(state["sent"])
+    save_schedule(state["schedule"])
+    save_breakers(state["breakers"])
+    save_fingerprints(state["fingerprints"])
+    save_snapshots(state["snapshots"])
+    save_detail_cache(state["enricher"].cache)
+    save_archive(state["archive"])
+
+
+def _log_latency():
+    """Log event loop lag and command latency since the last cycle."""
+    lag = loop_lag.summary()
+    if lag:
+        logger.info(f"Event loop lag: p50 {lag['p50']:.1f} ms, p99 {lag['p99']:.1f} ms, max {lag['max']:.1f} ms")
+    for name, summary in handler_summary().items():
+        logger.info(f"Handler {name}: {summary['count']} calls, p50 {summary['p50']:.0f} ms, max {summary['max']:.0f} ms")
+
+
+async def run_check_cycle(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Scrape the due sources and notify users (runs under cycle_lock).
+
+    Only sending runs on the event loop: loading and saving state, scraping
+    and matching run in worker threads, so commands are answered while a
+    check is in progress.
+    """
+    state = await asyncio.to_thread(_load_cycle_state)
+    user_configs = state["user_configs"]
+    snapshots = state["snapshots"]
+    enricher = state["enricher"]
+    events = []
+
+    # Mark ALL scraped apartments as seen (to prevent re-checking non-matching
+    # ones), then send each user their best-ranked new matches (see ranking.py)
+    logger.info("Scraping due sources...")
+    stats = {}
+    try:
+        await arun_pipeline(
+            state["specs"],
+            stages=[
+                partial(iter_snapshot_diff, store=snapshots, events=events),
+                partial(iter_archived, archive=state["archive"]),
+                partial(iter_new, sent=state["sent"]),
+                partial(iter_enriched, user_configs=user_configs, enricher=enricher),
+                # After enrichment: rooms/expensas missing from cards are needed to fingerprint
+                partial(iter_unique, index=state["fingerprints"]),
+                partial(iter_indexed_matches, store=state["user_store"]),
+                partial(iter_top_k, user_configs=user_configs, sources=len(state["specs"])),
+            ],
+            sink=async_notify_sink(partial(send_telegram_message, context.bot), stats),
+        )
+    finally:
+        await asyncio.to_thread(enricher.close)  # Waits for pending detail fetches
+    logger.info(f"Found {stats['listings']} new apartments (not seen before), sent {stats['sent']} notifications")
+
+    # Price drops of known listings, for users who opted in
+    drops = await asyncio.to_thread(list, iter_price_drops(events, user_configs))
+    drop_sink = async_notify_sink(partial(send_telegram_price_drop, context.bot), stats)
+    for item in drops:
+        await drop_sink(item)
+
+    await asyncio.to_thread(_save_cycle_state, state)
+    _log_latency()
+    logger.info("=" * 50)
+
+
 def format_number(value):
     """Format number with thousands separator (dot for Argentina)."""
     if value is None or value == 'N/A':
@@ -439,16 +535,37 @@ async def send_telegram_message(bot, chat_id, ap):
     await bot.send_message(chat_id=chat_id, text=text, parse_mode="HTML")
 
 
+async def send_telegram_price_drop(bot, chat_id, ap):
+    """Send price drop notification via bot (``ap`` includes "previous_price")."""
+    await bot.send_message(chat_id=chat_id, text=format_price_drop(ap), parse_mode="HTML")
+
+
+async def _start_loop_monitor(application):
+    loop_lag.start()
+
+
+async def _stop_loop_monitor(application):
+    loop_lag.stop()
+
+
 def main():
     """Main function to run the bot."""
     logger.info("Telegram Apartment Bot Starting...")
 
     # Create application
-    application = Application.builder().token(TOKEN).build()
+    application = (
+        Application.builder().token(TOKEN).base_url(f"{API_BASE}/bot")
+        .post_init(_start_loop_monitor).post_shutdown(_stop_loop_monitor)
+        .build()
+    )
 
     # Add command handlers
-    application.add_handler(CommandHandler("start", start))
-    # application.add_handler(CommandHandler("run", run_manual_search))  # Disabled - only hourly notifications
+    application.add_handler(CommandHandler("start", timed(start)))
+    application.add_handler(CommandHandler("bajas", timed(toggle_price_drops)))
+    application.add_handler(CommandHandler("cantidad", timed(set_budget)))
+    # /run answers from the scrape cache while the scheduled check's scrape is
+    # fresh, and joins a scrape already in flight instead of starting another
+    application.add_handler(CommandHandler("run", timed(run_manual_search)))
 
     # Configuration conversation handler (disabled - filter modification via Telegram turned off)
     # config_handler = ConversationHandler(
@@ -463,9 +580,10 @@ def main():
     # )
     # application.add_handler(config_handler)
 
-    # Schedule periodic apartment checks (every 1 hour to save resources)
+    # Schedule periodic apartment checks. Each check only scrapes the sources
+    # whose adaptive polling interval has elapsed (see scheduler.py)
     job_queue = application.job_queue
-    job_queue.run_repeating(check_and_notify, interval=3600, first=10)
+    job_queue.run_repeating(check_and_notify, interval=MIN_INTERVAL, first=10)
 
     logger.info("Bot is running. Press Ctrl+C to stop.")
 
@@ -474,7 +592,7 @@ def main():
     finally:
         # Cleanup browser on shutdown
         logger.info("Shutting down, cleaning up browser...")
-        close_browser()
+        close_browser_if_loaded()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,108 @@
+"""
+Memory usage helpers for long-running processes.
+
+Reads resident set size (RSS) from /proc, so it works without extra
+dependencies on Linux (Railway, systemd). On other platforms the functions
+return None and callers should skip memory-based decisions.
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Process names of Playwright's Chromium (browser, renderers, GPU/utility)
+CHROMIUM_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def process_rss_mb(pid=None):
+    """
+    Get the resident memory of a process.
+
+    Args:
+        pid: Process ID (defaults to the current process)
+
+    Returns:
+        float: RSS in MB, or None if it cannot be read
+    """
+    pid = os.getpid() if pid is None else pid
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024  # kB -> MB
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _read_parent_and_name(pid):
+    """Return (ppid, comm) for a process from /proc/<pid>/stat."""
+    with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+        stat = f.read()
+    # Format: "pid (comm) state ppid ..."; comm may contain spaces
+    name = stat[stat.index("(") + 1:stat.rindex(")")]
+    ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+    return ppid, name
+
+
+def descendant_pids(root_pid=None):
+    """
+    Get all descendant process IDs of a process.
+
+    Returns:
+        dict: pid -> process name, for every descendant of root_pid
+    """
+    root_pid = os.getpid() if root_pid is None else root_pid
+    try:
+        entries = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return {}
+
+    parents = {}
+    names = {}
+    for pid in entries:
+        try:
+            parents[pid], names[pid] = _read_parent_and_name(pid)
+        except (OSError, ValueError):
+            continue  # Process exited while scanning
+
+    descendants = {}
+    for pid in parents:
+        ancestor = parents[pid]
+        seen = 0
+        while ancestor and ancestor != root_pid and seen < 64:
+            ancestor = parents.get(ancestor, 0)
+            seen += 1
+        if ancestor == root_pid:
+            descendants[pid] = names[pid]
+    return descendants
+
+
+def chromium_processes(root_pid=None):
+    """
+    Get RSS of every Chromium process started by this process.
+
+    Returns:
+        dict: pid -> RSS in MB
+    """
+    result = {}
+    for pid, name in descendant_pids(root_pid).items():
+        if any(chromium in name.lower() for chromium in CHROMIUM_NAMES):
+            rss = process_rss_mb(pid)
+            if rss is not None:
+                result[pid] = rss
+    return result
+
+
+def chromium_rss_mb(root_pid=None):
+    """
+    Get the total resident memory of Chromium processes started by us.
+
+    Returns:
+        float: Total RSS in MB (0 if no browser is running), or None if
+            /proc is not available
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    return sum(chromium_processes(root_pid).values())
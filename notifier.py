@@ -1,9 +1,15 @@
-import requests
+import http_session
 import logging
+import os
 import time
 
 logger = logging.getLogger(__name__)
 
+# Overridable to send through a local stand-in (see fake_telegram.py)
+API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+
+MAX_RETRY_AFTER = 60  # Longest 429 retry_after we wait for (seconds)
+
 def format_number(value):
     """Format number with thousands separator (dot for Argentina)."""
     if value is None or value == 'N/A':
@@ -14,6 +20,36 @@ def format_number(value):
         return str(value)
 
 
+def format_listing(ap):
+    """Format the notification text for a new listing."""
+    price = format_number(ap.get('price'))
+    expensas = format_number(ap.get('expensas'))
+    rooms = ap.get('rooms', 'N/A')
+
+    return (
+        f"🏠 <b>Nuevo depto en alquiler (La Plata)</b>\n\n"
+        f"💲 Alquiler: ${price}\n"
+        f"🧾 Expensas: ${expensas}\n"
+        f"🛏 {rooms} ambientes\n\n"
+        f"🔗 {ap.get('url', '#')}"
+    )
+
+
+def format_price_drop(ap):
+    """Format the notification text for a listing whose price went down."""
+    price = format_number(ap.get('price'))
+    expensas = format_number(ap.get('expensas'))
+    rooms = ap.get('rooms', 'N/A')
+
+    return (
+        f"📉 <b>Bajó el precio de un depto (La Plata)</b>\n\n"
+        f"💲 Alquiler: <s>${format_number(ap.get('previous_price'))}</s> → ${price}\n"
+        f"🧾 Expensas: ${expensas}\n"
+        f"🛏 {rooms} ambientes\n\n"
+        f"🔗 {ap.get('url', '#')}"
+    )
+
+
 def send_message(token, chat_id, ap, max_retries=3, retry_delay=2):
     """
     Send a message to Telegram with retry logic.
@@ -28,19 +64,32 @@ def send_message(token, chat_id, ap, max_retries=3, retry_delay=2):
     Raises:
         Exception: If message sending fails after all retries
     """
-    price = format_number(ap.get('price'))
-    expensas = format_number(ap.get('expensas'))
-    rooms = ap.get('rooms', 'N/A')
+    return send_text(token, chat_id, format_listing(ap), max_retries, retry_delay)
 
-    text = (
-        f"🏠 <b>Nuevo depto en alquiler (La Plata)</b>\n\n"
-        f"💲 Alquiler: ${price}\n"
-        f"🧾 Expensas: ${expensas}\n"
-        f"🛏 {rooms} ambientes\n\n"
-        f"🔗 {ap.get('url', '#')}"
-    )
 
-    url = f"https://api.telegram.org/bot{token}/sendMessage"
+def send_price_drop(token, chat_id, ap, max_retries=3, retry_delay=2):
+    """
+    Send a price drop notification to Telegram (see send_message).
+
+    ``ap`` must include the old price as "previous_price".
+    """
+    return send_text(token, chat_id, format_price_drop(ap), max_retries, retry_delay)
+
+
+def _retry_after(response, default):
+    """Get the wait a 429 response asks for (``default`` if missing)."""
+    try:
+        retry_after = response.json()["parameters"]["retry_after"]
+    except (ValueError, KeyError, TypeError):
+        return default
+    return min(max(retry_after, 0), MAX_RETRY_AFTER)
+
+
+def send_text(token, chat_id, text, max_retries=3, retry_delay=2):
+    """Send an HTML text message to Telegram with retry logic."""
+    import requests  # Deferred: cron_job imports this module at startup
+
+    url = f"{API_BASE}/bot{token}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": text,
@@ -49,7 +98,13 @@ def send_message(token, chat_id, ap, max_retries=3, retry_delay=2):
     
     for attempt in range(max_retries):
         try:
-            response = requests.post(url, json=payload, timeout=10)
+            response = http_session.post(url, json=payload, timeout=10)
+            if response.status_code == 429 and attempt < max_retries - 1:
+                # Flood control: wait as long as Telegram asks, not retry_delay
+                wait = _retry_after(response, retry_delay)
+                logger.warning(f"Rate limited by Telegram, retrying in {wait}s")
+                time.sleep(wait)
+                continue
             response.raise_for_status()
             
             result = response.json()
@@ -0,0 +1,546 @@
+"""
+Pipeline engine for the scrape -> dedup -> match -> notify cycle.
+
+Every stage takes an iterable and yields as it goes, so a listing parsed on
+page 1 of the first source can be delivered while later pages and slower
+sources are still loading.
+
+The engine is shared by every entry point (cron_job.py, main.py,
+run_once.py); each one only picks its sources, stages, sink and execution
+policy:
+
+- "sequential": sources are scraped one after the other
+- "threaded": HTTP sources are scraped concurrently, browser sources run
+  one after the other in the Playwright thread
+- async (arun_pipeline): the stream runs in a worker thread and an async
+  sink is awaited on the event loop
+"""
+
+import gc
+import heapq
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import SourceBlocked
+from ranking import MAX_MATCHES_PER_USER, score_match, user_budget
+from snapshots import is_price_drop
+from sources import close_browser_if_loaded
+from user_config import get_active_user_configs, get_user_predicate
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("sequential", "threaded")
+
+MAX_BUFFERED_MATCHES = 200  # Matched listings iter_top_k ranks at most at once
+
+# Marks the end of a producer's stream
+_DONE = object()
+
+
+def _iter_source(spec, max_pages):
+    """Yield a source's listings, logging (not raising) scraper failures."""
+    logger.info(f"  - {spec.label}...")
+    try:
+        yield from spec.scrape(max_pages=max_pages)
+    except SourceBlocked as e:
+        logger.warning(f"{spec.label} is blocking us: {e}")
+    except Exception as e:
+        logger.error(f"{spec.label} scrape failed: {e}", exc_info=True)
+
+
+def _release_browser():
+    """Close the Playwright browser and release its memory."""
+    close_browser_if_loaded()
+    gc.collect()  # Force garbage collection to release memory
+
+
+def _iter_sequential(specs, max_pages, keep_browser=False):
+    """Scrape sources one after the other, in the given order."""
+    remaining_browser = sum(1 for spec in specs if spec.needs_browser)
+    for spec in specs:
+        yield from _iter_source(spec, max_pages)
+        if spec.needs_browser:
+            remaining_browser -= 1
+            if remaining_browser == 0 and not keep_browser:
+                # Close as soon as the last browser source is done
+                _release_browser()
+
+
+def _iter_threaded(specs, max_pages, keep_browser=False):
+    """Scrape HTTP sources concurrently; browser sources share one worker."""
+    browser_specs = [spec for spec in specs if spec.needs_browser]
+    groups = [[spec] for spec in specs if not spec.needs_browser]
+    if browser_specs:
+        groups.append(browser_specs)
+    if not groups:
+        return
+
+    items = queue.Queue()
+
+    def _worker(group):
+        try:
+            for spec in group:
+                for ap in _iter_source(spec, max_pages):
+                    items.put(ap)
+            if group is browser_specs and not keep_browser:
+                _release_browser()
+        finally:
+            items.put(_DONE)
+
+    with ThreadPoolExecutor(max_workers=len(groups), thread_name_prefix="scrape") as pool:
+        for group in groups:
+            pool.submit(_worker, group)
+
+        remaining = len(groups)
+        while remaining:
+            item = items.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            yield item
+
+
+def scrape_stream(specs, policy="sequential", max_pages=None, keep_browser=False):
+    """
+    Yield listings from several sources using an execution policy.
+
+    Args:
+        specs: List of SourceSpec objects
+        policy: "sequential" or "threaded"
+        max_pages: Pages per source (defaults to each source's default_pages)
+        keep_browser: Leave the Playwright browser running after the browser
+            sources are done (for long-running processes that reuse it)
+
+    Returns:
+        iterator: Apartment listing dictionaries
+    """
+    if policy == "sequential":
+        return _iter_sequential(specs, max_pages, keep_browser)
+    if policy == "threaded":
+        return _iter_threaded(specs, max_pages, keep_browser)
+    raise ValueError(f"Unknown execution policy: {policy!r} (expected one of {POLICIES})")
+
+
+def build_stream(specs, stages, policy="sequential", max_pages=None, keep_browser=False):
+    """Scrape the sources and chain the stages onto the listing stream."""
+    stream = scrape_stream(specs, policy=policy, max_pages=max_pages, keep_browser=keep_browser)
+    for stage in stages:
+        stream = stage(stream)
+    return stream
+
+
+def run_pipeline(specs, stages, sink, policy="sequential", max_pages=None, keep_browser=False):
+    """
+    Run one cycle: scrape the sources, pass the stream through the stages
+    and hand every resulting item to the sink.
+
+    Args:
+        specs: List of SourceSpec objects
+        stages: List of callables, each taking and returning an iterable
+        sink: Callable receiving each item the last stage yields
+        policy: Scraping execution policy ("sequential" or "threaded")
+        max_pages: Pages per source (defaults to each source's default_pages)
+        keep_browser: Leave the Playwright browser running afterwards
+    """
+    stream = build_stream(specs, stages, policy=policy, max_pages=max_pages, keep_browser=keep_browser)
+    for item in stream:
+        sink(item)
+
+
+async def arun_pipeline(specs, stages, sink, policy="sequential", max_pages=None, keep_browser=False):
+    """
+    Async variant of run_pipeline for use inside an event loop.
+
+    Scraping and the stages run in a worker thread; ``sink`` is a coroutine
+    function awaited on the event loop for each item, so the loop stays
+    free to handle other updates during a cycle.
+    """
+    import asyncio  # Only needed inside the bot's event loop; keeps cron_job startup lean
+
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue()
+
+    def _produce():
+        try:
+            stream = build_stream(specs, stages, policy=policy, max_pages=max_pages, keep_browser=keep_browser)
+            for item in stream:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, _DONE)
+
+    producer = loop.run_in_executor(None, _produce)
+
+    while True:
+        item = await items.get()
+        if item is _DONE:
+            break
+        await sink(item)
+
+    await producer  # Re-raise errors from the worker thread
+
+
+def iter_new(listings, sent, mark_seen=True):
+    """
+    Yield only listings not seen before.
+
+    Args:
+        listings: Iterable of apartment listings
+        sent: Set of already seen listing IDs
+        mark_seen: Add each yielded listing's ID to ``sent``
+
+    Yields:
+        dict: Apartment listing that was not in ``sent``
+    """
+    for ap in listings:
+        if ap["id"] in sent:
+            continue
+        if mark_seen:
+            sent.add(ap["id"])
+        yield ap
+
+
+def iter_snapshot_diff(listings, store, events):
+    """
+    Record every listing in the snapshot store, passing listings through.
+
+    Args:
+        listings: Iterable of apartment listings
+        store: snapshots.SnapshotStore loaded for this cycle
+        events: List that receives "new" and "changed" events
+
+    Yields:
+        dict: Every apartment listing, unchanged
+    """
+    for ap in listings:
+        event = store.update(ap)
+        if event is not None:
+            events.append(event)
+        yield ap
+
+
+def iter_archived(listings, archive):
+    """
+    Queue every listing for the columnar archive, passing listings through.
+
+    Args:
+        listings: Iterable of apartment listings
+        archive: archive.ListingArchive flushed at the end of the cycle
+
+    Yields:
+        dict: Every apartment listing, unchanged
+    """
+    for ap in listings:
+        archive.add(ap)
+        yield ap
+
+
+def iter_unique(listings, index):
+    """
+    Yield one representative per cluster of cross-source duplicates.
+
+    Args:
+        listings: Iterable of apartment listings
+        index: dedup.FingerprintIndex of listings already seen (this cycle
+            and recent history); each yielded listing is added to it
+
+    Yields:
+        dict: Apartment listing that does not duplicate a known one
+    """
+    for ap in listings:
+        original = index.find(ap)
+        if original is not None:
+            logger.info("  Duplicate of %s: %s", original["id"], ap["url"])
+            continue
+        index.add(ap)
+        yield ap
+
+
+def iter_enriched(listings, user_configs, enricher):
+    """
+    Fill missing fields of promising listings from their detail pages.
+
+    Listings that need no enrichment (or hit the cache) pass straight
+    through; the others are fetched in the enricher's worker pool and
+    yielded as their fetch completes, so the order may change.
+
+    Args:
+        listings: Iterable of apartment listings
+        user_configs: List of (user_id, config) pairs for active users
+        enricher: enrichment.DetailEnricher for this cycle
+
+    Yields:
+        dict: Apartment listing, enriched where possible
+    """
+    pending = []
+    for ap in listings:
+        if enricher.is_candidate(ap, user_configs):
+            cached = enricher.cached(ap)
+            future = enricher.submit(ap) if cached is None else None
+            if future is not None:
+                pending.append(future)
+            else:
+                yield cached or ap
+        else:
+            yield ap
+
+        # Hand over finished fetches without waiting for the others
+        done = [future for future in pending if future.done()]
+        for future in done:
+            pending.remove(future)
+            yield future.result()
+
+    for future in pending:
+        yield future.result()
+
+
+def iter_matches(listings, user_configs, per_user_source_limit=None):
+    """
+    Pair each listing with the users whose criteria it matches.
+
+    Args:
+        listings: Iterable of apartment listings
+        user_configs: List of (user_id, config) pairs for active users
+        per_user_source_limit: Optional maximum number of matches per user
+            and source; further matches for that user are dropped
+
+    Yields:
+        tuple: (listing, list of matching user IDs)
+    """
+    # Each user's criteria compiled once, not re-read for every listing
+    predicates = [(user_id, get_user_predicate(user_id, config)) for user_id, config in user_configs]
+    counts = {}
+    for ap in listings:
+        source_name = ap.get("source", "unknown")
+        user_ids = []
+        for user_id, predicate in predicates:
+            key = (user_id, source_name)
+            if per_user_source_limit is not None and counts.get(key, 0) >= per_user_source_limit:
+                continue
+            if predicate(ap):
+                user_ids.append(user_id)
+                counts[key] = counts.get(key, 0) + 1
+        yield ap, user_ids
+
+
+def iter_indexed_matches(listings, store, per_user_source_limit=None):
+    """
+    Pair each listing with its matching users, queried from the user store.
+
+    Same result as iter_matches over the store's active users, but each
+    listing costs one indexed range query instead of one predicate call
+    per user.
+
+    Args:
+        listings: Iterable of apartment listings
+        store: user_store.UserStore
+        per_user_source_limit: Optional maximum number of matches per user
+            and source; further matches for that user are dropped
+
+    Yields:
+        tuple: (listing, list of matching user IDs)
+    """
+    counts = {}
+    for ap in listings:
+        source_name = ap.get("source", "unknown")
+        user_ids = []
+        for user_id in store.matching_user_ids(ap):
+            key = (user_id, source_name)
+            if per_user_source_limit is not None and counts.get(key, 0) >= per_user_source_limit:
+                continue
+            user_ids.append(user_id)
+            counts[key] = counts.get(key, 0) + 1
+        yield ap, user_ids
+
+
+def _rank_buffer(buffered, configs, allowances):
+    """
+    Pick each user's best-scoring matches of a buffer of matches.
+
+    Every user has a bounded min-heap of at most their allowance of
+    (score, listing) entries: a match replaces the worst kept one only if
+    it scores higher, so picking the top k out of n matches costs
+    O(n log k). On ties the earlier listing wins.
+
+    Returns:
+        list: (listing, user IDs it was selected for) in buffer order; the
+            list of user IDs is empty for listings no user kept
+    """
+    heaps = {}
+    for position, (ap, user_ids) in enumerate(buffered):
+        for user_id in user_ids:
+            allowance = allowances.get(user_id, 0)
+            if allowance <= 0:
+                continue
+            entry = (score_match(ap, configs[user_id]), -position)
+            heap = heaps.setdefault(user_id, [])
+            if len(heap) < allowance:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+
+    selected = {(user_id, -neg_position) for user_id, heap in heaps.items() for _, neg_position in heap}
+    return [
+        (ap, [user_id for user_id in user_ids if (user_id, position) in selected])
+        for position, (ap, user_ids) in enumerate(buffered)
+    ]
+
+
+def iter_top_k(matches, user_configs, k=None, overflow=None, sources=None, window=MAX_BUFFERED_MATCHES):
+    """
+    Keep each user's best-scoring matches of the cycle, up to their budget
+    (see ranking.user_budget).
+
+    Matches are buffered and ranked in batches (see _rank_buffer); what a
+    batch selects is yielded right away and taken off the users' budgets
+    for the rest of the cycle. A batch ends when the next match comes from
+    another source (if ``sources`` is given), so a source's picks go out as
+    soon as it is done, or when ``window`` matched listings are buffered,
+    which bounds memory and how long a match waits.
+
+    With ``sources``, each distinct ``listing["source"]`` may use at most
+    budget // sources of a user's budget in those batches, however its
+    listings are interleaved with other sources' (iter_enriched reorders
+    them). The last batch gets whatever is left, including the remainder
+    and the shares of sources with few matches. Without ``sources`` (and
+    below ``window`` matches) the whole cycle is ranked at once. Listings
+    come out in their original order within a batch.
+
+    Args:
+        matches: Iterable of (listing, user IDs) from the match stage
+        user_configs: List of (user_id, config) pairs for active users
+        k: Budget for users whose config doesn't set one (defaults to
+            ranking.MAX_MATCHES_PER_USER)
+        overflow: Optional list that receives matched listings no user kept
+        sources: Number of sources in the cycle
+        window: Most matched listings buffered before a batch is ranked
+
+    Yields:
+        tuple: (listing, list of user IDs it was selected for)
+    """
+    k = MAX_MATCHES_PER_USER if k is None else k
+    configs = dict(user_configs)
+    remaining = {}    # user_id -> budget left this cycle
+    source_used = {}  # (user_id, source) -> picks from that source before the last batch
+    buffered = []
+    current_source = None
+
+    def allowance(user_id, final):
+        budget = user_budget(configs[user_id], k)
+        left = remaining.setdefault(user_id, budget)
+        if final or not sources:
+            return left
+        share = max(budget // sources, 1) if budget > 0 else 0
+        return min(left, share - source_used.get((user_id, current_source), 0))
+
+    def flush(final):
+        allowances = {}
+        for _, user_ids in buffered:
+            for user_id in user_ids:
+                if user_id not in allowances and user_id in configs:
+                    allowances[user_id] = allowance(user_id, final)
+
+        for ap, kept in _rank_buffer(buffered, configs, allowances):
+            if kept:
+                for user_id in kept:
+                    remaining[user_id] -= 1
+                    if not final:
+                        key = (user_id, current_source)
+                        source_used[key] = source_used.get(key, 0) + 1
+                yield ap, kept
+            elif overflow is not None:
+                overflow.append(ap)
+        buffered.clear()
+
+    for ap, user_ids in matches:
+        if not user_ids:
+            continue
+        source = ap.get("source")
+        if sources and buffered and source != current_source:
+            yield from flush(final=False)
+        current_source = source
+        buffered.append((ap, user_ids))
+        if len(buffered) >= window:
+            yield from flush(final=False)
+
+    yield from flush(final=True)
+
+
+def iter_price_drops(events, user_configs):
+    """
+    Pair price drops with the users who opted in and still match.
+
+    Args:
+        events: Snapshot events from iter_snapshot_diff
+        user_configs: List of (user_id, config) pairs for active users
+
+    Yields:
+        tuple: (listing with its old price as "previous_price", list of user IDs)
+    """
+    subscribers = [
+        (user_id, get_user_predicate(user_id, config))
+        for user_id, config in user_configs if config.get("price_drops")
+    ]
+    if not subscribers:
+        return
+    for event in events:
+        if not is_price_drop(event):
+            continue
+        ap = event["listing"]
+        user_ids = [user_id for user_id, predicate in subscribers if predicate(ap)]
+        if user_ids:
+            yield dict(ap, previous_price=event["previous"]["price"]), user_ids
+
+
+def notify_sink(send, stats):
+    """
+    Build a sink that sends each matched listing to its users.
+
+    Args:
+        send: Callable send(user_id, listing)
+        stats: Dict updated with "listings", "sent" and "failed" counts
+
+    Returns:
+        callable: Sink for (listing, user_ids) items
+    """
+    for key in ("listings", "sent", "failed"):
+        stats.setdefault(key, 0)
+
+    def sink(item):
+        ap, user_ids = item
+        stats["listings"] += 1
+        for user_id in user_ids:
+            logger.info("  Sending to %s: %s", user_id, ap["url"])
+            try:
+                send(user_id, ap)
+                stats["sent"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error(f"Failed to send to {user_id}: {e}")
+
+    return sink
+
+
+def async_notify_sink(send, stats):
+    """Async variant of notify_sink; ``send`` is a coroutine function."""
+    for key in ("listings", "sent", "failed"):
+        stats.setdefault(key, 0)
+
+    async def sink(item):
+        ap, user_ids = item
+        stats["listings"] += 1
+        for user_id in user_ids:
+            logger.info("  Sending to %s: %s", user_id, ap["url"])
+            try:
+                await send(user_id, ap)
+                stats["sent"] += 1
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error(f"Failed to send to {user_id}: {e}")
+
+    return sink
+
+
+def load_active_user_configs():
+    """Get (user_id, config) pairs for every active registered user."""
+    return get_active_user_configs()
@@ -4,20 +4,29 @@ Pre-flight check script for the apartment bot.
 Run this before deploying to production to verify everything works.
 
 Usage:
-    python preflight.py           # Run all checks
-    python preflight.py --quick   # Skip scraping test (faster)
-    python preflight.py --scrape  # Only test scraping
+    python preflight.py              # Run all checks
+    python preflight.py --quick      # Skip scraping test (faster)
+    python preflight.py --scrape     # Only test scraping
+    python preflight.py --cold-start # Only check cron_job import time
 """
 
 import os
 import sys
 import argparse
+import subprocess
 
 # Change to script directory
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 
+# Cold start budget for `import cron_job` (measured with -X importtime)
+COLD_START_BUDGET_MS = int(os.getenv("COLD_START_BUDGET_MS", "80"))
+
+# Modules that must only be imported when a source actually runs
+LAZY_MODULES = ("requests", "playwright", "bs4", "lxml", "scrappers", "numpy")
+
+
 class Colors:
     GREEN = '\033[92m'
     RED = '\033[91m'
@@ -59,6 +68,7 @@ def check_dependencies():
         ("lxml", "lxml"),
         ("telegram", "python-telegram-bot"),
         ("playwright.sync_api", "playwright"),
+        ("numpy", "numpy"),
     ]
 
     for module, package in dependencies:
@@ -175,6 +185,77 @@ def check_imports():
     return all_ok
 
 
+def measure_import_time(module="cron_job", runs=3):
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    The fastest of ``runs`` imports is reported, so the first run (which may
+    also compile bytecode) and scheduling noise do not count.
+
+    Returns:
+        tuple: (cumulative import time in ms, set of imported module names)
+    """
+    best_ms = None
+    imported = set()
+
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            timeout=60,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed: {result.stderr[-500:]}")
+
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            # Format: "import time: self [us] | cumulative | imported package"
+            parts = line[len("import time:"):].split("|")
+            if len(parts) != 3 or not parts[1].strip().isdigit():
+                continue  # Header line
+            name = parts[2].strip()
+            imported.add(name)
+            if name == module:
+                total_ms = int(parts[1]) / 1000
+                best_ms = total_ms if best_ms is None else min(best_ms, total_ms)
+
+    return best_ms, imported
+
+
+def check_cold_start(budget_ms=COLD_START_BUDGET_MS):
+    """Check that cron_job starts fast and does not import scraper dependencies."""
+    header("Checking Cold Start")
+
+    try:
+        total_ms, imported = measure_import_time("cron_job")
+    except Exception as e:
+        fail(f"Could not measure import time: {e}")
+        return False
+
+    all_ok = True
+    eager = sorted(
+        name for name in imported
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+    if eager:
+        fail(f"Imported at startup (should be lazy): {', '.join(eager)}")
+        all_ok = False
+
+    if total_ms is None:
+        fail("cron_job import time not found in -X importtime output")
+        all_ok = False
+    elif total_ms > budget_ms:
+        fail(f"import cron_job took {total_ms:.0f} ms (budget: {budget_ms} ms)")
+        all_ok = False
+    else:
+        ok(f"import cron_job took {total_ms:.0f} ms (budget: {budget_ms} ms)")
+
+    return all_ok
+
+
 def test_scraping(max_pages=1):
     """Test that scrapers can fetch real data."""
     header("Testing Scrapers (this may take a minute)")
@@ -195,7 +276,7 @@ def test_scraping(max_pages=1):
         fail(f"ArgenProp: {e}")
         all_ok = False
 
-    # Test ZonaProp (Playwright-based)
+    # Test ZonaProp (HTTP first, Playwright fallback)
     try:
         from scrappers.zonaprop import scrape_zonaprop
         listings = scrape_zonaprop(max_pages=max_pages)
@@ -208,7 +289,7 @@ def test_scraping(max_pages=1):
         fail(f"ZonaProp: {e}")
         all_ok = False
 
-    # Test MercadoLibre (Playwright-based)
+    # Test MercadoLibre (HTTP first, Playwright fallback)
     try:
         from scrappers.mercadolibre import scrape_mercadolibre
         listings = scrape_mercadolibre(max_pages=max_pages)
@@ -315,6 +396,7 @@ def main():
     parser = argparse.ArgumentParser(description="Pre-flight checks for apartment bot")
     parser.add_argument("--quick", action="store_true", help="Skip slow checks (scraping)")
     parser.add_argument("--scrape", action="store_true", help="Only test scraping")
+    parser.add_argument("--cold-start", action="store_true", help="Only check cron_job import time")
     args = parser.parse_args()
 
     print(f"{Colors.BOLD}Apartment Bot Pre-flight Check{Colors.RESET}")
@@ -322,7 +404,9 @@ def main():
 
     all_passed = True
 
-    if args.scrape:
+    if args.cold_start:
+        all_passed &= check_cold_start()
+    elif args.scrape:
         # Only run scraping tests
         all_passed &= check_playwright_browsers()
         all_passed &= test_scraping(max_pages=2)
@@ -332,6 +416,7 @@ def main():
         all_passed &= check_env_variables()
         all_passed &= check_imports()
         all_passed &= check_data_files()
+        all_passed &= check_cold_start()
         all_passed &= test_telegram_connection()
 
         if not args.quick:
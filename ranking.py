@@ -0,0 +1,74 @@
+"""
+Scoring of (user, listing) matches.
+
+Each cycle sends every user at most their budget of listings (see
+pipeline.iter_top_k). Instead of the first matches in page order, the
+highest-scoring ones are picked. The score is a weighted sum of:
+
+- budget: how far price + expensas stay below the user's max price + max
+  expensas
+- price_per_room: price per ambiente compared to max_price / min_rooms
+- location: 1 inside the casco urbano, 0.5 when unknown, 0 outside
+
+Each component is clipped to [-1, 1], so one extreme value can't dominate.
+"""
+
+from functools import lru_cache
+
+from location_filter import is_in_casco_urbano
+
+# Matches sent per user and cycle unless the config sets "max_per_cycle"
+# (was 2 per source x 4 sources)
+MAX_MATCHES_PER_USER = 8
+MAX_USER_BUDGET = 20  # Highest "max_per_cycle" a user can set (/cantidad)
+
+WEIGHTS = {"budget": 1.0, "price_per_room": 0.5, "location": 0.3}
+
+# Expensas assumed for listings that don't publish them, as a share of the
+# user's max_expensas
+UNKNOWN_EXPENSAS_SHARE = 0.5
+
+LOCATION_CONFIDENCE = {True: 1.0, None: 0.5, False: 0.0}
+
+
+def _clip(value):
+    return max(-1.0, min(1.0, value))
+
+
+@lru_cache(maxsize=4096)
+def location_confidence(address):
+    """Confidence that an address is inside the casco urbano (cached per address)."""
+    return LOCATION_CONFIDENCE[is_in_casco_urbano(address)]
+
+
+def score_match(ap, config):
+    """
+    Score a listing for a user; higher is better.
+
+    Args:
+        ap: Matching apartment listing (price and rooms are known)
+        config: The user's criteria
+
+    Returns:
+        float: Weighted score
+    """
+    expensas = ap.get("expensas")
+    if expensas is None:
+        expensas = config["max_expensas"] * UNKNOWN_EXPENSAS_SHARE
+    budget = config["max_price"] + config["max_expensas"]
+    budget_fit = 1 - (ap["price"] + expensas) / budget if budget else 0.0
+
+    reference = config["max_price"] / max(config["min_rooms"], 1)
+    price_per_room = 1 - (ap["price"] / max(ap["rooms"], 1)) / reference if reference else 0.0
+
+    return (
+        WEIGHTS["budget"] * _clip(budget_fit)
+        + WEIGHTS["price_per_room"] * _clip(price_per_room)
+        + WEIGHTS["location"] * location_confidence(ap.get("address") or "")
+    )
+
+
+def user_budget(config, default=MAX_MATCHES_PER_USER):
+    """Matches a user gets per cycle."""
+    budget = config.get("max_per_cycle")
+    return default if budget is None else budget
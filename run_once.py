@@ -16,27 +16,28 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from scrappers.argenprop import scrape_argenprop
-from scrappers.zonaprop import scrape_zonaprop
-from scrappers.mercadolibre import scrape_mercadolibre
-from scrappers.browser_manager import close_browser
-from filters import matches
+from functools import partial
+
+from sources import enabled_sources, close_browser_if_loaded
+from pipeline import (
+    run_pipeline, iter_new, iter_unique, iter_enriched, iter_indexed_matches, notify_sink,
+    load_active_user_configs
+)
 from notifier import send_message
 from storage import load_sent, save_sent
-from user_config import get_user_config, get_all_user_ids
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log'),
-        logging.StreamHandler()
-    ]
-)
+from user_config import get_store
+from dedup import load_fingerprints, save_fingerprints
+from enrichment import DetailEnricher, load_detail_cache, save_detail_cache
+
+# Configure logging (written by a background thread, rotated and compressed)
+from log_setup import setup_logging
+
+setup_logging('bot.log', fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+SOURCES = ["argenprop", "zonaprop", "mercadolibre"]
+MAX_PAGES = 5
 
 
 def check_and_notify_sync():
@@ -50,46 +51,36 @@ def check_and_notify_sync():
         sent = load_sent()
         logger.info(f"Loaded {len(sent)} previously sent listings")
 
-        # Scrape all sources
-        listings = []
-
-        logger.info("Scraping ArgenProp...")
-        listings.extend(scrape_argenprop(max_pages=5))
-
-        logger.info("Scraping ZonaProp...")
-        listings.extend(scrape_zonaprop(max_pages=5))
-
-        logger.info("Scraping MercadoLibre...")
-        listings.extend(scrape_mercadolibre(max_pages=5))
-
-        logger.info(f"Found {len(listings)} total listings from all sources")
-
         # Get all registered users
-        user_ids = get_all_user_ids()
-        logger.info(f"Checking for {len(user_ids)} registered users")
-
-        new_count = 0
-        for ap in listings:
-            if ap["id"] in sent:
-                continue
-
-            # Check each user's criteria
-            for user_id in user_ids:
-                config = get_user_config(user_id)
-                if not config.get("active", True):
-                    continue
-
-                if matches(ap, config):
-                    logger.info(f"Sending to user {user_id}: {ap['url']}")
-                    try:
-                        send_message(TOKEN, user_id, ap)
-                        new_count += 1
-                    except Exception as e:
-                        logger.error(f"Failed to send to user {user_id}: {e}")
-
-            sent.add(ap["id"])
+        user_configs = load_active_user_configs()
+        logger.info(f"Checking for {len(user_configs)} registered users")
+
+        fingerprints = load_fingerprints()
+        enricher = DetailEnricher(cache=load_detail_cache())
+
+        # Scrape all sources and send every new matching listing
+        stats = {}
+        try:
+            run_pipeline(
+                enabled_sources(SOURCES),
+                stages=[
+                    partial(iter_new, sent=sent),
+                    partial(iter_enriched, user_configs=user_configs, enricher=enricher),
+                    # After enrichment: rooms/expensas missing from cards are needed to fingerprint
+                    partial(iter_unique, index=fingerprints),
+                    partial(iter_indexed_matches, store=get_store()),
+                ],
+                sink=notify_sink(partial(send_message, TOKEN), stats),
+                max_pages=MAX_PAGES,
+            )
+        finally:
+            enricher.close()
+        new_count = stats["sent"]
+        logger.info(f"Found {stats['listings']} new listings from all sources")
 
         save_sent(sent)
+        save_fingerprints(fingerprints)
+        save_detail_cache(enricher.cache)
         logger.info(f"Sent {new_count} new listings")
         logger.info("=" * 50)
 
@@ -102,4 +93,4 @@ if __name__ == "__main__":
         check_and_notify_sync()
     finally:
         # Cleanup browser
-        close_browser()
+        close_browser_if_loaded()
@@ -0,0 +1,249 @@
+"""
+Adaptive per-source polling schedule.
+
+Each source's new-listing arrival rate is estimated from how many page-1
+listing IDs changed since its previous poll. The polling interval is then
+chosen so that roughly TARGET_NEW_PER_POLL new listings arrive between
+polls, clamped to [MIN_INTERVAL, MAX_INTERVAL]. A busy site is polled
+often, a quiet one rarely.
+
+A due source is always scraped in full and every listing ID it returns is
+recorded for the next rate estimate (ScheduledSource). There is no early
+"nothing new" probe: each source fetches a single result page, and that
+page has to be downloaded before any of its IDs are known, so stopping
+part-way through it would not save a request.
+
+The entry points run every MIN_INTERVAL and only scrape the sources that
+are due; cycle_lock() keeps a slow cycle from overlapping the next one.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_FILE = Path("schedule.json")
+LOCK_FILE = Path("cycle.lock")
+
+MIN_INTERVAL = 15 * 60       # Never poll a source more often than this (seconds)
+MAX_INTERVAL = 6 * 60 * 60   # Never poll a source less often than this (seconds)
+DEFAULT_INTERVAL = 60 * 60   # Interval for a source without history
+
+TARGET_NEW_PER_POLL = 1.0    # Expected new listings between two polls
+RATE_SMOOTHING = 0.3         # Weight of the latest observation in the rate EWMA
+MAX_KNOWN_IDS = 100          # Page-1 IDs remembered per source
+
+_process_lock = threading.Lock()
+
+
+def load_schedule():
+    """
+    Load per-source schedule state.
+
+    Returns:
+        dict: Source name -> state dict (rate, interval, last_run, next_run, known_ids)
+    """
+    try:
+        if SCHEDULE_FILE.exists():
+            data = json.loads(SCHEDULE_FILE.read_text(encoding='utf-8'))
+            if isinstance(data, dict):
+                return data
+            logger.warning("schedule.json contains invalid data, resetting")
+        return {}
+    except Exception as e:
+        logger.error(f"Failed to load schedule.json: {e}. Resetting schedule.")
+        return {}
+
+
+def save_schedule(schedule):
+    """Save per-source schedule state to disk using atomic write."""
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            dir=SCHEDULE_FILE.parent,
+            delete=False,
+            suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(schedule, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+        temp_path.replace(SCHEDULE_FILE)
+        logger.debug(f"Saved schedule for {len(schedule)} sources")
+
+    except Exception as e:
+        logger.error(f"Failed to save schedule.json: {e}", exc_info=True)
+
+
+def choose_interval(rate_per_hour):
+    """
+    Pick a polling interval for an arrival rate.
+
+    Args:
+        rate_per_hour: Estimated new listings per hour
+
+    Returns:
+        int: Interval in seconds within [MIN_INTERVAL, MAX_INTERVAL]
+    """
+    if rate_per_hour <= 0:
+        return MAX_INTERVAL
+    interval = TARGET_NEW_PER_POLL / rate_per_hour * 3600
+    return int(min(max(interval, MIN_INTERVAL), MAX_INTERVAL))
+
+
+def is_due(schedule, name, now=None):
+    """Check if a source should be polled now."""
+    now = time.time() if now is None else now
+    state = schedule.get(name)
+    if not state:
+        return True
+    return now >= state.get("next_run", 0)
+
+
+def record_poll(schedule, name, ids, now=None):
+    """
+    Update a source's arrival rate and next poll time after a poll.
+
+    Args:
+        schedule: Schedule dict (updated in place)
+        name: Source name
+        ids: Listing IDs seen on this poll, newest first
+        now: Poll time (defaults to now)
+
+    Returns:
+        int: Number of IDs not seen on the previous poll
+    """
+    now = time.time() if now is None else now
+    state = schedule.setdefault(name, {})
+    known = set(state.get("known_ids", []))
+
+    if not ids:
+        # Failed or blocked scrape: no information, retry on the next cycle
+        state["next_run"] = now + MIN_INTERVAL
+        logger.info(f"{name}: no listings on this poll, retrying in {MIN_INTERVAL // 60} min")
+        return 0
+
+    new_count = sum(1 for listing_id in ids if listing_id not in known)
+
+    last_run = state.get("last_run")
+    if last_run is not None and known:
+        elapsed_hours = max(now - last_run, 60) / 3600
+        observed = new_count / elapsed_hours
+        previous = state.get("rate")
+        state["rate"] = observed if previous is None else (
+            RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * previous
+        )
+        state["interval"] = choose_interval(state["rate"])
+    else:
+        # First poll: no baseline to count arrivals against yet
+        state["interval"] = DEFAULT_INTERVAL
+
+    # Remember newest IDs first, including older ones not seen this time
+    current = set(ids)
+    merged = list(ids) + [i for i in state.get("known_ids", []) if i not in current]
+    state["known_ids"] = merged[:MAX_KNOWN_IDS]
+    state["last_run"] = now
+    state["next_run"] = now + state["interval"]
+
+    logger.info(
+        f"{name}: {new_count} new on page 1, rate {state.get('rate', 0):.2f}/h, "
+        f"next poll in {state['interval'] // 60} min"
+    )
+    return new_count
+
+
+class ScheduledSource:
+    """
+    Wraps a SourceSpec with poll bookkeeping.
+
+    Exposes the same attributes the pipeline engine uses (name, label,
+    needs_browser, scrape), so it can be passed wherever a SourceSpec is.
+    """
+
+    def __init__(self, spec, schedule):
+        self.spec = spec
+        self.schedule = schedule
+        self.name = spec.name
+        self.label = spec.label
+        self.needs_browser = spec.needs_browser
+
+    def scrape(self, max_pages=None, **kwargs):
+        """Stream listings, recording their IDs for the arrival rate."""
+        ids = []
+
+        try:
+            for ap in self.spec.scrape(max_pages=max_pages, **kwargs):
+                ids.append(ap["id"])
+                yield ap
+        finally:
+            record_poll(self.schedule, self.name, ids)
+
+
+def scheduled_sources(specs, schedule, now=None):
+    """
+    Get the sources due for polling, wrapped with poll bookkeeping.
+
+    Args:
+        specs: List of SourceSpec objects
+        schedule: Schedule dict from load_schedule()
+        now: Current time (defaults to now)
+
+    Returns:
+        list: ScheduledSource objects for the due sources
+    """
+    due = []
+    for spec in specs:
+        if is_due(schedule, spec.name, now):
+            due.append(ScheduledSource(spec, schedule))
+        else:
+            wait = schedule[spec.name]["next_run"] - (time.time() if now is None else now)
+            logger.info(f"Skipping {spec.label}: next poll in {int(wait // 60)} min")
+    return due
+
+
+@contextmanager
+def cycle_lock(path=None):
+    """
+    Guard a cycle against overlapping with another one.
+
+    Uses an in-process lock (for the bot's job queue) plus an exclusive
+    file lock (for cron runs started while the previous one is still
+    going). Does not block.
+
+    Yields:
+        bool: True if the lock was acquired, False if a cycle is running
+    """
+    path = LOCK_FILE if path is None else path
+
+    if not _process_lock.acquire(blocking=False):
+        yield False
+        return
+
+    lock_file = None
+    try:
+        try:
+            import fcntl
+        except ImportError:  # Non-POSIX: in-process lock only
+            fcntl = None
+
+        if fcntl is not None:
+            lock_file = open(path, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                yield False
+                return
+
+        yield True
+    finally:
+        if lock_file is not None:
+            lock_file.close()  # Releases the flock
+        _process_lock.release()
@@ -0,0 +1,155 @@
+"""
+Shared scrape results for the bot's scheduled check and /run.
+
+Every /run used to scrape all sources again, Chromium included, so a few
+users typing /run at once started as many full scrapes, all queued behind
+the single Playwright thread. Sources are now wrapped with a CachedSource:
+
+- A source's listings are kept for SCRAPE_CACHE_TTL seconds after a
+  complete scrape. The scheduled check stores what it scrapes and /run
+  answers from the cache while it is fresh.
+- Scrapes are single-flight: while a source is being scraped, other
+  requests for it wait for that scrape and use its result instead of
+  starting their own. They wait at most SCRAPE_WAIT_TIMEOUT seconds, then
+  scrape on their own; a scrape in flight for longer than that (e.g. one
+  whose consumer abandoned it) no longer blocks new requests.
+
+Only complete scrapes are cached; one that raised, was blocked or was
+stopped early by its consumer leaves the previous entry alone.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", "900"))  # 15 minutes
+SCRAPE_WAIT_TIMEOUT = int(os.getenv("SCRAPE_WAIT_TIMEOUT", "300"))  # Longest wait for another scrape
+
+
+class ScrapeCache:
+    """
+    Listings of each source's last complete scrape, with in-flight tracking.
+
+    Args:
+        ttl: Seconds a scrape stays fresh
+        wait_timeout: Seconds a caller waits for another caller's scrape
+    """
+
+    def __init__(self, ttl=SCRAPE_CACHE_TTL, wait_timeout=SCRAPE_WAIT_TIMEOUT):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.entries = {}    # source -> (scraped_at, listings)
+        self.stats = Counter()
+        self._inflight = {}  # source -> (threading.Event set when its scrape ends, start time)
+        self._lock = threading.Lock()
+
+    def fresh(self, name, now=None):
+        """Get a source's cached listings, or None if missing or expired."""
+        now = time.time() if now is None else now
+        entry = self.entries.get(name)
+        if entry is None or now - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def store(self, name, listings, now=None):
+        """Cache a source's listings from a complete scrape."""
+        self.entries[name] = (time.time() if now is None else now, list(listings))
+
+    def _join_or_lead(self, name):
+        """
+        Register interest in scraping a source.
+
+        A scrape in flight for longer than wait_timeout is treated as
+        abandoned, and the caller leads a new one.
+
+        Returns:
+            tuple: (event, leader) - the leader scrapes and sets the event
+        """
+        now = time.monotonic()
+        with self._lock:
+            inflight = self._inflight.get(name)
+            if inflight is not None and now - inflight[1] < self.wait_timeout:
+                return inflight[0], False
+            event = threading.Event()
+            self._inflight[name] = (event, now)
+            return event, True
+
+    def _finish(self, name, event):
+        with self._lock:
+            inflight = self._inflight.get(name)
+            if inflight is not None and inflight[0] is event:
+                del self._inflight[name]
+        event.set()
+
+
+class CachedSource:
+    """
+    Wraps a SourceSpec with the scrape cache.
+
+    Exposes the same attributes the pipeline engine uses (name, label,
+    needs_browser, scrape), so it can be passed wherever a SourceSpec is.
+
+    Args:
+        spec: Source to wrap
+        cache: ScrapeCache shared by every caller
+        refresh: Always scrape (unless a scrape is in flight) and store the
+            result; used by the scheduled check, which needs new listings
+    """
+
+    def __init__(self, spec, cache, refresh=False):
+        self.spec = spec
+        self.cache = cache
+        self.refresh = refresh
+        self.name = spec.name
+        self.label = spec.label
+        self.needs_browser = spec.needs_browser
+
+    def scrape(self, max_pages=None, **kwargs):
+        """Stream cached listings if fresh, else join or run the scrape."""
+        if not self.refresh:
+            cached = self.cache.fresh(self.name)
+            if cached is not None:
+                self.cache.stats["hits"] += 1
+                yield from map(dict, cached)  # Copies: later stages may modify listings
+                return
+
+        event, leader = self.cache._join_or_lead(self.name)
+        if not leader:
+            self.cache.stats["coalesced"] += 1
+            logger.info(f"{self.label}: waiting for the scrape in progress")
+            if event.wait(self.cache.wait_timeout):
+                cached = self.cache.fresh(self.name)
+                if cached is not None:
+                    yield from map(dict, cached)
+                    return
+            else:
+                self.cache.stats["wait_timeouts"] += 1
+                logger.warning(f"{self.label}: scrape in progress did not finish in "
+                               f"{self.cache.wait_timeout}s, scraping directly")
+            # That scrape failed or hangs: try on our own, without coalescing
+            yield from self.spec.scrape(max_pages=max_pages, **kwargs)
+            return
+
+        # From here on the event must be set however the generator ends:
+        # exhausted, raised, or closed early (GeneratorExit)
+        listings = []
+        complete = False
+        try:
+            self.cache.stats["misses"] += 1
+            for ap in self.spec.scrape(max_pages=max_pages, **kwargs):
+                listings.append(ap)
+                yield ap
+            complete = True
+        finally:
+            if complete:
+                self.cache.store(self.name, listings)
+            self.cache._finish(self.name, event)
+
+
+def cached_sources(specs, cache, refresh=False):
+    """Wrap each source with the scrape cache."""
+    return [CachedSource(spec, cache, refresh) for spec in specs]
@@ -1,15 +1,19 @@
 import requests
+import http_session
+from circuit_breaker import raise_if_blocked
 from bs4 import BeautifulSoup
+import os
 import re
 import time
 import logging
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://www.argenprop.com"
+# Overridable to point the scraper at a local stand-in (see fake_sites.py)
+BASE_URL = os.getenv("ARGENPROP_BASE_URL", "https://www.argenprop.com").rstrip("/")
 # Order by most recent (orden-masnuevos) to get newest listings first
 # SEARCH_BASE = "https://www.argenprop.com/departamentos/alquiler/la-plata--orden-masnuevos"
-SEARCH_BASE = "https://www.argenprop.com/departamentos/alquiler/la-plata?orden-masnuevos"
+SEARCH_BASE = f"{BASE_URL}/departamentos/alquiler/la-plata?orden-masnuevos"
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
@@ -89,7 +93,21 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
     Returns:
         list: List of apartment listing dictionaries
     """
-    listings = []
+    return list(iter_argenprop(max_pages=max_pages, delay=delay, max_retries=max_retries))
+
+
+def iter_argenprop(max_pages=1, delay=2, max_retries=3):
+    """
+    Stream apartment listings from ArgenProp as each card is parsed.
+
+    Same arguments as scrape_argenprop. The next page is only fetched once
+    the consumer has handled every card of the current one.
+
+    Yields:
+        dict: Apartment listing dictionary
+    """
+    count = 0
+    page = 1
 
     for page in range(1, max_pages + 1):
         url = SEARCH_BASE if page == 1 else f"{SEARCH_BASE}-pagina-{page}"
@@ -99,13 +117,14 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
         r = None
         for retry in range(max_retries):
             try:
-                r = requests.get(url, headers=HEADERS, timeout=15)
+                r = http_session.get(url, headers=HEADERS, timeout=15)
+                raise_if_blocked(r)  # Retrying a challenge page doesn't help
                 r.raise_for_status()
                 break
             except requests.exceptions.RequestException as e:
                 if retry == max_retries - 1:
                     logger.error(f"Failed to fetch page {page} after {max_retries} attempts: {e}")
-                    return listings  # Return what we have so far
+                    return  # Keep what was already yielded
                 logger.warning(f"Page {page} request failed (attempt {retry + 1}/{max_retries}), retrying...")
                 time.sleep(delay * (retry + 1))
 
@@ -140,7 +159,7 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
                     # Get the price element (contains both rent and expensas)
                     price_elem = card.select_one(".card__price")
                     if not price_elem:
-                        logger.warning(f"Listing {full_url} missing price, skipping")
+                        logger.warning("Listing %s missing price, skipping", full_url)
                         continue
                     
                     # Parse price and expensas together
@@ -148,7 +167,7 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
                     price, expensas = parse_price_and_expensas(price_text)
                     
                     if price is None:
-                        logger.warning(f"Could not parse price from: {price_text}")
+                        logger.warning("Could not parse price from: %s", price_text)
                         continue
 
                     # Get full text for rooms
@@ -171,15 +190,17 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
                         "source": "argenprop"
                     }
                     
-                    listings.append(listing)
-                    
-                    # Log parsed data
-                    exp_str = f"${expensas:,}" if expensas else "N/A"
-                    rooms_str = f"{rooms} amb" if rooms else "N/A"
-                    logger.debug(f"✓ ${price:,} + {exp_str} | {rooms_str}")
+                    # Log parsed data (only built when DEBUG is on)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        exp_str = f"${expensas:,}" if expensas else "N/A"
+                        rooms_str = f"{rooms} amb" if rooms else "N/A"
+                        logger.debug(f"✓ ${price:,} + {exp_str} | {rooms_str}")
+
+                    count += 1
+                    yield listing
 
                 except Exception as e:
-                    logger.warning(f"Error parsing listing card: {e}")
+                    logger.warning("Error parsing listing card: %s", e)
                     continue
 
         except Exception as e:
@@ -188,5 +209,4 @@ def scrape_argenprop(max_pages=1, delay=2, max_retries=3):
 
         time.sleep(delay)  # be polite
 
-    logger.info(f"Successfully scraped {len(listings)} listings from {min(page, max_pages)} pages")
-    return listings
\ No newline at end of file
+    logger.info(f"Successfully scraped {count} listings from {min(page, max_pages)} pages")
\ No newline at end of file
@@ -2,12 +2,30 @@
 Shared browser manager for Playwright-based scrapers.
 Reuses a single browser instance to reduce memory usage.
 Runs Playwright in a separate thread to avoid asyncio conflicts.
+
+Each source keeps a warm context and page (get_page/release_page) that is
+reused across scrapes. Its session (cookies, localStorage) is kept after a
+scrape that found listings and saved to disk, so the next run starts as a
+returning visitor; it is cleared and forgotten when the source blocks us
+(see browser_state). After each use the page's JS heap and Chromium's
+total RSS are sampled; a context is only recycled when its heap exceeds
+CONTEXT_HEAP_BUDGET_MB, and every context (then the whole browser) when
+Chromium exceeds BROWSER_RSS_BUDGET_MB, so the launch cost is paid once per
+worker lifetime. Renderer processes are shared between contexts and can't
+be attributed to one, so the per-context budget is a JS heap budget.
 """
 
 import logging
+import os
+import queue
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Playwright
+from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page, Playwright
+
+from circuit_breaker import SourceBlocked, detect_block
+from memory import chromium_rss_mb
+from .browser_state import invalidate_state, load_state, record_scrape, save_state
 
 logger = logging.getLogger(__name__)
 
@@ -16,45 +34,61 @@ _playwright: Playwright = None
 _browser: Browser = None
 _lock = threading.Lock()
 
+# Warm context and page per source: source -> (context, page)
+_pages = {}
+
+# Whether each warm context carries a previous session: source -> bool
+_restored = {}
+
+# Memory budgets (MB) before a context (JS heap) or the whole browser (RSS) is recycled
+CONTEXT_HEAP_BUDGET_MB = int(os.getenv("BROWSER_CONTEXT_HEAP_MB", "150"))
+BROWSER_RSS_BUDGET_MB = int(os.getenv("BROWSER_RSS_MB", "400"))
+
 # Thread pool for running Playwright operations - keeps Playwright in same thread
 _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="playwright")
 
+# Marks the end of a streamed scrape (see stream_in_browser_thread)
+_STREAM_DONE = object()
 
-def _get_or_create_browser():
-    """Initialize browser (runs in executor thread)."""
-    global _playwright, _browser
+# Listings a streamed scrape may parse ahead of its consumer
+STREAM_QUEUE_SIZE = int(os.getenv("BROWSER_STREAM_QUEUE", "50"))
 
-    if _browser is None or not _browser.is_connected():
-        logger.info("Launching shared Chromium browser...")
 
-        if _playwright is None:
-            _playwright = sync_playwright().start()
+class StreamCancelled(BaseException):
+    """
+    Raised inside the Playwright thread when the consumer of a streamed
+    scrape has gone away. A BaseException so the scrapers' per-page
+    ``except Exception`` handlers don't swallow it and keep scraping.
+    """
 
-        _browser = _playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-gpu',
-                '--disable-extensions',
-                '--disable-background-networking',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-translate',
-                '--mute-audio',
-                '--no-first-run',
-                '--safebrowsing-disable-auto-update',
-                # Additional memory optimization flags
-                '--disable-software-rasterizer',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--disable-renderer-backgrounding',
-                '--js-flags=--max-old-space-size=256',
-            ]
-        )
-        logger.info("Browser launched successfully")
+LAUNCH_ARGS = [
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--mute-audio',
+    '--no-first-run',
+    '--safebrowsing-disable-auto-update',
+    # Additional memory optimization flags
+    '--disable-software-rasterizer',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection',
+    '--disable-renderer-backgrounding',
+    '--js-flags=--max-old-space-size=256',
+]
 
-    return _browser
+# Clears web storage of the page's current origin
+_CLEAR_STORAGE_JS = """() => {
+    try { localStorage.clear(); } catch (e) {}
+    try { sessionStorage.clear(); } catch (e) {}
+}"""
+
+# JS heap of the page in bytes (Chromium only)
+_JS_HEAP_JS = "() => (performance.memory && performance.memory.usedJSHeapSize) || 0"
 
 
 def run_in_browser_thread(func, *args, **kwargs):
@@ -69,6 +103,69 @@ def run_in_browser_thread(func, *args, **kwargs):
     return future.result(timeout=300)  # 5 minute timeout for scraping
 
 
+def stream_in_browser_thread(func, *args, timeout=300, **kwargs):
+    """
+    Run a scraping function in the Playwright thread and yield its listings
+    as they are parsed.
+
+    The function must accept an ``on_listing`` keyword argument and call it
+    once per parsed listing. Listings are handed over through a bounded
+    queue, so the caller can process page 1 while later pages are still
+    loading but a slow caller holds the scrape back instead of letting it
+    buffer without limit.
+
+    If the caller stops early (closes the generator) or the scrape times
+    out, the next ``on_listing`` call raises StreamCancelled so the scrape
+    unwinds and frees the single Playwright thread for the next job.
+
+    Raises:
+        TimeoutError: If the whole scrape takes longer than ``timeout`` seconds
+    """
+    items = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+
+    def _put(item):
+        while not cancelled.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _on_listing(listing):
+        if not _put(listing):
+            raise StreamCancelled()
+
+    def _wrapper():
+        try:
+            return func(*args, on_listing=_on_listing, **kwargs)
+        except StreamCancelled:
+            logger.debug("Streamed browser scrape cancelled by its consumer")
+        finally:
+            _put(_STREAM_DONE)
+
+    future = _executor.submit(_wrapper)
+    deadline = time.monotonic() + timeout
+
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                item = items.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"Browser scrape did not finish within {timeout}s")
+            if item is _STREAM_DONE:
+                break
+            yield item
+    finally:
+        cancelled.set()  # Stops a scrape whose consumer left early
+
+    future.result()  # Re-raise errors from the Playwright thread
+
+
 def get_browser() -> Browser:
     """
     Get or create a shared browser instance.
@@ -78,53 +175,160 @@ def get_browser() -> Browser:
 
     if _browser is None or not _browser.is_connected():
         logger.info("Launching shared Chromium browser...")
+        _pages.clear()  # Contexts of a previous browser are gone
+        _restored.clear()
 
         if _playwright is None:
             _playwright = sync_playwright().start()
 
-        _browser = _playwright.chromium.launch(
-            headless=True,
-            args=[
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-gpu',
-                '--disable-extensions',
-                '--disable-background-networking',
-                '--disable-default-apps',
-                '--disable-sync',
-                '--disable-translate',
-                '--mute-audio',
-                '--no-first-run',
-                '--safebrowsing-disable-auto-update',
-                # Additional memory optimization flags
-                '--disable-software-rasterizer',
-                '--disable-features=TranslateUI',
-                '--disable-ipc-flooding-protection',
-                '--disable-renderer-backgrounding',
-                '--js-flags=--max-old-space-size=256',
-            ]
-        )
+        _browser = _playwright.chromium.launch(headless=True, args=LAUNCH_ARGS)
         logger.info("Browser launched successfully")
 
     return _browser
 
 
-def create_context() -> BrowserContext:
+def create_context(storage_state=None) -> BrowserContext:
     """
     Create a new browser context with standard settings.
     Must be called from within run_in_browser_thread context.
+
+    Args:
+        storage_state: Cookies and localStorage to start with (see browser_state.load_state)
     """
     browser = get_browser()
     return browser.new_context(
         viewport={"width": 1280, "height": 720},  # Smaller viewport to save memory
-        user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        user_agent="Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        storage_state=storage_state
     )
 
 
+def get_page(source) -> Page:
+    """
+    Get the warm page for a source, creating its context on first use.
+    Must be called from within run_in_browser_thread context.
+
+    A new context starts from the source's saved session, if any.
+
+    Args:
+        source: Source name (e.g. "zonaprop")
+    """
+    get_browser()  # Relaunches (and drops stale pages) if the browser died
+
+    entry = _pages.get(source)
+    if entry is not None and entry[1].is_closed():
+        _close_context(source)
+        entry = None
+
+    if entry is None:
+        state = load_state(source)
+        context = create_context(storage_state=state)
+        entry = (context, context.new_page())
+        _pages[source] = entry
+        _restored[source] = state is not None
+        logger.debug(f"Created browser context for {source} ({'restored' if state else 'fresh'} session)")
+
+    return entry[1]
+
+
+def raise_if_page_blocked(page, response=None):
+    """
+    Fail fast if the page is a block or challenge page.
+    Must be called from within run_in_browser_thread context.
+
+    Raises:
+        SourceBlocked: If the response status, title or URL look like a block
+    """
+    status = response.status if response is not None else None
+    try:
+        title = page.title()
+    except Exception:
+        title = ""
+    reason = detect_block(status, title, page.url)
+    if reason:
+        raise SourceBlocked(reason)
+
+
+def release_page(source, first_card=None, blocked=False):
+    """
+    Reset a source's page after a scrape and recycle it if over budget.
+    Must be called from within run_in_browser_thread context.
+
+    The page is moved to about:blank so the next use doesn't pay for a new
+    context. After a scrape that found listings the session is saved for
+    the next run; after a block it is cleared and its saved copy deleted.
+
+    Args:
+        source: Source name
+        first_card: Seconds until the first listing was parsed (None if none was)
+        blocked: The scrape ended on a block or challenge page
+    """
+    entry = _pages.get(source)
+    if entry is None:
+        return
+    context, page = entry
+    restored = _restored.get(source, False)
+    record_scrape(source, restored, first_card)
+    if first_card is not None:
+        logger.info(f"{source}: first card after {first_card:.1f}s ({'restored' if restored else 'fresh'} session)")
+
+    try:
+        heap_mb = page.evaluate(_JS_HEAP_JS) / (1024 * 1024)
+        if blocked:
+            invalidate_state(source)
+            page.evaluate(_CLEAR_STORAGE_JS)
+            context.clear_cookies()
+            _restored[source] = False
+        elif first_card is not None:
+            save_state(source, context.storage_state())
+            _restored[source] = True
+        page.goto("about:blank")
+    except Exception as e:
+        logger.warning(f"Could not reset {source} page, recycling it: {e}")
+        _close_context(source)
+        return
+
+    if heap_mb > CONTEXT_HEAP_BUDGET_MB:
+        logger.info(f"{source} context has a {heap_mb:.0f} MB JS heap, recycling it")
+        _close_context(source)
+
+    _check_browser_budget()
+
+
+def _close_context(source):
+    """Close and forget a source's context (runs in executor thread)."""
+    entry = _pages.pop(source, None)
+    _restored.pop(source, None)
+    if entry is not None:
+        try:
+            entry[0].close()
+        except Exception as e:
+            logger.warning(f"Error closing {source} context: {e}")
+
+
+def _check_browser_budget():
+    """Recycle contexts, then the browser, while Chromium is over budget."""
+    total_mb = chromium_rss_mb()
+    if total_mb is None or total_mb <= BROWSER_RSS_BUDGET_MB:
+        return
+
+    logger.info(f"Chromium uses {total_mb:.0f} MB, recycling browser contexts")
+    for source in list(_pages):
+        _close_context(source)
+
+    total_mb = chromium_rss_mb()
+    if total_mb is not None and total_mb > BROWSER_RSS_BUDGET_MB:
+        logger.info(f"Chromium still uses {total_mb:.0f} MB, restarting browser")
+        _close_browser_sync()
+
+
 def _close_browser_sync():
     """Close browser (runs in executor thread)."""
     global _playwright, _browser
 
+    _pages.clear()  # Closed together with the browser
+    _restored.clear()
+
     if _browser is not None:
         try:
             _browser.close()
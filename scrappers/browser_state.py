@@ -0,0 +1,171 @@
+"""
+Per-source browser sessions persisted between runs.
+
+Every context used to start with an empty cookie jar, so ZonaProp and
+MercadoLibre saw each hourly run as a brand-new visitor: consent dialogs,
+slower first loads and more challenges. After a scrape that produced
+listings, the source's storage state (cookies and localStorage, as returned
+by Playwright's context.storage_state()) is saved to
+BROWSER_STATE_DIR/<source>.json and loaded into the next context:
+
+- A state older than BROWSER_STATE_MAX_AGE is discarded, as are cookies
+  that have expired since it was saved.
+- A blocked scrape deletes the state, so the next run starts over with a
+  fresh identity instead of replaying the cookies that got flagged.
+
+Each scrape is also recorded in stats.json per source and per session
+kind ("restored" or "fresh"): scrapes, successes and time to the first
+card, so both kinds can be compared (see session_report).
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+STATE_DIR = Path(os.getenv("BROWSER_STATE_DIR", "browser_state"))
+STATE_MAX_AGE = int(os.getenv("BROWSER_STATE_MAX_AGE", str(3 * 24 * 60 * 60)))  # 3 days
+
+RESTORED = "restored"
+FRESH = "fresh"
+
+
+def _state_path(source):
+    return STATE_DIR / f"{source}.json"
+
+
+def _write_json(path, data):
+    """Write JSON atomically (tempfile + replace)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        mode='w', encoding='utf-8', dir=path.parent, delete=False, suffix='.tmp'
+    ) as f:
+        temp_path = Path(f.name)
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    temp_path.replace(path)
+
+
+def load_state(source, now=None):
+    """
+    Load a source's saved storage state, dropping what has expired.
+
+    Args:
+        source: Source name (e.g. "zonaprop")
+        now: Current time (defaults to now)
+
+    Returns:
+        dict: Storage state for browser.new_context(storage_state=...), or
+            None if there is none or it expired
+    """
+    now = time.time() if now is None else now
+    path = _state_path(source)
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable browser state for {source}: {e}")
+        return None
+
+    if now - data.get("saved_at", 0) > STATE_MAX_AGE:
+        logger.info(f"Browser state for {source} is older than {STATE_MAX_AGE // 3600} h, discarding it")
+        invalidate_state(source)
+        return None
+
+    # Session cookies have expires == -1
+    cookies = [c for c in data.get("cookies", []) if c.get("expires", -1) < 0 or c["expires"] > now]
+    origins = data.get("origins", [])
+    if not cookies and not origins:
+        return None
+    return {"cookies": cookies, "origins": origins}
+
+
+def save_state(source, state, now=None):
+    """Save a source's storage state after a successful scrape."""
+    try:
+        _write_json(_state_path(source), {
+            "saved_at": time.time() if now is None else now,
+            "cookies": state.get("cookies", []),
+            "origins": state.get("origins", []),
+        })
+    except Exception as e:
+        logger.warning(f"Could not save browser state for {source}: {e}")
+
+
+def invalidate_state(source):
+    """Forget a source's saved storage state (e.g. after a block)."""
+    try:
+        _state_path(source).unlink(missing_ok=True)
+    except Exception as e:
+        logger.warning(f"Could not delete browser state for {source}: {e}")
+
+
+def load_stats():
+    """
+    Load per-source session stats.
+
+    Returns:
+        dict: Source -> session kind -> {"scrapes", "ok", "first_card_total", "first_card_count"}
+    """
+    try:
+        return json.loads((STATE_DIR / "stats.json").read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Resetting unreadable browser session stats: {e}")
+        return {}
+
+
+def record_scrape(source, restored, first_card=None):
+    """
+    Count a scrape in the session stats.
+
+    Args:
+        source: Source name
+        restored: The context started from a saved (or kept) session
+        first_card: Seconds until the first listing was parsed, or None if
+            the scrape produced none (counted as a failure)
+    """
+    stats = load_stats()
+    entry = stats.setdefault(source, {}).setdefault(
+        RESTORED if restored else FRESH,
+        {"scrapes": 0, "ok": 0, "first_card_total": 0.0, "first_card_count": 0}
+    )
+    entry["scrapes"] += 1
+    if first_card is not None:
+        entry["ok"] += 1
+        entry["first_card_total"] += first_card
+        entry["first_card_count"] += 1
+    try:
+        _write_json(STATE_DIR / "stats.json", stats)
+    except Exception as e:
+        logger.warning(f"Could not save browser session stats: {e}")
+
+
+def session_report(stats=None):
+    """
+    Summarize session stats.
+
+    Returns:
+        dict: Source -> session kind -> {"scrapes", "success_rate", "first_card_avg"}
+    """
+    stats = load_stats() if stats is None else stats
+    return {
+        source: {
+            kind: {
+                "scrapes": entry["scrapes"],
+                "success_rate": entry["ok"] / entry["scrapes"] if entry["scrapes"] else None,
+                "first_card_avg": (
+                    entry["first_card_total"] / entry["first_card_count"] if entry["first_card_count"] else None
+                ),
+            }
+            for kind, entry in kinds.items()
+        }
+        for source, kinds in stats.items()
+    }
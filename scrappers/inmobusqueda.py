@@ -1,13 +1,17 @@
 import requests
+import http_session
+from circuit_breaker import SourceBlocked, raise_if_blocked
 from bs4 import BeautifulSoup
+import os
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://www.inmobusqueda.com.ar"
+# Overridable to point the scraper at a local stand-in (see fake_sites.py)
+BASE_URL = os.getenv("INMOBUSQUEDA_BASE_URL", "https://www.inmobusqueda.com.ar").rstrip("/")
 # Search in La Plata casco urbano, filtered to listings published in the last 15 days
-SEARCH_BASE = "https://www.inmobusqueda.com.ar/departamento-alquiler-la-plata-casco-urbano"
+SEARCH_BASE = f"{BASE_URL}/departamento-alquiler-la-plata-casco-urbano"
 SEARCH_PARAMS = "?publicado=5"  # publicado=5 = last 15 days
 
 HEADERS = {
@@ -131,9 +135,21 @@ def scrape_inmobusqueda(max_pages=1, delay=2):
     Returns:
         list: List of apartment listing dictionaries
     """
+    return list(iter_inmobusqueda(max_pages=max_pages, delay=delay))
+
+
+def iter_inmobusqueda(max_pages=1, delay=2):
+    """
+    Stream apartment listings from Inmobusqueda as each card is parsed.
+
+    Same arguments as scrape_inmobusqueda.
+
+    Yields:
+        dict: Apartment listing dictionary
+    """
     import time
 
-    listings = []
+    count = 0
 
     for page_num in range(1, max_pages + 1):
         # Page 1 has no suffix, page 2+ has -pagina-N
@@ -146,7 +162,8 @@ def scrape_inmobusqueda(max_pages=1, delay=2):
         logger.debug(f"Scraping Inmobusqueda page {page_num}: {url}")
 
         try:
-            response = requests.get(url, headers=HEADERS, timeout=15)
+            response = http_session.get(url, headers=HEADERS, timeout=15)
+            raise_if_blocked(response)
             response.raise_for_status()
 
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -209,16 +226,19 @@ def scrape_inmobusqueda(max_pages=1, delay=2):
                         "source": "inmobusqueda"
                     }
 
-                    listings.append(listing)
+                    count += 1
+                    yield listing
 
                 except Exception as e:
-                    logger.warning(f"Error parsing Inmobusqueda card: {e}")
+                    logger.warning("Error parsing Inmobusqueda card: %s", e)
                     continue
 
             # Small delay between pages
             if page_num < max_pages:
                 time.sleep(delay)
 
+        except SourceBlocked:
+            raise
         except requests.RequestException as e:
             logger.error(f"Error fetching Inmobusqueda page {page_num}: {e}")
             break
@@ -226,5 +246,4 @@ def scrape_inmobusqueda(max_pages=1, delay=2):
             logger.error(f"Error on Inmobusqueda page {page_num}: {e}")
             break
 
-    logger.info(f"Successfully scraped {len(listings)} listings from Inmobusqueda")
-    return listings
+    logger.info(f"Successfully scraped {count} listings from Inmobusqueda")
@@ -1,13 +1,30 @@
+import os
 import re
+import time
 import logging
 from playwright.sync_api import TimeoutError as PlaywrightTimeout
-from .browser_manager import create_context, run_in_browser_thread
+from circuit_breaker import SourceBlocked
+from .browser_manager import (
+    get_page, release_page, raise_if_page_blocked, stream_in_browser_thread
+)
+from .page_state import dig, record_path, script_json, to_int
+from .tiered_fetch import NeedsBrowser, fetch_html, tiered_scrape
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://inmuebles.mercadolibre.com.ar"
+# Overridable to point the scraper at a local stand-in (see fake_sites.py)
+BASE_URL = os.getenv("MERCADOLIBRE_BASE_URL", "https://inmuebles.mercadolibre.com.ar").rstrip("/")
 # Order by most recent (_OrderId_BEGINS*DESC) to get newest listings first
-SEARCH_BASE = "https://inmuebles.mercadolibre.com.ar/departamentos/alquiler/la-plata_OrderId_BEGINS*DESC"
+SEARCH_BASE = f"{BASE_URL}/departamentos/alquiler/la-plata_OrderId_BEGINS*DESC"
+
+# Structured result data: ID of the JSON <script> holding the page state
+STATE_SCRIPT_ID = "__PRELOADED_STATE__"
+
+
+def page_url(page_num):
+    """URL of a result page (48 results per page)."""
+    offset = (page_num - 1) * 48
+    return SEARCH_BASE if page_num == 1 else f"{SEARCH_BASE}_Desde_{offset + 1}"
 
 
 def parse_price(text):
@@ -57,111 +74,198 @@ def parse_expensas(text):
     return None
 
 
-def _scrape_mercadolibre_sync(max_pages, delay):
+def parse_result(result):
+    """
+    Build a listing from a search result of the embedded page state.
+
+    Returns:
+        dict: Apartment listing, or None without a URL or ARS price
+    """
+    card = result.get("polycard") or result
+    full_url = dig(card, "metadata", "url") or result.get("permalink") or ""
+    if full_url and not full_url.startswith("http"):
+        full_url = "https://" + full_url
+    if not full_url:
+        return None
+
+    # Same ID as the card path (MLA-123), from the URL or the item ID (MLA123)
+    mla_match = re.search(r'(MLA-\d+)', full_url)
+    if mla_match:
+        listing_id = mla_match.group(1)
+    else:
+        item_id = dig(card, "metadata", "id") or result.get("id") or ""
+        listing_id = re.sub(r'^MLA(\d+)$', r'MLA-\1', item_id) or full_url
+
+    components = {component.get("type"): component for component in card.get("components") or []}
+    amount = dig(components, "price", "price", "current_price") or {}
+    if amount.get("currency") not in (None, "ARS"):
+        return None
+    price = to_int(amount.get("value"))
+    if price is None:
+        return None
+
+    attributes = " ".join(dig(components, "attributes_list", "attributes_list", "texts") or [])
+
+    return {
+        "id": f"mercadolibre_{listing_id}",
+        "price": price,
+        "rooms": parse_rooms(attributes),
+        "expensas": parse_expensas(attributes),
+        "address": (dig(components, "location", "location", "text") or "").strip(),
+        "url": full_url,
+        "source": "mercadolibre"
+    }
+
+
+def structured_results(html):
+    """
+    Get a result page's search results from the embedded page state.
+
+    Returns:
+        list: Result dicts (possibly empty), or None if the page has no
+            structured data and the cards must be parsed instead
+    """
+    results = dig(script_json(html, STATE_SCRIPT_ID), "pageState", "initialState", "results")
+    return results if isinstance(results, list) else None
+
+
+def _parse_card(card):
+    """Build a listing from a result card's elements and text (None if unusable)."""
+    link_elem = card.query_selector('a[href*="departamento"]') or card.query_selector('a')
+    if not link_elem:
+        return None
+
+    full_url = link_elem.get_attribute("href")
+    if not full_url or "mercadolibre" not in full_url:
+        return None
+
+    # Extract MLA ID for deduplication (URL contains tracking params that change)
+    mla_match = re.search(r'(MLA-\d+)', full_url)
+    listing_id = mla_match.group(1) if mla_match else full_url
+
+    # Get price - try multiple selectors
+    price_elem = card.query_selector('.andes-money-amount__fraction')
+    if not price_elem:
+        price_elem = card.query_selector('[class*="price"]')
+
+    if not price_elem:
+        return None
+
+    price = parse_price(price_elem.inner_text())
+    if price is None:
+        return None
+
+    # Get rooms from attributes
+    card_text = card.inner_text()
+    rooms = parse_rooms(card_text)
+
+    # Get expensas (usually not in card, but try)
+    expensas = parse_expensas(card_text)
+
+    # Get address/location
+    address = ""
+    location_elem = card.query_selector('.poly-component__location, .ui-search-item__location, [class*="location"]')
+    if location_elem:
+        address = location_elem.inner_text().strip()
+    if not address:
+        # Try to find La Plata or street patterns in card text
+        for line in card_text.split('\n'):
+            line = line.strip()
+            if 'la plata' in line.lower() or re.search(r'\b\d{1,2}\b.*\b\d{1,2}\b', line):
+                address = line
+                break
+
+    return {
+        "id": f"mercadolibre_{listing_id}",
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address,
+        "url": full_url,
+        "source": "mercadolibre"
+    }
+
+
+def _scrape_mercadolibre_sync(max_pages, delay, on_listing=None):
     """
     Internal sync function that runs in the Playwright thread.
+
+    Each result page is read from its embedded page state and only falls
+    back to parsing the cards when there is none.
+
+    If on_listing is given, each listing is passed to it as soon as it is
+    parsed instead of being collected in the returned list.
     """
     listings = []
-    context = None
+    count = 0
+    page = None
+    started = time.monotonic()
+    first_card = None  # Seconds until the first listing (tracked per session kind)
+    blocked = False
 
     try:
-        # Use shared browser instance
-        context = create_context()
-        page = context.new_page()
+        # Reuse this source's warm page in the shared browser
+        page = get_page("mercadolibre")
 
         for page_num in range(1, max_pages + 1):
-            offset = (page_num - 1) * 48
-            url = SEARCH_BASE if page_num == 1 else f"{SEARCH_BASE}_Desde_{offset + 1}"
+            url = page_url(page_num)
             logger.debug(f"Scraping MercadoLibre page {page_num}: {url}")
 
             try:
-                page.goto(url, wait_until="networkidle", timeout=30000)
+                response = page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                raise_if_page_blocked(page, response)  # Don't wait for cards on a challenge page
                 page.wait_for_timeout(delay * 1000)
 
-                # Wait for listings to load - try multiple selectors
-                try:
-                    page.wait_for_selector('li.ui-search-layout__item, .poly-card, .ui-search-result', timeout=10000)
-                except PlaywrightTimeout:
-                    logger.info(f"No MercadoLibre listings found on page {page_num}")
-                    break
-
-                # Get all listing cards - try multiple selectors
-                cards = page.query_selector_all('li.ui-search-layout__item')
-                if not cards:
-                    cards = page.query_selector_all('.poly-card')
-                if not cards:
-                    cards = page.query_selector_all('.ui-search-result')
+                results = structured_results(page.content())
+                if results is not None:
+                    record_path("mercadolibre", "json")
+                    page_listings = [parse_result(result) for result in results]
+                else:
+                    record_path("mercadolibre", "dom")
+                    page.wait_for_load_state("networkidle", timeout=30000)  # Cards are rendered client-side
 
-                if not cards:
+                    # Wait for listings to load - try multiple selectors
+                    try:
+                        page.wait_for_selector('li.ui-search-layout__item, .poly-card, .ui-search-result', timeout=10000)
+                    except PlaywrightTimeout:
+                        raise_if_page_blocked(page)  # Challenge rendered by JavaScript
+                        logger.info(f"No MercadoLibre listings found on page {page_num}")
+                        break
+
+                    # Get all listing cards - try multiple selectors
+                    cards = page.query_selector_all('li.ui-search-layout__item')
+                    if not cards:
+                        cards = page.query_selector_all('.poly-card')
+                    if not cards:
+                        cards = page.query_selector_all('.ui-search-result')
+
+                    page_listings = []
+                    for card in cards:
+                        try:
+                            page_listings.append(_parse_card(card))
+                        except Exception as e:
+                            logger.warning("Error parsing MercadoLibre card: %s", e)
+
+                if not page_listings:
                     logger.info(f"No MercadoLibre listings found on page {page_num}, stopping")
                     break
 
-                logger.debug(f"Found {len(cards)} MercadoLibre listings on page {page_num}")
+                logger.debug(f"Found {len(page_listings)} MercadoLibre listings on page {page_num}")
 
-                for card in cards:
-                    try:
-                        # Get link
-                        link_elem = card.query_selector('a[href*="departamento"]') or card.query_selector('a')
-                        if not link_elem:
-                            continue
-
-                        full_url = link_elem.get_attribute("href")
-                        if not full_url or "mercadolibre" not in full_url:
-                            continue
-
-                        # Extract MLA ID for deduplication (URL contains tracking params that change)
-                        mla_match = re.search(r'(MLA-\d+)', full_url)
-                        listing_id = mla_match.group(1) if mla_match else full_url
-
-                        # Get price - try multiple selectors
-                        price_elem = card.query_selector('.andes-money-amount__fraction')
-                        if not price_elem:
-                            price_elem = card.query_selector('[class*="price"]')
-
-                        if not price_elem:
-                            continue
-
-                        price = parse_price(price_elem.inner_text())
-                        if price is None:
-                            continue
-
-                        # Get rooms from attributes
-                        rooms = None
-                        card_text = card.inner_text()
-                        rooms = parse_rooms(card_text)
-
-                        # Get expensas (usually not in card, but try)
-                        expensas = parse_expensas(card_text)
-
-                        # Get address/location
-                        address = ""
-                        location_elem = card.query_selector('.poly-component__location, .ui-search-item__location, [class*="location"]')
-                        if location_elem:
-                            address = location_elem.inner_text().strip()
-                        if not address:
-                            # Try to find La Plata or street patterns in card text
-                            for line in card_text.split('\n'):
-                                line = line.strip()
-                                if 'la plata' in line.lower() or re.search(r'\b\d{1,2}\b.*\b\d{1,2}\b', line):
-                                    address = line
-                                    break
-
-                        listing = {
-                            "id": f"mercadolibre_{listing_id}",
-                            "price": price,
-                            "rooms": rooms,
-                            "expensas": expensas,
-                            "address": address,
-                            "url": full_url,
-                            "source": "mercadolibre"
-                        }
+                for listing in page_listings:
+                    if listing is None:
+                        continue
 
+                    count += 1
+                    if first_card is None:
+                        first_card = time.monotonic() - started
+                    if on_listing is not None:
+                        on_listing(listing)
+                    else:
                         listings.append(listing)
 
-                    except Exception as e:
-                        logger.warning(f"Error parsing MercadoLibre card: {e}")
-                        continue
-
+            except SourceBlocked:
+                raise
             except PlaywrightTimeout:
                 logger.warning(f"Timeout on MercadoLibre page {page_num}")
                 break
@@ -169,24 +273,56 @@ def _scrape_mercadolibre_sync(max_pages, delay):
                 logger.error(f"Error on MercadoLibre page {page_num}: {e}")
                 break
 
+    except SourceBlocked as e:
+        blocked = True
+        logger.warning(f"MercadoLibre is blocking us: {e}")
+        raise
     except Exception as e:
         logger.error(f"Failed to initialize Playwright for MercadoLibre: {e}")
     finally:
-        # Always close the context (but not the browser - it's shared)
-        if context:
-            try:
-                context.close()
-            except:
-                pass
+        # Always reset the page for the next scrape (context and browser are reused)
+        if page is not None:
+            release_page("mercadolibre", first_card=first_card, blocked=blocked)
 
-    logger.info(f"Successfully scraped {len(listings)} listings from MercadoLibre")
+    logger.info(f"Successfully scraped {count} listings from MercadoLibre")
     return listings
 
 
+def _iter_mercadolibre_http(max_pages, delay):
+    """
+    Stream listings from result pages fetched over HTTP (no browser).
+
+    Raises:
+        NeedsBrowser: If a page has no page state, or page 1 has no results
+    """
+    count = 0
+    for page_num in range(1, max_pages + 1):
+        if page_num > 1:
+            time.sleep(delay)  # be polite
+        url = page_url(page_num)
+        logger.debug(f"Fetching MercadoLibre page {page_num} over HTTP: {url}")
+
+        results = structured_results(fetch_html("mercadolibre", url))
+        if results is None:
+            raise NeedsBrowser(f"no page state on page {page_num}")
+        record_path("mercadolibre", "json")
+        if not results:
+            if page_num == 1:
+                raise NeedsBrowser("no results on page 1")
+            break
+
+        for result in results:
+            listing = parse_result(result)
+            if listing is not None:
+                count += 1
+                yield listing
+
+    logger.info(f"Successfully scraped {count} listings from MercadoLibre over HTTP")
+
+
 def scrape_mercadolibre(max_pages=1, delay=2):
     """
-    Scrape apartment listings from MercadoLibre Inmuebles using Playwright.
-    Runs in a separate thread to avoid asyncio conflicts.
+    Scrape apartment listings from MercadoLibre Inmuebles, over HTTP or with Playwright.
 
     Args:
         max_pages: Maximum number of pages to scrape
@@ -195,4 +331,22 @@ def scrape_mercadolibre(max_pages=1, delay=2):
     Returns:
         list: List of apartment listing dictionaries
     """
-    return run_in_browser_thread(_scrape_mercadolibre_sync, max_pages, delay)
+    return list(iter_mercadolibre(max_pages=max_pages, delay=delay))
+
+
+def iter_mercadolibre(max_pages=1, delay=2):
+    """
+    Stream apartment listings from MercadoLibre as each card is parsed.
+
+    Result pages are fetched over HTTP first; the browser (which runs in a
+    separate thread to avoid asyncio conflicts) is only used when that
+    fails (see tiered_fetch). Same arguments as scrape_mercadolibre.
+
+    Yields:
+        dict: Apartment listing dictionary
+    """
+    return tiered_scrape(
+        "mercadolibre",
+        lambda: _iter_mercadolibre_http(max_pages, delay),
+        lambda: stream_in_browser_thread(_scrape_mercadolibre_sync, max_pages, delay),
+    )
@@ -0,0 +1,131 @@
+"""
+Structured listing data from result pages.
+
+ZonaProp and MercadoLibre render their result lists from JSON: state
+embedded in the page (window.__PRELOADED_STATE__, a JSON <script>) and,
+on ZonaProp, XHR responses from its postings API. Reading that JSON is
+faster and more exact than splitting card text, since price, expensas,
+rooms and address come as separate fields. The scrapers try it first and
+parse the DOM only when no payload is found; PARSE_PATHS counts which
+path each result page took.
+
+orjson is used to decode payloads when installed.
+"""
+
+import json
+import logging
+import re
+from collections import Counter
+
+try:
+    from orjson import loads
+except ImportError:  # Optional speedup
+    from json import loads
+
+logger = logging.getLogger(__name__)
+
+# Result pages parsed per (source, path), path being "json" or "dom"
+PARSE_PATHS = Counter()
+
+_decoder = json.JSONDecoder()
+
+
+def record_path(source, path):
+    """Count a result page parsed from structured data ("json") or cards ("dom")."""
+    PARSE_PATHS[source, path] += 1
+
+
+def assigned_json(html, name):
+    """
+    Decode the object a script assigns to a global, e.g. ``window.__PRELOADED_STATE__ = {...};``.
+
+    Args:
+        html: Page HTML
+        name: Assignment target as written in the page
+
+    Returns:
+        The decoded value, or None if it is missing or not valid JSON
+    """
+    match = re.search(re.escape(name) + r"\s*=\s*", html)
+    if not match:
+        return None
+    try:
+        value, _ = _decoder.raw_decode(html, match.end())
+    except ValueError:
+        logger.debug(f"Could not decode {name}")
+        return None
+    return value
+
+
+def script_json(html, element_id):
+    """
+    Decode a JSON <script> element by ID.
+
+    Returns:
+        The decoded value, or None if it is missing or not valid JSON
+    """
+    match = re.search(
+        r'<script[^>]*\bid=["\']' + re.escape(element_id) + r'["\'][^>]*>(.*?)</script>', html, re.DOTALL
+    )
+    if not match:
+        return None
+    try:
+        return loads(match.group(1))
+    except ValueError:
+        logger.debug(f"Could not decode <script id={element_id}>")
+        return None
+
+
+def dig(value, *keys):
+    """Follow dict keys / list indexes, returning None at the first missing step."""
+    for key in keys:
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return value
+
+
+def to_int(value):
+    """Convert a number or numeric string ("450000", "450.000") to int (None if not numeric)."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not isinstance(value, str):
+        return None
+    digits = re.sub(r"[^\d]", "", value.split(",")[0])  # Drop decimals ("450.000,50")
+    return int(digits) if digits else None
+
+
+class ResponseCapture:
+    """
+    Collects a page's JSON responses whose URL contains a pattern.
+
+    Register with page.on("response", capture) before navigating and read
+    the payloads with take() after the page loaded. Bodies are only read in
+    take(), outside Playwright's event dispatch.
+
+    Args:
+        pattern: Substring of the API URLs to capture
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.responses = []
+
+    def __call__(self, response):
+        if self.pattern in response.url:
+            self.responses.append(response)
+
+    def take(self):
+        """Decode and clear the captured responses (unreadable ones are skipped)."""
+        payloads = []
+        for response in self.responses:
+            try:
+                if response.ok:
+                    payloads.append(loads(response.body()))
+            except Exception as e:
+                logger.debug(f"Skipping captured response {response.url}: {e}")
+        self.responses = []
+        return payloads
@@ -0,0 +1,171 @@
+"""
+HTTP-first fetching for the browser sources.
+
+ZonaProp and MercadoLibre always ran in Chromium, even when a plain HTTP
+request would get the server-rendered results, page state included. Their
+scrapes now go through tiered_scrape:
+
+1. http: result pages are fetched with the pooled HTTP client
+   (http_session) using browser-like headers and the cookies of the
+   source's saved browser session, and read from their embedded JSON.
+2. browser: the Playwright scraper, used when the HTTP tier gets a
+   challenge, an error or a page without listings, before anything was
+   yielded.
+
+The tier that last worked is remembered per source in fetch_tiers.json.
+A source that needed the browser starts there next time and HTTP is only
+tried again after HTTP_RETRY_INTERVAL. When HTTP works the browser is
+never launched.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+import http_session
+from circuit_breaker import SourceBlocked, raise_if_blocked
+from .browser_state import load_state
+
+logger = logging.getLogger(__name__)
+
+TIER_FILE = Path(os.getenv("FETCH_TIER_FILE", "fetch_tiers.json"))
+HTTP_RETRY_INTERVAL = 6 * 60 * 60  # Seconds before a browser-only source tries HTTP again
+
+HTTP = "http"
+BROWSER = "browser"
+
+# Same user agent as the browser contexts, so saved session cookies stay valid
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
+    "Accept-Language": "es-AR,es;q=0.9,en;q=0.8",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+
+class NeedsBrowser(Exception):
+    """Raised by an HTTP tier scraper when the page can't be used without a browser."""
+
+
+def load_tiers():
+    """
+    Load the tier each source last succeeded with.
+
+    Returns:
+        dict: Source -> {"tier": "http" or "browser", "http_tried_at": timestamp}
+    """
+    try:
+        data = json.loads(TIER_FILE.read_text(encoding='utf-8'))
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Resetting unreadable {TIER_FILE}: {e}")
+        return {}
+
+
+def save_tiers(tiers):
+    """Save per-source tiers to disk using atomic write."""
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode='w', encoding='utf-8', dir=TIER_FILE.parent, delete=False, suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(tiers, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        temp_path.replace(TIER_FILE)
+    except Exception as e:
+        logger.warning(f"Could not save {TIER_FILE}: {e}")
+
+
+def session_cookies(source, url):
+    """Get the cookies of a source's saved browser session that apply to a URL."""
+    state = load_state(source)
+    if state is None:
+        return {}
+    host = urlsplit(url).hostname or ""
+    return {
+        cookie["name"]: cookie["value"]
+        for cookie in state["cookies"]
+        if host == cookie.get("domain", "").lstrip(".") or host.endswith("." + cookie.get("domain", "").lstrip("."))
+    }
+
+
+def fetch_html(source, url):
+    """
+    Fetch a result page over HTTP like a browser would.
+
+    Raises:
+        SourceBlocked: If the response is a block or challenge page
+        requests.RequestException: On network errors and HTTP error statuses
+
+    Returns:
+        str: Page HTML
+    """
+    response = http_session.get(url, headers=HEADERS, cookies=session_cookies(source, url), timeout=15)
+    raise_if_blocked(response)
+    response.raise_for_status()
+    return response.text
+
+
+def tiered_scrape(source, http_scrape, browser_scrape, now=None):
+    """
+    Stream a source's listings from the cheapest tier that works.
+
+    Args:
+        source: Source name
+        http_scrape: Zero-argument callable returning the HTTP tier's
+            listing iterator; raises NeedsBrowser (or SourceBlocked or a
+            requests error) when its pages can't be used
+        browser_scrape: Zero-argument callable returning the browser
+            tier's listing iterator
+        now: Current time (defaults to now)
+
+    Yields:
+        dict: Apartment listing dictionary
+    """
+    now = time.time() if now is None else now
+    tiers = load_tiers()
+    entry = dict(tiers.get(source) or {})
+
+    def remember(tier):
+        entry["tier"] = tier
+        if entry != tiers.get(source):
+            tiers[source] = entry
+            save_tiers(tiers)
+
+    if entry.get("tier") != BROWSER or now - entry.get("http_tried_at", 0) >= HTTP_RETRY_INTERVAL:
+        entry["http_tried_at"] = now
+        count = 0
+        try:
+            for ap in http_scrape():
+                count += 1
+                yield ap
+        except (NeedsBrowser, SourceBlocked, requests.RequestException) as e:
+            if count:  # Later pages failed: keep what was yielded rather than repeat it
+                logger.warning(f"{source}: HTTP fetch stopped after {count} listings: {e}")
+            else:
+                logger.info(f"{source}: HTTP fetch unusable ({e}), using the browser")
+        finally:
+            if count:
+                remember(HTTP)
+        if count:
+            return
+    else:
+        logger.debug(f"{source}: using the browser (last HTTP fetch failed)")
+
+    count = 0
+    try:
+        for ap in browser_scrape():
+            count += 1
+            yield ap
+    finally:
+        if count:
+            remember(BROWSER)
@@ -1,13 +1,30 @@
+import os
 import re
+import time
 import logging
 from playwright.sync_api import TimeoutError as PlaywrightTimeout
-from .browser_manager import create_context, run_in_browser_thread
+from circuit_breaker import SourceBlocked
+from .browser_manager import (
+    get_page, release_page, raise_if_page_blocked, stream_in_browser_thread
+)
+from .page_state import ResponseCapture, assigned_json, dig, record_path, to_int
+from .tiered_fetch import NeedsBrowser, fetch_html, tiered_scrape
 
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://www.zonaprop.com.ar"
+# Overridable to point the scraper at a local stand-in (see fake_sites.py)
+BASE_URL = os.getenv("ZONAPROP_BASE_URL", "https://www.zonaprop.com.ar").rstrip("/")
 # Order by most recent (orden-publicado-descendente) to get newest listings first
-SEARCH_BASE = "https://www.zonaprop.com.ar/departamentos-alquiler-la-plata-orden-publicado-descendente"
+SEARCH_BASE = f"{BASE_URL}/departamentos-alquiler-la-plata-orden-publicado-descendente"
+
+# Structured result data: the page state global and the postings API
+STATE_GLOBAL = "window.__PRELOADED_STATE__"
+API_PATH = "/rplis-api/postings"
+
+
+def page_url(page_num):
+    """URL of a result page."""
+    return f"{SEARCH_BASE}.html" if page_num == 1 else f"{SEARCH_BASE}-pagina-{page_num}.html"
 
 
 def parse_price(text):
@@ -91,78 +108,191 @@ def parse_listing_from_text(card_text, url):
     return price, expensas, rooms, address
 
 
-def _scrape_zonaprop_sync(max_pages, delay):
+def parse_posting(posting):
+    """
+    Build a listing from a posting of the page state or the postings API.
+
+    Returns:
+        dict: Apartment listing, or None without an ARS price
+    """
+    href = posting.get("url") or ""
+    full_url = BASE_URL + href if href.startswith("/") else href
+    listing_id = posting.get("postingId")
+    if not listing_id:
+        id_match = re.search(r'-(\d+)\.html', full_url)
+        listing_id = id_match.group(1) if id_match else full_url
+
+    price = None
+    for operation in posting.get("priceOperationTypes") or []:
+        for amount in operation.get("prices") or []:
+            if amount.get("currency") not in ("USD", "U$S"):
+                price = to_int(amount.get("amount"))
+                break
+        if price is not None:
+            break
+    if price is None:
+        return None
+
+    expenses = posting.get("expenses") or {}
+    expensas = to_int(expenses.get("amount")) if expenses.get("currency") not in ("USD", "U$S") else None
+
+    rooms = None
+    bedrooms = None
+    for feature in (posting.get("mainFeatures") or {}).values():
+        label = str(feature.get("label", "")).lower()
+        if label.startswith("amb"):
+            rooms = to_int(feature.get("value"))
+        elif label.startswith("dorm"):
+            bedrooms = to_int(feature.get("value"))
+    if rooms is None and bedrooms is not None:
+        rooms = bedrooms + 1  # Dormitorios + living, as in parse_rooms
+
+    location = posting.get("postingLocation") or {}
+    address = ", ".join(
+        part for part in (dig(location, "address", "name"), dig(location, "location", "name")) if part
+    )
+
+    return {
+        "id": f"zonaprop_{listing_id}",
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address,
+        "url": full_url,
+        "source": "zonaprop"
+    }
+
+
+def structured_postings(html, payloads=()):
+    """
+    Get a result page's postings from API responses or the embedded page state.
+
+    Args:
+        html: Page HTML
+        payloads: Decoded responses captured from the postings API
+
+    Returns:
+        list: Posting dicts (possibly empty), or None if the page has no
+            structured data and the cards must be parsed instead
+    """
+    for payload in payloads:
+        postings = dig(payload, "listPostings")
+        if isinstance(postings, list):
+            return postings
+    postings = dig(assigned_json(html, STATE_GLOBAL), "listStore", "listPostings")
+    return postings if isinstance(postings, list) else None
+
+
+def _parse_card(card):
+    """Build a listing from a result card's link and text (None if unusable)."""
+    link_elem = card.query_selector('a[href*="/propiedades/"]') or card.query_selector('a')
+    if not link_elem:
+        return None
+
+    href = link_elem.get_attribute("href")
+    if not href:
+        return None
+
+    full_url = BASE_URL + href if href.startswith("/") else href
+
+    # Extract ID from URL (e.g., "58127503" from "...58127503.html")
+    id_match = re.search(r'-(\d+)\.html', full_url)
+    listing_id = id_match.group(1) if id_match else full_url
+
+    # Parse from card text
+    card_text = card.inner_text()
+    price, expensas, rooms, address = parse_listing_from_text(card_text, full_url)
+
+    if price is None:
+        return None
+
+    return {
+        "id": f"zonaprop_{listing_id}",
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address or "",
+        "url": full_url,
+        "source": "zonaprop"
+    }
+
+
+def _scrape_zonaprop_sync(max_pages, delay, on_listing=None):
     """
     Internal sync function that runs in the Playwright thread.
+
+    Each result page is read from its structured data (postings API
+    responses or the embedded page state) and only falls back to parsing
+    the cards when there is none.
+
+    If on_listing is given, each listing is passed to it as soon as it is
+    parsed instead of being collected in the returned list.
     """
     listings = []
-    context = None
+    count = 0
+    page = None
+    started = time.monotonic()
+    first_card = None  # Seconds until the first listing (tracked per session kind)
+    blocked = False
+    capture = ResponseCapture(API_PATH)
 
     try:
-        # Use shared browser instance
-        context = create_context()
-        page = context.new_page()
+        # Reuse this source's warm page in the shared browser
+        page = get_page("zonaprop")
+        page.on("response", capture)
 
         for page_num in range(1, max_pages + 1):
-            url = f"{SEARCH_BASE}.html" if page_num == 1 else f"{SEARCH_BASE}-pagina-{page_num}.html"
+            url = page_url(page_num)
             logger.debug(f"Scraping ZonaProp page {page_num}: {url}")
 
             try:
-                page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                response = page.goto(url, wait_until="domcontentloaded", timeout=30000)
+                raise_if_page_blocked(page, response)  # Don't wait for cards on a challenge page
                 page.wait_for_timeout(delay * 1000)
 
-                # Wait for listings to load
-                page.wait_for_selector('div[data-posting-type]', timeout=15000)
+                postings = structured_postings(page.content(), capture.take())
+                if postings is not None:
+                    record_path("zonaprop", "json")
+                    page_listings = [parse_posting(posting) for posting in postings]
+                else:
+                    record_path("zonaprop", "dom")
 
-                # Get all listing cards
-                cards = page.query_selector_all('div[data-posting-type]')
-
-                if not cards:
+                    # Wait for listings to load
+                    try:
+                        page.wait_for_selector('div[data-posting-type]', timeout=15000)
+                    except PlaywrightTimeout:
+                        raise_if_page_blocked(page)  # Challenge rendered by JavaScript
+                        raise
+
+                    # Get all listing cards
+                    cards = page.query_selector_all('div[data-posting-type]')
+                    page_listings = []
+                    for card in cards:
+                        try:
+                            page_listings.append(_parse_card(card))
+                        except Exception as e:
+                            logger.warning("Error parsing ZonaProp card: %s", e)
+
+                if not page_listings:
                     logger.info(f"No ZonaProp listings found on page {page_num}, stopping")
                     break
 
-                logger.debug(f"Found {len(cards)} ZonaProp listings on page {page_num}")
+                logger.debug(f"Found {len(page_listings)} ZonaProp listings on page {page_num}")
 
-                for card in cards:
-                    try:
-                        # Get link
-                        link_elem = card.query_selector('a[href*="/propiedades/"]') or card.query_selector('a')
-                        if not link_elem:
-                            continue
-
-                        href = link_elem.get_attribute("href")
-                        if not href:
-                            continue
-
-                        full_url = BASE_URL + href if href.startswith("/") else href
-
-                        # Extract ID from URL (e.g., "58127503" from "...58127503.html")
-                        id_match = re.search(r'-(\d+)\.html', full_url)
-                        listing_id = id_match.group(1) if id_match else full_url
-
-                        # Parse from card text
-                        card_text = card.inner_text()
-                        price, expensas, rooms, address = parse_listing_from_text(card_text, full_url)
-
-                        if price is None:
-                            continue
-
-                        listing = {
-                            "id": f"zonaprop_{listing_id}",
-                            "price": price,
-                            "rooms": rooms,
-                            "expensas": expensas,
-                            "address": address or "",
-                            "url": full_url,
-                            "source": "zonaprop"
-                        }
+                for listing in page_listings:
+                    if listing is None:
+                        continue
 
+                    count += 1
+                    if first_card is None:
+                        first_card = time.monotonic() - started
+                    if on_listing is not None:
+                        on_listing(listing)
+                    else:
                         listings.append(listing)
 
-                    except Exception as e:
-                        logger.warning(f"Error parsing ZonaProp card: {e}")
-                        continue
-
+            except SourceBlocked:
+                raise
             except PlaywrightTimeout:
                 logger.warning(f"Timeout on ZonaProp page {page_num}")
                 break
@@ -170,24 +300,57 @@ def _scrape_zonaprop_sync(max_pages, delay):
                 logger.error(f"Error on ZonaProp page {page_num}: {e}")
                 break
 
+    except SourceBlocked as e:
+        blocked = True
+        logger.warning(f"ZonaProp is blocking us: {e}")
+        raise
     except Exception as e:
         logger.error(f"Failed to initialize Playwright for ZonaProp: {e}")
     finally:
-        # Always close the context (but not the browser - it's shared)
-        if context:
-            try:
-                context.close()
-            except:
-                pass
+        # Always reset the page for the next scrape (context and browser are reused)
+        if page is not None:
+            page.remove_listener("response", capture)
+            release_page("zonaprop", first_card=first_card, blocked=blocked)
 
-    logger.info(f"Successfully scraped {len(listings)} listings from ZonaProp")
+    logger.info(f"Successfully scraped {count} listings from ZonaProp")
     return listings
 
 
+def _iter_zonaprop_http(max_pages, delay):
+    """
+    Stream listings from result pages fetched over HTTP (no browser).
+
+    Raises:
+        NeedsBrowser: If a page has no page state, or page 1 has no postings
+    """
+    count = 0
+    for page_num in range(1, max_pages + 1):
+        if page_num > 1:
+            time.sleep(delay)  # be polite
+        url = page_url(page_num)
+        logger.debug(f"Fetching ZonaProp page {page_num} over HTTP: {url}")
+
+        postings = structured_postings(fetch_html("zonaprop", url))
+        if postings is None:
+            raise NeedsBrowser(f"no page state on page {page_num}")
+        record_path("zonaprop", "json")
+        if not postings:
+            if page_num == 1:
+                raise NeedsBrowser("no postings on page 1")
+            break
+
+        for posting in postings:
+            listing = parse_posting(posting)
+            if listing is not None:
+                count += 1
+                yield listing
+
+    logger.info(f"Successfully scraped {count} listings from ZonaProp over HTTP")
+
+
 def scrape_zonaprop(max_pages=1, delay=3):
     """
-    Scrape apartment listings from ZonaProp using Playwright.
-    Runs in a separate thread to avoid asyncio conflicts.
+    Scrape apartment listings from ZonaProp, over HTTP or with Playwright.
 
     Args:
         max_pages: Maximum number of pages to scrape
@@ -196,4 +359,22 @@ def scrape_zonaprop(max_pages=1, delay=3):
     Returns:
         list: List of apartment listing dictionaries
     """
-    return run_in_browser_thread(_scrape_zonaprop_sync, max_pages, delay)
+    return list(iter_zonaprop(max_pages=max_pages, delay=delay))
+
+
+def iter_zonaprop(max_pages=1, delay=3):
+    """
+    Stream apartment listings from ZonaProp as each card is parsed.
+
+    Result pages are fetched over HTTP first; the browser (which runs in a
+    separate thread to avoid asyncio conflicts) is only used when that
+    fails (see tiered_fetch). Same arguments as scrape_zonaprop.
+
+    Yields:
+        dict: Apartment listing dictionary
+    """
+    return tiered_scrape(
+        "zonaprop",
+        lambda: _iter_zonaprop_http(max_pages, delay),
+        lambda: stream_in_browser_thread(_scrape_zonaprop_sync, max_pages, delay),
+    )
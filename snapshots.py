@@ -0,0 +1,158 @@
+"""
+Per-listing snapshot history.
+
+sent.json only remembers IDs, so a price drop or a removed listing goes
+unnoticed. The snapshot store keeps the last known price, expensas and
+rooms of every scraped listing with its first/last seen time. It is read
+once per cycle, updated in memory as listings stream by and written once at
+the end, producing events:
+
+- "new": first time the listing is seen
+- "changed": price, expensas or rooms differ from the last snapshot
+- "gone": not seen for GONE_AFTER_DAYS while its source was being polled
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = Path("snapshots.json")
+MAX_SNAPSHOTS = 2000     # Most recently seen listings kept
+GONE_AFTER_DAYS = 7      # Unseen for this long while the source is polled -> gone
+
+TRACKED_FIELDS = ("price", "expensas", "rooms")
+
+
+def make_event(kind, listing, previous=None):
+    """
+    Build a change event.
+
+    Args:
+        kind: "new", "changed" or "gone"
+        listing: Current listing (or last snapshot for "gone")
+        previous: Snapshot before the change (for "changed" and "gone")
+    """
+    return {"type": kind, "listing": listing, "previous": previous}
+
+
+def is_price_drop(event):
+    """Check if an event is a price decrease of a known listing."""
+    if event["type"] != "changed":
+        return False
+    old_price = event["previous"].get("price")
+    new_price = event["listing"].get("price")
+    return old_price is not None and new_price is not None and new_price < old_price
+
+
+class SnapshotStore:
+    """In-memory snapshot table, keyed by listing ID."""
+
+    def __init__(self, snapshots=None):
+        self.snapshots = snapshots if snapshots is not None else {}
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def update(self, ap, now=None):
+        """
+        Record a scraped listing and compare it with its last snapshot.
+
+        Returns:
+            dict: "new" or "changed" event, or None if nothing changed
+        """
+        now = time.time() if now is None else now
+        previous = self.snapshots.get(ap["id"])
+        current = {field: ap.get(field) for field in TRACKED_FIELDS}
+
+        if previous is None:
+            self.snapshots[ap["id"]] = dict(
+                current, source=ap.get("source", "unknown"), first_seen=now, last_seen=now
+            )
+            return make_event("new", ap)
+
+        changed = any(previous.get(field) != current[field] for field in TRACKED_FIELDS)
+        snapshot = dict(previous, last_seen=now)
+        if changed:
+            snapshot.update(current)
+        self.snapshots[ap["id"]] = snapshot
+        return make_event("changed", ap, previous) if changed else None
+
+    def gone(self, sources, now=None):
+        """
+        Remove listings not seen for GONE_AFTER_DAYS from the given sources.
+
+        Args:
+            sources: Names of the sources polled this cycle
+
+        Returns:
+            list: "gone" events with the last snapshot of each listing
+        """
+        now = time.time() if now is None else now
+        cutoff = now - GONE_AFTER_DAYS * 86400
+        sources = set(sources)
+
+        events = []
+        for listing_id, snapshot in list(self.snapshots.items()):
+            if snapshot.get("source") in sources and snapshot["last_seen"] < cutoff:
+                del self.snapshots[listing_id]
+                events.append(make_event("gone", dict(snapshot, id=listing_id), snapshot))
+        return events
+
+    def trimmed(self):
+        """Get the MAX_SNAPSHOTS most recently seen snapshots."""
+        if len(self.snapshots) <= MAX_SNAPSHOTS:
+            return self.snapshots
+        newest = sorted(self.snapshots.items(), key=lambda item: item[1]["last_seen"])
+        return dict(newest[-MAX_SNAPSHOTS:])
+
+    def trim(self):
+        """Keep only the MAX_SNAPSHOTS most recently seen snapshots, in place."""
+        self.snapshots = self.trimmed()
+
+
+def load_snapshots():
+    """
+    Load the snapshot store.
+
+    Returns:
+        SnapshotStore: Store with every known snapshot (empty on error)
+    """
+    try:
+        if SNAPSHOT_FILE.exists():
+            data = json.loads(SNAPSHOT_FILE.read_text(encoding='utf-8'))
+            if isinstance(data, dict):
+                return SnapshotStore(data)
+            logger.warning("snapshots.json contains invalid data, resetting")
+        return SnapshotStore()
+    except Exception as e:
+        logger.error(f"Failed to load snapshots.json: {e}. Resetting snapshots.")
+        return SnapshotStore()
+
+
+def save_snapshots(store):
+    """Trim the snapshot store and save it to disk using atomic write."""
+    try:
+        store.trim()
+        snapshots = store.snapshots
+        with tempfile.NamedTemporaryFile(
+            mode='w',
+            encoding='utf-8',
+            dir=SNAPSHOT_FILE.parent,
+            delete=False,
+            suffix='.tmp'
+        ) as f:
+            temp_path = Path(f.name)
+            json.dump(snapshots, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+
+        temp_path.replace(SNAPSHOT_FILE)
+        logger.debug(f"Saved {len(snapshots)} listing snapshots")
+
+    except Exception as e:
+        logger.error(f"Failed to save snapshots.json: {e}", exc_info=True)
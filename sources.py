@@ -0,0 +1,182 @@
+"""
+Lazy-loading registry of listing sources.
+
+Each source is declared once as a SourceSpec with its capabilities. Scraper
+modules (and their heavy dependencies: requests, bs4/lxml, Playwright) are
+only imported when a source actually runs, so an hourly process that skips
+a source never pays for its imports.
+"""
+
+import importlib
+import logging
+import os
+import re
+import sys
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+BROWSER_MANAGER_MODULE = "scrappers.browser_manager"
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """
+    Declaration of a listing source.
+
+    Attributes:
+        name: Source name, also used as the listing ID prefix and "source" field
+        label: Human-readable name for logs
+        module: Scraper module, imported on first use
+        func: Name of the streaming (generator) function in that module
+        needs_browser: Whether the scraper may run in the shared Playwright browser
+        blocked_on_railway: Whether Cloudflare blocks this source from Railway IPs
+        default_pages: Number of result pages to scrape by default
+        id_pattern: Regex whose first group is the site's listing ID in a URL
+    """
+    name: str
+    label: str
+    module: str
+    func: str
+    needs_browser: bool = False
+    blocked_on_railway: bool = False
+    default_pages: int = 1
+    id_pattern: str = ""
+
+    def load(self):
+        """Import the scraper module and return its streaming function."""
+        module = importlib.import_module(self.module)
+        return getattr(module, self.func)
+
+    def scrape(self, max_pages=None, **kwargs):
+        """
+        Stream listings from this source.
+
+        Args:
+            max_pages: Pages to scrape (defaults to default_pages)
+            **kwargs: Extra arguments for the scraper (e.g. delay)
+
+        Returns:
+            iterator: Apartment listing dictionaries
+        """
+        return self.load()(max_pages=max_pages or self.default_pages, **kwargs)
+
+    def extract_id(self, url):
+        """Build the listing ID the scraper would assign to a listing URL."""
+        match = re.search(self.id_pattern, url) if self.id_pattern else None
+        return f"{self.name}_{match.group(1) if match else url}"
+
+    def is_blocked_here(self):
+        """Check if this source is blocked in the current environment."""
+        return self.blocked_on_railway and bool(os.getenv("RAILWAY_ENVIRONMENT"))
+
+
+SOURCES = {}
+
+
+def register_source(spec):
+    """Add a source to the registry (replacing any source with the same name)."""
+    SOURCES[spec.name] = spec
+    return spec
+
+
+register_source(SourceSpec(
+    name="argenprop",
+    label="ArgenProp",
+    module="scrappers.argenprop",
+    func="iter_argenprop",
+    id_pattern=r'--(\d+)$',
+))
+register_source(SourceSpec(
+    name="zonaprop",
+    label="ZonaProp",
+    module="scrappers.zonaprop",
+    func="iter_zonaprop",
+    needs_browser=True,
+    blocked_on_railway=True,
+    id_pattern=r'-(\d+)\.html',
+))
+register_source(SourceSpec(
+    name="mercadolibre",
+    label="MercadoLibre",
+    module="scrappers.mercadolibre",
+    func="iter_mercadolibre",
+    needs_browser=True,
+    blocked_on_railway=True,
+    id_pattern=r'(MLA-\d+)',
+))
+register_source(SourceSpec(
+    name="inmobusqueda",
+    label="Inmobusqueda",
+    module="scrappers.inmobusqueda",
+    func="iter_inmobusqueda",
+    id_pattern=r'id=(\d+)',
+))
+
+
+def get_source(name):
+    """Get a registered source by name."""
+    return SOURCES[name]
+
+
+def enabled_sources(names=None):
+    """
+    Get the sources that can run in this environment, in registry order.
+
+    Args:
+        names: Optional list of source names to restrict to
+
+    Returns:
+        list: SourceSpec objects, skipping sources blocked here
+    """
+    specs = []
+    for spec in SOURCES.values():
+        if names is not None and spec.name not in names:
+            continue
+        if spec.is_blocked_here():
+            logger.info(f"Skipping {spec.label} (Railway environment)")
+            continue
+        specs.append(spec)
+    return specs
+
+
+def load_scraper(name):
+    """
+    Import a source's scraper module and return its streaming function.
+
+    Args:
+        name: Source name (key of SOURCES)
+
+    Returns:
+        callable: Generator function yielding listing dictionaries
+    """
+    return SOURCES[name].load()
+
+
+def lazy_scraper(name, **kwargs):
+    """
+    Return a zero-argument factory that imports and runs a source on call.
+
+    Args:
+        name: Source name (key of SOURCES)
+        **kwargs: Arguments passed to the scraper (e.g. max_pages)
+    """
+    def factory():
+        return load_scraper(name)(**kwargs)
+    return factory
+
+
+def is_blocked_here(name):
+    """Check if a source is blocked in this environment (Cloudflare blocks Railway IPs)."""
+    return SOURCES[name].is_blocked_here()
+
+
+def close_browser_if_loaded():
+    """
+    Close the shared Playwright browser, but only if a browser source ran.
+
+    Avoids importing Playwright just to find out there is nothing to close.
+    """
+    browser_manager = sys.modules.get(BROWSER_MANAGER_MODULE)
+    if browser_manager is not None:
+        browser_manager.close_browser()
@@ -47,6 +47,9 @@ def save_sent(sent):
 
     Args:
         sent: Set of listing IDs to save
+
+    Returns:
+        set: The listing IDs actually stored (after trimming)
     """
     try:
         # Limit to most recent IDs (keep last MAX_SENT_IDS)
@@ -74,6 +77,7 @@ def save_sent(sent):
         # Atomic rename
         temp_path.replace(DB_FILE)
         logger.debug(f"Saved {len(sent)} sent listings to {DB_FILE}")
+        return set(sent_list)
 
     except Exception as e:
         logger.error(f"Failed to save sent.json: {e}", exc_info=True)
@@ -130,3 +134,58 @@ def save_queue(queue):
     except Exception as e:
         logger.error(f"Failed to save queue.json: {e}", exc_info=True)
         raise
+
+
+def file_stamp(path):
+    """
+    Identify the current version of a file on disk.
+
+    Returns:
+        tuple: (mtime_ns, size), or None if the file does not exist
+    """
+    try:
+        stat = Path(path).stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+class WarmCache:
+    """
+    Keeps loaded data in memory between cycles of a long-running process.
+
+    A value is reloaded only when its file changed on disk since it was
+    loaded or saved, so a resident worker does not re-parse sent.json,
+    user_configs.json etc. on every cycle.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, path, loader):
+        """
+        Get the cached value for a file, calling loader() if it changed.
+
+        Args:
+            path: File the value is loaded from
+            loader: Zero-argument callable that loads the value
+        """
+        stamp = file_stamp(path)
+        entry = self._entries.get(str(path))
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, loader())
+            self._entries[str(path)] = entry
+        return entry[1]
+
+    def mark_saved(self, path, value):
+        """
+        Record that value was just written to path.
+
+        ``value`` must be what was written (trimmed by its save function),
+        so a resident process does not keep more in memory than on disk.
+        """
+        self._entries[str(path)] = (file_stamp(path), value)
+
+    def clear(self):
+        """Drop all cached values (e.g. after a failed cycle)."""
+        self._entries.clear()
@@ -0,0 +1,255 @@
+"""Tests for the columnar listing archive and the analysis on top of it."""
+
+import shutil
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import archive
+from analyze_listings import (
+    column_stats, match_mask, parse_range, recommend, rejection_masks, rooms_distribution, sweep, weeks_covered
+)
+from archive import (
+    ListingArchive, columns_from_listings, compact_archive, iter_chunks, latest_only, load_columns, save_archive
+)
+from filters import matches
+from load_test import generate_listings
+from pipeline import iter_archived
+
+
+def make_listing(listing_id, price=450000, source="argenprop", expensas=70000, rooms=2):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": "Calle 7 entre 45 y 46",
+        "url": f"https://example.com/{listing_id}",
+        "source": source
+    }
+
+
+class TestListingArchive:
+    """Tests for writing and reading chunks."""
+
+    def test_roundtrip(self, tmp_path):
+        """Listings come back as columns, missing values as NaN."""
+        store = ListingArchive(tmp_path)
+        store.add(make_listing("a", price=400000), scraped_at=10)
+        store.add(make_listing("b", expensas=None), scraped_at=11)
+
+        chunks = store.flush(day=date(2026, 10, 1))
+        assert len(chunks) == 1 and len(store) == 0
+
+        data = load_columns(("id", "price", "expensas"), root=tmp_path)
+        assert data["id"].tolist() == ["a", "b"]
+        assert data["price"].tolist() == [400000, 450000]
+        assert np.isnan(data["expensas"][1])
+
+    def test_partitioned_by_day_and_source(self, tmp_path):
+        store = ListingArchive(tmp_path)
+        store.add(make_listing("a", source="argenprop"))
+        store.add(make_listing("b", source="zonaprop"))
+        store.flush(day=date(2026, 10, 1))
+        store.add(make_listing("c", source="zonaprop"))
+        store.flush(day=date(2026, 10, 5))
+
+        assert len(list(iter_chunks(tmp_path))) == 3
+        assert (tmp_path / "2026-10-01" / "zonaprop").is_dir()
+
+        recent = load_columns(("id",), root=tmp_path, days=3, today=date(2026, 10, 6))
+        assert recent["id"].tolist() == ["c"]
+        zonaprop = load_columns(("id",), root=tmp_path, sources=["zonaprop"])
+        assert zonaprop["id"].tolist() == ["b", "c"]
+
+    def test_columns_are_memory_mapped(self, tmp_path):
+        store = ListingArchive(tmp_path)
+        store.add(make_listing("a"))
+        chunk, = store.flush()
+        assert isinstance(np.load(chunk / "price.npy", mmap_mode="r"), np.memmap)
+
+    def test_empty_archive(self, tmp_path):
+        data = load_columns(root=tmp_path / "missing")
+        assert all(len(values) == 0 for values in data.values())
+
+    def test_latest_only(self, tmp_path):
+        """Each listing keeps its most recent observation."""
+        store = ListingArchive(tmp_path)
+        store.add(make_listing("a", price=500000), scraped_at=1)
+        store.add(make_listing("b"), scraped_at=1)
+        store.add(make_listing("a", price=450000), scraped_at=2)
+        store.flush()
+
+        data = latest_only(load_columns(("id", "scraped_at", "price"), root=tmp_path))
+        assert sorted(zip(data["id"].tolist(), data["price"].tolist())) == [("a", 450000), ("b", 450000)]
+
+    def test_save_archive_logs_errors(self, tmp_path):
+        """A failing write doesn't break the cycle."""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        store = ListingArchive(blocker)
+        store.add(make_listing("a"))
+        save_archive(store)  # Must not raise
+
+    def test_stage_passes_listings_through(self, tmp_path):
+        store = ListingArchive(tmp_path)
+        listings = [make_listing("a"), make_listing("b", source="zonaprop")]
+        assert list(iter_archived(listings, store)) == listings
+        assert len(store) == 2
+
+
+class TestCompaction:
+    """Tests for merging finished days and expiring old ones."""
+
+    def fill(self, root, days, cycles=3):
+        """Archive ``cycles`` flushes of two sources on each day; returns the expected ids."""
+        store = ListingArchive(root)
+        ids = []
+        for day in days:
+            for cycle in range(cycles):
+                for source in ("argenprop", "zonaprop"):
+                    listing_id = f"{day.isoformat()}-{source}-{cycle}"
+                    store.add(make_listing(listing_id, source=source), scraped_at=cycle)
+                    ids.append(listing_id)
+                store.flush(day=day)
+        return ids
+
+    def test_multi_day_archive_loads_from_compacted_chunks(self, tmp_path):
+        days = [date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 3)]
+        ids = self.fill(tmp_path, days)
+        before = load_columns(("id", "price"), root=tmp_path)
+
+        stats = compact_archive(tmp_path, today=date(2026, 10, 3), retention_days=0)
+
+        assert stats == {"compacted": 4, "expired": 0}
+        chunks = list(iter_chunks(tmp_path))
+        assert [chunk.name for chunk in chunks[:4]] == ["day"] * 4
+        assert len(chunks) == 4 + 6  # Today's chunks are still being written
+        after = load_columns(("id", "price"), root=tmp_path)
+        assert sorted(after["id"].tolist()) == sorted(ids)
+        assert sorted(after["id"].tolist()) == sorted(before["id"].tolist())
+        assert (tmp_path / "2026-10-01" / "argenprop" / "day" / "scraped_at.npy").exists()
+
+    def test_compaction_runs_once_per_day(self, tmp_path):
+        self.fill(tmp_path, [date(2026, 10, 1)])
+        compact_archive(tmp_path, today=date(2026, 10, 2), retention_days=0)
+        assert compact_archive(tmp_path, today=date(2026, 10, 2), retention_days=0) == {"compacted": 0, "expired": 0}
+
+    def test_leftovers_of_interrupted_compaction_are_ignored(self, tmp_path):
+        """Chunks left next to a compacted one are not read twice, and are removed next time."""
+        self.fill(tmp_path, [date(2026, 10, 1)], cycles=2)
+        partition = tmp_path / "2026-10-01" / "zonaprop"
+        original = sorted(partition.iterdir())[0]
+        shutil.copytree(original, tmp_path / "copy")
+        compact_archive(tmp_path, today=date(2026, 10, 2), retention_days=0)
+        (tmp_path / "copy").rename(original)  # Crashed before deleting the originals
+
+        ids = load_columns(("id",), root=tmp_path, sources=["zonaprop"])["id"].tolist()
+        assert ids == ["2026-10-01-zonaprop-0", "2026-10-01-zonaprop-1"]
+        compact_archive(tmp_path, today=date(2026, 10, 2), retention_days=0)
+        assert [chunk.name for chunk in partition.iterdir()] == ["day"]
+
+    def test_expired_days_are_deleted(self, tmp_path):
+        self.fill(tmp_path, [date(2026, 9, 1), date(2026, 10, 1)], cycles=1)
+        stats = compact_archive(tmp_path, today=date(2026, 10, 2), retention_days=7)
+
+        assert stats == {"compacted": 2, "expired": 1}
+        assert not (tmp_path / "2026-09-01").exists()
+        assert all(day.startswith("2026-10-01") for day in load_columns(("id",), root=tmp_path)["id"].tolist())
+
+    def test_save_archive_compacts_previous_days(self, tmp_path):
+        self.fill(tmp_path, [date.today() - timedelta(days=1)])
+        store = ListingArchive(tmp_path)
+        store.add(make_listing("today"))
+        save_archive(store)
+
+        assert [chunk.name for chunk in iter_chunks(tmp_path, sources=["argenprop"])][0] == "day"
+
+
+class TestAnalysis:
+    """Tests for the vectorized analysis."""
+
+    def test_match_mask_agrees_with_matches(self):
+        listings = generate_listings(500)
+        data = columns_from_listings(listings)
+        for criteria in (
+            {"max_price": 600000, "min_rooms": 2, "max_expensas": 100000},
+            {"max_price": 900000, "min_rooms": 1, "max_expensas": 150000, "min_price": 300000, "max_rooms": 3},
+        ):
+            expected = [matches(ap, criteria) for ap in listings]
+            assert match_mask(data, criteria).tolist() == expected
+
+    def test_column_stats(self):
+        stats = column_stats(np.array([1.0, 2.0, np.nan, 3.0]))
+        assert stats["count"] == 3
+        assert stats["max"] == 3
+        assert stats[50] == pytest.approx(2.0)
+        assert column_stats(np.array([np.nan])) is None
+
+    def test_rooms_distribution(self):
+        assert rooms_distribution(np.array([2.0, 1.0, 2.0, np.nan])) == [(1, 1), (2, 2)]
+
+
+class TestSweep:
+    """Tests for the what-if grid."""
+
+    max_prices = [400000, 500000, 600000, 800000]
+    max_expensas = [50000, 100000, 150000]
+    min_rooms = [1, 2, 3]
+
+    def test_grid_agrees_with_match_mask(self):
+        """Every cell equals the count of a separate match_mask pass."""
+        data = columns_from_listings(generate_listings(800))
+        base = {"min_price": 200000, "max_rooms": 4}
+        counts = sweep(data, self.max_prices, self.max_expensas, self.min_rooms, base=base)
+
+        assert counts.shape == (3, 4, 3)
+        for r, rooms in enumerate(self.min_rooms):
+            for p, price in enumerate(self.max_prices):
+                for e, expensas in enumerate(self.max_expensas):
+                    criteria = dict(base, max_price=price, max_expensas=expensas, min_rooms=rooms)
+                    assert counts[r, p, e] == match_mask(data, criteria).sum()
+
+    def test_unsorted_thresholds(self):
+        data = columns_from_listings(generate_listings(200))
+        counts = sweep(data, self.max_prices[::-1], self.max_expensas, self.min_rooms)
+        assert (counts == sweep(data, self.max_prices, self.max_expensas, self.min_rooms)).all()
+
+    def test_empty_data(self):
+        data = columns_from_listings([])
+        assert not sweep(data, self.max_prices, self.max_expensas, self.min_rooms).any()
+
+    def test_recommend_strictest_reaching_target(self):
+        counts = np.zeros((3, 4, 3))
+        counts[0] = 20           # 1+ rooms: plenty everywhere
+        counts[1, 2:, 1:] = 12   # 2+ rooms: from $600,000 / $100,000
+        counts[1, 3, 2] = 15
+
+        best = recommend(counts, self.max_prices, self.max_expensas, self.min_rooms, target=10)
+        assert best == {"max_price": 600000, "max_expensas": 100000, "min_rooms": 2, "count": 12}
+        assert recommend(counts, self.max_prices, self.max_expensas, self.min_rooms, target=50) is None
+
+    def test_rejection_masks(self):
+        """A listing fails exactly when some reason applies."""
+        listings = generate_listings(300)
+        data = columns_from_listings(listings)
+        criteria = {"max_price": 600000, "min_rooms": 2, "max_expensas": 100000}
+        rejected = np.logical_or.reduce(list(rejection_masks(data, criteria).values()))
+        assert (rejected == ~match_mask(data, criteria)).all()
+
+    def test_parse_range(self):
+        assert parse_range("1:3:1").tolist() == [1, 2, 3]
+        assert parse_range("300,100,200").tolist() == [100, 200, 300]
+
+    def test_weeks_covered(self):
+        data = {"scraped_at": np.array([0.0, 14 * 86400.0])}
+        assert weeks_covered(data) == 2
+        assert weeks_covered(data, days=7) == 1
+        assert weeks_covered({"scraped_at": np.array([5.0])}) == pytest.approx(1 / 7)
+
+
+@pytest.fixture(autouse=True)
+def no_default_archive(tmp_path, monkeypatch):
+    """Never write to the real archive directory."""
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", tmp_path / "archive")
@@ -0,0 +1,149 @@
+"""Tests for warm page reuse, persisted sessions and memory budgets in the browser manager."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from scrappers import browser_manager, browser_state
+
+
+class FakePage:
+    def __init__(self, heap_bytes=0):
+        self.heap_bytes = heap_bytes
+        self.closed = False
+        self.visited = []
+
+    def is_closed(self):
+        return self.closed
+
+    def evaluate(self, script):
+        return self.heap_bytes if "usedJSHeapSize" in script else None
+
+    def goto(self, url):
+        self.visited.append(url)
+
+
+class FakeContext:
+    def __init__(self, page, storage_state=None):
+        self.page = page
+        self.closed = False
+        self.clear_cookies = Mock()
+        self.initial_state = storage_state
+
+    def storage_state(self):
+        return {"cookies": [{"name": "session", "value": "abc", "expires": -1}], "origins": []}
+
+    def new_page(self):
+        return self.page
+
+    def close(self):
+        self.closed = True
+        self.page.closed = True
+
+
+@pytest.fixture
+def fake_browser(monkeypatch, tmp_path):
+    """Replace Chromium with fake contexts; returns the created contexts."""
+    created = []
+
+    def create_context(storage_state=None):
+        context = FakeContext(FakePage(), storage_state)
+        created.append(context)
+        return context
+
+    monkeypatch.setattr(browser_manager, "get_browser", Mock())
+    monkeypatch.setattr(browser_manager, "create_context", create_context)
+    monkeypatch.setattr(browser_manager, "chromium_rss_mb", lambda: 100)
+    monkeypatch.setattr(browser_manager, "_pages", {})
+    monkeypatch.setattr(browser_manager, "_restored", {})
+    monkeypatch.setattr(browser_state, "STATE_DIR", tmp_path / "browser_state")
+    return created
+
+
+class TestPageReuse:
+    """Tests for get_page/release_page."""
+
+    def test_page_reused_across_scrapes(self, fake_browser):
+        page = browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop")
+
+        assert browser_manager.get_page("zonaprop") is page
+        assert len(fake_browser) == 1
+
+    def test_sources_get_separate_pages(self, fake_browser):
+        assert browser_manager.get_page("zonaprop") is not browser_manager.get_page("mercadolibre")
+
+    def test_release_moves_to_blank_page(self, fake_browser):
+        page = browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop")
+        assert page.visited == ["about:blank"]
+
+    def test_context_over_budget_is_recycled(self, fake_browser):
+        page = browser_manager.get_page("zonaprop")
+        page.heap_bytes = (browser_manager.CONTEXT_HEAP_BUDGET_MB + 1) * 1024 * 1024
+        browser_manager.release_page("zonaprop")
+
+        assert fake_browser[0].closed
+        assert browser_manager.get_page("zonaprop") is not page
+
+    def test_recycle_follows_measured_heap(self, fake_browser, monkeypatch):
+        monkeypatch.setattr(browser_manager, "CONTEXT_HEAP_BUDGET_MB", 50)
+        page = browser_manager.get_page("zonaprop")
+
+        page.heap_bytes = 40 * 1024 * 1024
+        browser_manager.release_page("zonaprop")
+        assert not fake_browser[0].closed
+
+        page.heap_bytes = 60 * 1024 * 1024
+        browser_manager.release_page("zonaprop")
+        assert fake_browser[0].closed
+
+    def test_browser_over_budget_closes_everything(self, fake_browser, monkeypatch):
+        monkeypatch.setattr(browser_manager, "chromium_rss_mb", lambda: browser_manager.BROWSER_RSS_BUDGET_MB + 1)
+        close = Mock()
+        monkeypatch.setattr(browser_manager, "_close_browser_sync", close)
+
+        browser_manager.get_page("zonaprop")
+        browser_manager.get_page("mercadolibre")
+        browser_manager.release_page("zonaprop")
+
+        assert all(context.closed for context in fake_browser)
+        close.assert_called_once()
+
+
+class TestSessions:
+    """Tests for sessions persisted between runs."""
+
+    def test_successful_scrape_saves_session_for_next_run(self, fake_browser):
+        browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop", first_card=1.5)
+        browser_manager._close_context("zonaprop")  # Next run: new context
+
+        browser_manager.get_page("zonaprop")
+
+        assert fake_browser[0].initial_state is None
+        assert fake_browser[1].initial_state["cookies"][0]["value"] == "abc"
+        fake_browser[0].clear_cookies.assert_not_called()
+
+    def test_failed_scrape_saves_nothing(self, fake_browser):
+        browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop")
+        assert browser_state.load_state("zonaprop") is None
+
+    def test_block_clears_and_forgets_session(self, fake_browser):
+        browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop", first_card=1.0)
+        browser_manager.release_page("zonaprop", blocked=True)
+
+        fake_browser[0].clear_cookies.assert_called_once()
+        assert browser_state.load_state("zonaprop") is None
+
+    def test_stats_split_by_session_kind(self, fake_browser):
+        browser_manager.get_page("zonaprop")
+        browser_manager.release_page("zonaprop", first_card=4.0)  # Fresh, then kept
+        browser_manager.release_page("zonaprop", first_card=2.0)
+        browser_manager.release_page("zonaprop")
+
+        report = browser_state.session_report()["zonaprop"]
+        assert report["fresh"] == {"scrapes": 1, "success_rate": 1.0, "first_card_avg": 4.0}
+        assert report["restored"] == {"scrapes": 2, "success_rate": 0.5, "first_card_avg": 2.0}
@@ -0,0 +1,48 @@
+"""Tests for persisted browser sessions."""
+
+import time
+
+import pytest
+
+from scrappers import browser_state
+from scrappers.browser_state import invalidate_state, load_state, save_state
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(browser_state, "STATE_DIR", tmp_path)
+    return tmp_path
+
+
+def cookie(name, expires=-1):
+    return {"name": name, "value": "v", "domain": ".zonaprop.com.ar", "path": "/", "expires": expires}
+
+
+class TestState:
+    """Tests for saving and loading storage state."""
+
+    def test_round_trip(self):
+        state = {"cookies": [cookie("a")], "origins": [{"origin": "https://x", "localStorage": []}]}
+        save_state("zonaprop", state)
+        assert load_state("zonaprop") == state
+
+    def test_missing_or_corrupt_state(self, state_dir):
+        assert load_state("zonaprop") is None
+        (state_dir / "zonaprop.json").write_text("{not json")
+        assert load_state("zonaprop") is None
+
+    def test_expired_cookies_are_dropped(self):
+        now = time.time()
+        save_state("zonaprop", {"cookies": [cookie("old", now - 10), cookie("new", now + 3600), cookie("session")]}, now=now)
+        assert [c["name"] for c in load_state("zonaprop", now=now)["cookies"]] == ["new", "session"]
+
+    def test_state_past_max_age_is_deleted(self, state_dir):
+        save_state("zonaprop", {"cookies": [cookie("a")]}, now=time.time() - browser_state.STATE_MAX_AGE - 1)
+        assert load_state("zonaprop") is None
+        assert not (state_dir / "zonaprop.json").exists()
+
+    def test_invalidate(self):
+        save_state("zonaprop", {"cookies": [cookie("a")]})
+        invalidate_state("zonaprop")
+        invalidate_state("zonaprop")  # Already gone: no error
+        assert load_state("zonaprop") is None
@@ -0,0 +1,130 @@
+"""Tests for the per-source circuit breaker."""
+
+from unittest.mock import Mock, patch
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import (
+    GuardedSource, SourceBlocked, allow, detect_block, record_failure, record_success,
+    CLOSED, OPEN, HALF_OPEN
+)
+
+
+class FakeSource:
+    def __init__(self, name="zonaprop", ids=(), error=None):
+        self.name = name
+        self.label = name
+        self.needs_browser = True
+        self.ids = ids
+        self.error = error
+        self.calls = 0
+
+    def scrape(self, max_pages=None):
+        self.calls += 1
+        for listing_id in self.ids:
+            yield {"id": listing_id}
+        if self.error:
+            raise self.error
+
+
+class TestDetection:
+    """Tests for block/challenge detection."""
+
+    def test_block_statuses(self):
+        assert detect_block(403) == "HTTP 403"
+        assert detect_block(429) is not None
+        assert detect_block(200, "Departamentos en alquiler") is None
+
+    def test_challenge_pages(self):
+        assert detect_block(200, "Just a moment...") is not None
+        assert detect_block(200, "", "https://www.mercadolibre.com.ar/gz/account-verification?x=1") is not None
+
+    @patch('scrappers.argenprop.time.sleep')
+    @patch('scrappers.argenprop.requests.get')
+    def test_http_scraper_fails_fast(self, mock_get, mock_sleep):
+        """A challenge page raises at once instead of being retried."""
+        from scrappers.argenprop import iter_argenprop
+
+        response = Mock(status_code=200, url="https://www.argenprop.com/")
+        response.text = "<html><head><title>Just a moment...</title></head></html>"
+        mock_get.return_value = response
+
+        with pytest.raises(SourceBlocked):
+            list(iter_argenprop(max_pages=1, delay=0))
+        assert mock_get.call_count == 1
+
+
+class TestBreakerStates:
+    """Tests for the closed -> open -> half-open transitions."""
+
+    def test_opens_after_threshold(self):
+        breakers = {}
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD - 1):
+            assert record_failure(breakers, "zonaprop", "blocked", now=0) == CLOSED
+        assert record_failure(breakers, "zonaprop", "blocked", now=0) == OPEN
+        assert not allow(breakers, "zonaprop", now=60)
+
+    def test_half_open_probe_and_backoff(self):
+        breakers = {}
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            record_failure(breakers, "zonaprop", "blocked", now=0)
+        cooldown = breakers["zonaprop"]["cooldown"]
+
+        assert allow(breakers, "zonaprop", now=cooldown)
+        assert breakers["zonaprop"]["state"] == HALF_OPEN
+
+        # Failed probe: reopen with twice the cooldown
+        assert record_failure(breakers, "zonaprop", "blocked", now=cooldown) == OPEN
+        assert breakers["zonaprop"]["cooldown"] == 2 * cooldown
+        assert not allow(breakers, "zonaprop", now=cooldown + cooldown)
+
+    def test_success_closes(self):
+        breakers = {}
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            record_failure(breakers, "zonaprop", "blocked", now=0)
+        record_success(breakers, "zonaprop")
+
+        assert breakers["zonaprop"]["state"] == CLOSED
+        assert allow(breakers, "zonaprop")
+
+    def test_round_trip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(circuit_breaker, "BREAKER_FILE", tmp_path / "breakers.json")
+        breakers = {}
+        record_failure(breakers, "zonaprop", "blocked", now=0)
+
+        circuit_breaker.save_breakers(breakers)
+
+        assert circuit_breaker.load_breakers()["zonaprop"]["failures"] == 1
+
+
+class TestGuardedSource:
+    """Tests for the breaker wrapper used by the pipeline."""
+
+    def test_open_circuit_skips_scrape(self):
+        source = FakeSource(ids=["z1"])
+        breakers = {}
+        for _ in range(circuit_breaker.FAILURE_THRESHOLD):
+            record_failure(breakers, "zonaprop", "blocked")
+
+        assert list(GuardedSource(source, breakers).scrape()) == []
+        assert source.calls == 0
+
+    def test_failures_are_recorded(self):
+        breakers = {}
+        guarded = GuardedSource(FakeSource(error=SourceBlocked("HTTP 403")), breakers)
+
+        with pytest.raises(SourceBlocked):
+            list(guarded.scrape())
+        assert list(GuardedSource(FakeSource(), breakers).scrape()) == []
+
+        assert breakers["zonaprop"]["failures"] == 2
+
+    def test_early_stop_counts_as_success(self):
+        breakers = {"zonaprop": {"state": HALF_OPEN, "failures": 3, "opened_at": 0, "cooldown": 60}}
+        stream = GuardedSource(FakeSource(ids=["z1", "z2"]), breakers).scrape()
+
+        next(stream)
+        stream.close()
+
+        assert breakers["zonaprop"]["state"] == CLOSED
@@ -0,0 +1,130 @@
+"""Tests for cross-source duplicate detection."""
+
+import time
+
+import dedup
+from dedup import FingerprintIndex, normalize_address, address_similarity
+from enrichment import DetailEnricher
+from pipeline import iter_enriched, iter_unique
+
+
+def make_listing(listing_id, source, price=450000, rooms=2, expensas=70000, address="Calle 7 e/ 45 y 46"):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address,
+        "url": f"https://example.com/{listing_id}",
+        "source": source
+    }
+
+
+class TestNormalization:
+    """Tests for address normalization."""
+
+    def test_normalize_address(self):
+        assert normalize_address("Calle 7 entre 45 y 46, La Plata") == "7 45 46"
+        assert normalize_address("Diagonal Norte Nº 80") == "diagonal norte 80"
+        assert normalize_address(None) == ""
+
+    def test_similar_addresses(self):
+        a = normalize_address("Calle 7 e/ 45 y 46")
+        b = normalize_address("7 entre 45 y 46, La Plata, Buenos Aires")
+        assert address_similarity(a, b) == 1.0
+
+    def test_unknown_address(self):
+        assert address_similarity("", "7 45") is None
+
+
+class TestFingerprintIndex:
+    """Tests for duplicate lookup."""
+
+    def test_cross_source_duplicate(self):
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop"))
+
+        original = index.find(make_listing("zonaprop_9", "zonaprop", price=455000,
+                                           address="7 entre 45 y 46, La Plata"))
+
+        assert original["id"] == "argenprop_1"
+
+    def test_same_source_is_not_duplicate(self):
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop"))
+
+        assert index.find(make_listing("argenprop_2", "argenprop")) is None
+
+    def test_different_apartments(self):
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop"))
+
+        assert index.find(make_listing("z1", "zonaprop", rooms=3)) is None
+        assert index.find(make_listing("z2", "zonaprop", price=520000)) is None
+        assert index.find(make_listing("z3", "zonaprop", address="Calle 50 e/ 10 y 11")) is None
+        assert index.find(make_listing("z4", "zonaprop", expensas=120000)) is None
+
+    def test_no_address_needs_equal_expensas(self):
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop", address=""))
+
+        assert index.find(make_listing("z1", "zonaprop", address="")) is not None
+        assert index.find(make_listing("z2", "zonaprop", address="", expensas=None)) is None
+
+    def test_price_bucket_boundary(self):
+        """Prices just across a bucket boundary are still compared."""
+        index = FingerprintIndex()
+        for price in range(440000, 460000, 1000):
+            index = FingerprintIndex([dedup.fingerprint(make_listing("a", "argenprop", price=price))])
+            assert index.find(make_listing("z", "zonaprop", price=price + 5000)) is not None
+
+    def test_history_round_trip(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(dedup, "FINGERPRINT_FILE", tmp_path / "fingerprints.json")
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop"))
+        dedup.save_fingerprints(index)
+
+        loaded = dedup.load_fingerprints()
+
+        assert loaded.find(make_listing("zonaprop_9", "zonaprop")) is not None
+
+    def test_old_fingerprints_expire(self):
+        index = FingerprintIndex()
+        index.add(make_listing("argenprop_1", "argenprop"))
+
+        later = time.time() + (dedup.MAX_AGE_DAYS + 1) * 86400
+        assert index.recent(now=later) == []
+
+        index.trim(now=later)
+        assert len(index) == 0
+        assert index.find(make_listing("zonaprop_9", "zonaprop")) is None
+
+
+class TestIterUnique:
+    """Tests for the pipeline stage."""
+
+    def test_one_representative_per_cluster(self):
+        listings = [
+            make_listing("argenprop_1", "argenprop"),
+            make_listing("zonaprop_1", "zonaprop"),
+            make_listing("mercadolibre_1", "mercadolibre"),
+            make_listing("zonaprop_2", "zonaprop", rooms=3),
+        ]
+
+        result = list(iter_unique(listings, FingerprintIndex()))
+
+        assert [ap["id"] for ap in result] == ["argenprop_1", "zonaprop_2"]
+
+    def test_enriched_listings_are_fingerprinted(self, default_criteria):
+        """A card without rooms is deduplicated once enrichment fills them in."""
+        listings = [
+            make_listing("argenprop_1", "argenprop"),
+            make_listing("mercadolibre_1", "mercadolibre", rooms=None),
+        ]
+        enricher = DetailEnricher(fetch=lambda url: {"rooms": 2})
+
+        enriched = iter_enriched(listings, [("1", default_criteria)], enricher)
+        result = list(iter_unique(enriched, FingerprintIndex()))
+        enricher.close()
+
+        assert [ap["id"] for ap in result] == ["argenprop_1"]
@@ -0,0 +1,118 @@
+"""Tests for detail-page enrichment of incomplete listings."""
+
+import threading
+
+import enrichment
+from enrichment import DetailEnricher, parse_detail, could_match
+from pipeline import iter_enriched, iter_matches
+
+
+def make_listing(listing_id, price=450000, rooms=2, expensas=70000, address="Calle 7 e/ 45 y 46"):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address,
+        "url": f"https://example.com/{listing_id}",
+        "source": "mercadolibre"
+    }
+
+
+class TestParsing:
+    """Tests for detail page parsing and candidate selection."""
+
+    def test_parse_detail(self):
+        text = "Departamento 3 ambientes en La Plata. Expensas: $ 85.000. Superficie 60 m2"
+        assert parse_detail(text) == {"rooms": 3, "expensas": 85000}
+
+    def test_parse_detail_bedrooms(self):
+        assert parse_detail("1 dormitorio, $ 40.000 de expensas") == {"rooms": 2, "expensas": 40000}
+
+    def test_could_match_ignores_unknown_fields(self, default_criteria):
+        assert could_match(make_listing("a", rooms=None, expensas=None), default_criteria)
+        assert not could_match(make_listing("a", rooms=None, price=900000), default_criteria)
+
+
+class TestDetailEnricher:
+    """Tests for DetailEnricher and the iter_enriched stage."""
+
+    def test_only_candidates_are_fetched(self, default_criteria):
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            return {"expensas": 50000}
+
+        enricher = DetailEnricher(fetch=fetch)
+        listings = [
+            make_listing("complete"),
+            make_listing("too_expensive", price=900000, expensas=None),
+            make_listing("incomplete", expensas=None),
+        ]
+
+        result = {ap["id"]: ap for ap in iter_enriched(listings, [("1", default_criteria)], enricher)}
+        enricher.close()
+
+        assert fetched == ["https://example.com/incomplete"]
+        assert result["incomplete"]["expensas"] == 50000
+        assert result["too_expensive"]["expensas"] is None
+
+    def test_enriched_listing_is_matched_again(self, default_criteria):
+        """A listing whose detail page shows high expensas no longer matches."""
+        enricher = DetailEnricher(fetch=lambda url: {"expensas": 500000})
+        user_configs = [("1", default_criteria)]
+
+        stream = iter_matches(
+            iter_enriched([make_listing("a", expensas=None)], user_configs, enricher), user_configs
+        )
+        result = list(stream)
+        enricher.close()
+
+        assert result[0][1] == []
+
+    def test_budget_and_cache(self, default_criteria):
+        calls = []
+        lock = threading.Lock()
+
+        def fetch(url):
+            with lock:
+                calls.append(url)
+            return {"rooms": 3}
+
+        enricher = DetailEnricher(budget=2, fetch=fetch)
+        listings = [make_listing(str(i), rooms=None) for i in range(5)]
+
+        result = list(iter_enriched(listings, [("1", default_criteria)], enricher))
+        enricher.close()
+
+        assert len(calls) == 2
+        assert len(result) == 5
+        assert sum(1 for ap in result if ap["rooms"] == 3) == 2
+
+        # Cached URLs are served without a fetch in the next cycle
+        next_cycle = DetailEnricher(cache=enricher.cache, budget=0, fetch=fetch)
+        cached = [ap for ap in iter_enriched(listings, [("1", default_criteria)], next_cycle) if ap["rooms"] == 3]
+        assert len(cached) == 2 and len(calls) == 2
+
+    def test_failed_fetch_keeps_listing(self, default_criteria):
+        def fetch(url):
+            raise OSError("blocked")
+
+        enricher = DetailEnricher(fetch=fetch)
+        result = list(iter_enriched([make_listing("a", rooms=None)], [("1", default_criteria)], enricher))
+        enricher.close()
+
+        assert result[0]["rooms"] is None
+        assert enricher.cache["https://example.com/a"]["ok"] is False
+
+    def test_cache_round_trip_drops_expired(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(enrichment, "CACHE_FILE", tmp_path / "details.json")
+        cache = {
+            "https://example.com/new": {"fields": {"rooms": 2}, "fetched": 1000.0, "ok": True},
+            "https://example.com/old": {"fields": {}, "fetched": 0.0, "ok": True},
+        }
+
+        enrichment.save_detail_cache(cache, now=enrichment.CACHE_TTL_DAYS * 86400 + 500)
+
+        assert list(enrichment.load_detail_cache()) == ["https://example.com/new"]
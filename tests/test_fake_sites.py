@@ -0,0 +1,127 @@
+"""Tests for the local stand-in listing sites."""
+
+import pytest
+
+import fake_sites
+from circuit_breaker import SourceBlocked
+from enrichment import fetch_detail
+from fake_sites import FIRST_ID, FakeSites, base_urls, make_listing, render, start_server
+from scrappers import argenprop, inmobusqueda
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start the stand-in sites and point the HTTP scrapers at them."""
+    servers = []
+
+    def _serve(**options):
+        server = start_server(FakeSites(**options))
+        servers.append(server)
+        urls = base_urls(server)
+        for module, source in ((argenprop, "argenprop"), (inmobusqueda, "inmobusqueda")):
+            base = urls[fake_sites.BASE_URL_ENV[source]]
+            search_base = module.SEARCH_BASE.replace(module.BASE_URL, base, 1)
+            monkeypatch.setattr(module, "BASE_URL", base)
+            monkeypatch.setattr(module, "SEARCH_BASE", search_base)
+        return urls
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestCatalog:
+    """Tests for the synthetic listings."""
+
+    def test_listings_are_deterministic(self):
+        """Same site, index and seed give the same listing."""
+        assert make_listing("zonaprop", 5) == make_listing("zonaprop", 5)
+        assert make_listing("zonaprop", 5, seed=1) != make_listing("zonaprop", 5)
+
+    def test_pages_newest_first(self):
+        """Result pages list the newest listings first, without overlap."""
+        sites = FakeSites(churn=0)
+        first = sites.page_listings("argenprop", 1)
+        second = sites.page_listings("argenprop", 2)
+        assert first[0]["id"] == FIRST_ID + fake_sites.INITIAL_LISTINGS - 1
+        assert first[-1]["id"] == second[0]["id"] + 1
+
+    def test_pagination_depth(self):
+        """Pages past the configured depth are empty."""
+        sites = FakeSites(pages=2)
+        assert sites.page_listings("argenprop", 2)
+        assert sites.page_listings("argenprop", 3) == []
+
+    def test_churn_publishes_new_listings(self):
+        """New listings appear on page 1 as time passes."""
+        sites = FakeSites(churn=10)
+        later = sites.started + 60
+        assert sites.total(later) == sites.total(sites.started) + 10
+        assert sites.page_listings("argenprop", 1, later)[0]["id"] == FIRST_ID + sites.total(later) - 1
+
+
+class TestRouting:
+    """Tests for the per-site URL schemes."""
+
+    @pytest.mark.parametrize("source,path,query,page", [
+        ("argenprop", "/departamentos/alquiler/la-plata", "orden-masnuevos", 1),
+        ("argenprop", "/departamentos/alquiler/la-plata", "orden-masnuevos-pagina-3", 3),
+        ("inmobusqueda", "/departamento-alquiler-la-plata-casco-urbano-pagina-2.html", "publicado=5", 2),
+        ("zonaprop", "/departamentos-alquiler-la-plata-orden-publicado-descendente-pagina-4.html", "", 4),
+        ("mercadolibre", "/departamentos/alquiler/la-plata_OrderId_BEGINS*DESC_Desde_49", "", 2),
+    ])
+    def test_result_pages(self, source, path, query, page):
+        """Each site's result URLs map to the right page."""
+        assert fake_sites._result_page_number(source, path, query) == page
+
+    def test_unknown_path(self):
+        """Unknown URLs get a 404."""
+        status, _, kind = render(FakeSites(), "zonaprop", "/otra-cosa", "", "http://x/zonaprop")
+        assert status == 404
+        assert kind == "not_found"
+
+
+class TestScrapers:
+    """End-to-end tests of the HTTP scrapers against the stand-in sites."""
+
+    def test_argenprop(self, serve):
+        """ArgenProp pages are scraped with every field."""
+        serve(churn=0)
+        listings = list(argenprop.iter_argenprop(max_pages=2, delay=0))
+
+        assert len(listings) == 2 * fake_sites.PER_PAGE["argenprop"]
+        newest = make_listing("argenprop", fake_sites.INITIAL_LISTINGS - 1)
+        assert listings[0]["id"] == f"argenprop_{newest['id']}"
+        assert listings[0]["price"] == newest["price"]
+        assert listings[0]["rooms"] == newest["rooms"]
+        assert listings[0]["address"] == newest["address"]
+
+    def test_inmobusqueda(self, serve):
+        """Inmobusqueda pages are scraped and stop at the pagination depth."""
+        serve(pages=1, churn=0)
+        listings = list(inmobusqueda.iter_inmobusqueda(max_pages=3, delay=0))
+
+        assert len(listings) == fake_sites.PER_PAGE["inmobusqueda"]
+        assert all(ap["url"].startswith(inmobusqueda.BASE_URL) for ap in listings)
+
+    def test_challenge_page_is_detected(self, serve):
+        """Simulated blocks trip the scrapers' block detection."""
+        serve(block_rate=1.0)
+        with pytest.raises(SourceBlocked):
+            list(argenprop.iter_argenprop(max_pages=1, delay=0))
+
+    def test_server_errors(self, serve):
+        """Simulated 500s end the scrape without listings."""
+        serve(error_rate=1.0)
+        assert list(argenprop.iter_argenprop(max_pages=1, delay=0, max_retries=2)) == []
+
+    def test_detail_page(self, serve):
+        """Detail pages provide the fields enrichment looks for."""
+        serve(churn=0)
+        ap = next(argenprop.iter_argenprop(max_pages=1, delay=0))
+
+        fields = fetch_detail(ap["url"])
+
+        assert fields["rooms"] == ap["rooms"]
+        assert fields["address"] == ap["address"]
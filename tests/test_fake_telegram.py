@@ -0,0 +1,125 @@
+"""Tests for the fake Telegram Bot API."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+import requests
+
+import notifier
+from fake_telegram import FakeTelegram, api_base, handle, start_server
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start a fake Bot API and point the notifier at it."""
+    servers = []
+
+    def _serve(**options):
+        api = FakeTelegram(**options)
+        server = start_server(api)
+        servers.append(server)
+        monkeypatch.setattr(notifier, "API_BASE", api_base(server))
+        return api
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestRateLimits:
+    """Tests for the flood control emulation."""
+
+    def test_per_chat_limit(self):
+        """A second message to the same chat within the window is refused."""
+        api = FakeTelegram(chat_rate=1)
+        assert api.send_message(1, "a", now=100.0)[0] is not None
+
+        message, retry_after = api.send_message(1, "b", now=100.2)
+        assert message is None
+        assert retry_after == 1
+        assert api.send_message(2, "c", now=100.2)[0] is not None
+
+    def test_global_limit(self):
+        """Messages over the global rate are refused for every chat."""
+        api = FakeTelegram(global_rate=3, chat_rate=10)
+        for chat_id in range(3):
+            assert api.send_message(chat_id, "x", now=50.0)[0] is not None
+        assert api.send_message(99, "x", now=50.5)[0] is None
+        assert api.send_message(99, "x", now=51.0)[0] is not None
+
+    def test_delivery_order(self):
+        """Delivered messages are recorded in order."""
+        api = FakeTelegram(chat_rate=10)
+        for n in range(3):
+            api.send_message(7, f"msg {n}", now=10.0 + n)
+        assert [m["text"] for m in api.delivered] == ["msg 0", "msg 1", "msg 2"]
+        assert api.throughput()["delivered"] == 3
+
+    def test_429_body(self):
+        """Rate limited calls answer like the real API."""
+        api = FakeTelegram(chat_rate=1)
+        handle(api, "sendMessage", {"chat_id": "5", "text": "a"})
+        status, body = handle(api, "sendMessage", {"chat_id": "5", "text": "b"})
+        assert status == 429
+        assert body["ok"] is False
+        assert body["parameters"]["retry_after"] >= 1
+
+
+class TestUpdates:
+    """Tests for getUpdates."""
+
+    def test_offset_confirms_updates(self):
+        """Updates before the offset are dropped."""
+        api = FakeTelegram()
+        first = api.push_update(10, "/start")
+        api.push_update(10, "/bajas")
+
+        assert len(api.get_updates()) == 2
+        assert [u["update_id"] for u in api.get_updates(offset=first + 1)] == [first + 1]
+        assert api.get_updates(offset=first + 2) == []
+
+
+class TestNotifier:
+    """End-to-end tests of notifier.send_text against the fake API."""
+
+    def test_delivers(self, serve):
+        """Messages sent by the notifier are recorded."""
+        api = serve()
+        notifier.send_text("123:abc", "42", "hola")
+        assert api.delivered[0]["chat_id"] == "42"
+        assert api.delivered[0]["text"] == "hola"
+
+    def test_honors_retry_after(self, serve):
+        """A 429 makes the notifier wait retry_after before retrying."""
+        api = serve(chat_rate=1)
+        notifier.send_text("123:abc", "42", "first")
+
+        with patch("notifier.time.sleep") as sleep:
+            with pytest.raises(requests.exceptions.HTTPError):
+                notifier.send_text("123:abc", "42", "second", max_retries=2)
+
+        sleep.assert_called_once_with(1)
+        assert len(api.delivered) == 1
+        assert api.stats["rate_limited"] == 2
+
+    def test_server_errors(self, serve):
+        """Injected 5xx errors are retried and finally raised."""
+        serve(error_rate=1.0)
+        with patch("notifier.time.sleep"):
+            with pytest.raises(requests.exceptions.HTTPError):
+                notifier.send_text("123:abc", "42", "hola", max_retries=2)
+
+    def test_bot_library(self, serve):
+        """The bot library can send through the fake API."""
+        from telegram import Bot
+
+        api = serve()
+
+        async def _send():
+            async with Bot("123:abc", base_url=f"{notifier.API_BASE}/bot") as bot:
+                await bot.send_message(chat_id=42, text="hola")
+
+        asyncio.run(_send())
+        assert api.delivered[0]["text"] == "hola"
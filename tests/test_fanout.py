@@ -0,0 +1,225 @@
+"""Tests for sharded notification fan-out."""
+
+import sqlite3
+from collections import Counter
+
+import pytest
+
+import fanout
+import pipeline
+import user_config
+from fake_telegram import FakeTelegram, api_base, start_server
+from fanout import fan_out, incomplete_shards, load_progress, pending_cycles, publish, run_cycle, run_shard, shard_of
+from load_test import generate_listings, generate_user_configs
+from user_config import DEFAULT_CONFIG
+from user_store import UserStore
+
+
+class Crash(BaseException):
+    """Kills a shard mid-cycle (not caught by notify_sink)."""
+
+
+@pytest.fixture(autouse=True)
+def user_db(tmp_path, monkeypatch):
+    """Run in tmp_path, where user_config opens a fresh ./users.db."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("USER_CONFIGS", raising=False)
+    monkeypatch.setattr(user_config, "_store", None)
+    yield
+    if user_config._store is not None:
+        user_config._store.close()
+
+
+@pytest.fixture
+def cycle_data():
+    """Listings and active users, stored for run_shard in this process, and the expected sends."""
+    listings = generate_listings(60, seed=5)
+    store = user_config.get_store()
+    store.import_configs(dict(generate_user_configs(40, seed=5)))
+    user_configs = store.active_configs()
+    expected = {
+        (ap["id"], user_id)
+        for ap, user_ids in pipeline.iter_top_k(pipeline.iter_matches(listings, user_configs), user_configs)
+        for user_id in user_ids
+    }
+    return listings, expected
+
+
+class TestSharding:
+    """Tests for the user partition."""
+
+    def test_stable_and_balanced(self):
+        counts = Counter(shard_of(user_id, 4) for user_id in range(4000))
+        assert set(counts) == {0, 1, 2, 3}
+        assert min(counts.values()) > 800
+        assert shard_of("12345", 4) == shard_of(12345, 4)
+
+
+class TestRunShard:
+    """Tests for one shard, run in this process."""
+
+    def test_shards_cover_every_selected_match_once(self, tmp_path, cycle_data):
+        listings, expected = cycle_data
+        cycle = publish(listings, shards=3, root=tmp_path)
+
+        sent = []
+        for shard in range(3):
+            run_shard(cycle, shard, lambda user_id, ap: sent.append((ap["id"], user_id)))
+
+        assert len(sent) == len(set(sent))
+        assert set(sent) == expected
+        assert incomplete_shards(cycle) == []
+
+    def test_resume_after_crash_does_not_resend(self, tmp_path, cycle_data):
+        listings, expected = cycle_data
+        cycle = publish(listings, shards=1, root=tmp_path)
+        sent = []
+
+        def crash_after_three(user_id, ap):
+            if len(sent) == 3:
+                raise Crash()
+            sent.append((ap["id"], user_id))
+
+        with pytest.raises(Crash):
+            run_shard(cycle, 0, crash_after_three)
+        assert incomplete_shards(cycle) == [0]
+        assert len(load_progress(cycle, 0)) == 3
+
+        stats = run_shard(cycle, 0, lambda user_id, ap: sent.append((ap["id"], user_id)))
+
+        assert stats["skipped"] == 3
+        assert stats["sent"] == len(expected) - 3
+        assert sorted(sent) == sorted(expected)
+
+    def test_stats_report_selected_and_overflow(self, tmp_path, cycle_data, monkeypatch):
+        """Across shards, matched listings are either selected or overflow."""
+        listings, _ = cycle_data
+        monkeypatch.setattr(pipeline, "MAX_MATCHES_PER_USER", 1)
+        user_configs = user_config.get_store().active_configs()
+        expected = {ap["id"] for ap, _ in pipeline.iter_top_k(pipeline.iter_matches(listings, user_configs), user_configs)}
+        cycle = publish(listings, shards=3, root=tmp_path)
+
+        selected, overflow = set(), set()
+        for shard in range(3):
+            stats = run_shard(cycle, shard, lambda user_id, ap: None)
+            assert stats["listings"] == len(stats["selected"])
+            selected.update(stats["selected"])
+            overflow.update(stats["overflow"])
+
+        assert selected == expected
+        assert overflow - selected
+
+    def test_store_error_leaves_shard_unfinished(self, tmp_path, monkeypatch):
+        """A shard that can't read its users fails instead of finishing with nobody to send to."""
+        cycle = publish(generate_listings(10, seed=5), shards=1, root=tmp_path / "outbox")
+
+        def broken(self):
+            raise sqlite3.OperationalError("database is locked")
+
+        monkeypatch.setattr(UserStore, "active_configs", broken)
+        with pytest.raises(sqlite3.OperationalError):
+            run_shard(cycle, 0, lambda user_id, ap: None)
+        assert incomplete_shards(cycle) == [0]
+
+    def test_shard_does_not_import_env_configs(self, tmp_path, monkeypatch):
+        """USER_CONFIGS is applied by the publisher, not again by every shard."""
+        monkeypatch.setenv("USER_CONFIGS", '{"42": {"max_price": 900000}}')
+        cycle = publish([], shards=1, root=tmp_path / "outbox")
+
+        run_shard(cycle, 0, lambda user_id, ap: None)
+
+        assert user_config._store.get("42") is None
+
+    def test_partial_progress_line_is_ignored(self, tmp_path):
+        cycle = publish([], shards=1, root=tmp_path)
+        (cycle / "shard-0.progress").write_text("a 1\nb 2\nc")
+        assert load_progress(cycle, 0) == {("a", "1"), ("b", "2")}
+
+
+class TestRunCycle:
+    """Tests for the notifier processes."""
+
+    @pytest.fixture
+    def telegram(self, tmp_path, monkeypatch):
+        """Users in ./users.db and a fake Bot API, as the spawned shards see them."""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.delenv("USER_CONFIGS", raising=False)
+        store = UserStore("users.db", defaults=DEFAULT_CONFIG)
+        store.import_configs(dict(generate_user_configs(30, seed=9)))
+        user_configs = store.active_configs()
+        store.close()
+
+        api = FakeTelegram(global_rate=10000, chat_rate=10000)
+        server = start_server(api)
+        monkeypatch.setenv("TELEGRAM_API_BASE", api_base(server))
+        yield api, user_configs
+        server.shutdown()
+        server.server_close()
+
+    def test_processes_deliver_every_selected_match(self, tmp_path, telegram):
+        api, user_configs = telegram
+        listings = generate_listings(40, seed=9)
+        expected = Counter(
+            user_id
+            for _, user_ids in pipeline.iter_top_k(pipeline.iter_matches(listings, user_configs), user_configs)
+            for user_id in user_ids
+        )
+
+        stats = fan_out(listings, "TOKEN", shards=3, root=tmp_path / "outbox")
+
+        assert stats["crashed"] == 0
+        assert stats["sent"] == sum(expected.values())
+        assert Counter(message["chat_id"] for message in api.delivered) == expected
+        assert pending_cycles(tmp_path / "outbox") == []
+
+    def test_resumes_only_unfinished_shards(self, tmp_path, telegram):
+        api, _ = telegram
+        cycle = publish(generate_listings(40, seed=9), shards=2, root=tmp_path / "outbox")
+        fanout._write_json(cycle / "shard-1.done", {"sent": 0, "failed": 0, "skipped": 0})
+
+        stats = run_cycle(cycle, "TOKEN")
+
+        assert stats["crashed"] == 0
+        assert all(shard_of(message["chat_id"], 2) == 0 for message in api.delivered)
+        assert not cycle.exists()
+
+
+    def test_publisher_imports_env_configs(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("USER_CONFIGS", '{"42": {"max_price": 900000}}')
+        context = type("Context", (), {"Process": FailingProcess})
+        monkeypatch.setattr(fanout.multiprocessing, "get_context", lambda method: context)
+
+        run_cycle(publish([], shards=1, root=tmp_path / "outbox"), "TOKEN")
+
+        assert user_config._store.get("42")["max_price"] == 900000
+
+
+class FailingProcess:
+    """Stand-in for a notifier process that crashes before finishing."""
+
+    exitcode = 1
+
+    def __init__(self, target, args, name):
+        self.name = name
+
+    def start(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class TestAttemptCap:
+    """Tests for giving up on cycles that never finish."""
+
+    def test_cycle_dropped_after_max_attempts(self, tmp_path, monkeypatch):
+        context = type("Context", (), {"Process": FailingProcess})
+        monkeypatch.setattr(fanout.multiprocessing, "get_context", lambda method: context)
+        cycle = publish([], shards=1, root=tmp_path)
+
+        for _ in range(fanout.MAX_ATTEMPTS - 1):
+            assert run_cycle(cycle, "TOKEN")["crashed"] == 1
+            assert pending_cycles(tmp_path) == [cycle]
+
+        run_cycle(cycle, "TOKEN")
+        assert pending_cycles(tmp_path) == []
@@ -1,7 +1,16 @@
 """Tests for the filters module."""
 
+import itertools
+import random
+
 import pytest
-from filters import matches
+import filters
+import user_config
+from analyze_listings import match_mask
+from archive import columns_from_listings
+from filters import matches, compile_criteria
+from user_config import get_user_predicate
+from user_store import UserStore
 
 
 class TestMatches:
@@ -171,3 +180,82 @@ class TestMatches:
             "expensas": 0
         }
         assert matches(ap, criteria) is True
+
+
+class TestCompiledCriteria:
+    """compile_criteria must agree with matches() on every listing."""
+
+    ADDRESSES = [None, "", "Calle 7 e/ 45 y 46", "City Bell", "Calle 150 n 1200", "Centro"]
+    CRITERIA = [
+        {"max_price": 600000, "min_rooms": 2, "max_expensas": 100000},
+        {"min_price": 300000, "max_price": 500000, "min_rooms": 1, "max_rooms": 3, "max_expensas": 80000},
+        {"min_price": None, "max_price": 450000, "min_rooms": 2, "max_rooms": None, "max_expensas": 0},
+    ]
+
+    def listings(self):
+        prices = [None, 250000, 300000, 450000, 500000, 600000, 700000]
+        rooms = [None, 1, 2, 3, 4]
+        expensas = [None, 0, 80000, 100000, 150000]
+        for price, room, exp, address in itertools.product(prices, rooms, expensas, self.ADDRESSES):
+            yield {"price": price, "rooms": room, "expensas": exp, "address": address}
+
+    def test_equivalent_to_matches(self):
+        for criteria in self.CRITERIA:
+            predicate = compile_criteria(criteria)
+            for ap in self.listings():
+                assert predicate(ap) is matches(ap, criteria), (ap, criteria)
+
+    def test_equivalent_with_any_check_order(self, monkeypatch):
+        """Reordering by observed rejections never changes the result."""
+        rng = random.Random(0)
+        for _ in range(5):
+            counts = {name: rng.randint(0, 100) for name in filters.rejections}
+            monkeypatch.setattr(filters, "rejections", counts)
+            for criteria in self.CRITERIA:
+                predicate = compile_criteria(criteria)
+                assert all(predicate(ap) is matches(ap, criteria) for ap in self.listings())
+
+    def test_predicate_cached_per_config_version(self):
+        config = dict(self.CRITERIA[0])
+
+        first = get_user_predicate("42", config)
+        assert get_user_predicate("42", dict(config)) is first
+
+        config["max_price"] = 400000
+        assert get_user_predicate("42", config) is not first
+
+    def test_predicate_cache_is_bounded(self, monkeypatch):
+        monkeypatch.setattr(user_config, "MAX_CACHED_PREDICATES", 2)
+        monkeypatch.setattr(user_config, "_predicates", {})
+        for user_id in ("1", "2", "3"):
+            get_user_predicate(user_id, self.CRITERIA[0])
+
+        assert list(user_config._predicates) == ["2", "3"]
+
+
+class TestMatchingRulesAgree:
+    """Every implementation of the matching rules agrees with matches()."""
+
+    def listings(self):
+        for n, ap in enumerate(TestCompiledCriteria().listings()):
+            yield dict(ap, id=str(n))
+
+    def test_all_implementations_agree(self):
+        listings = list(self.listings())
+        data = columns_from_listings(listings)
+        store = UserStore(":memory:")  # No defaults: unset criteria stay NULL
+        try:
+            for user_id, criteria in enumerate(TestCompiledCriteria.CRITERIA):
+                store.upsert(user_id, criteria)
+
+            batch = store.match_batch(listings)
+            for user_id, criteria in enumerate(TestCompiledCriteria.CRITERIA):
+                expected = [matches(ap, criteria) for ap in listings]
+                predicate = compile_criteria(criteria)
+
+                assert [predicate(ap) for ap in listings] == expected
+                assert match_mask(data, criteria).tolist() == expected
+                assert [str(user_id) in store.matching_user_ids(ap) for ap in listings] == expected
+                assert [str(user_id) in batch.get(ap["id"], ()) for ap in listings] == expected
+        finally:
+            store.close()
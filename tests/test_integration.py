@@ -203,7 +203,7 @@ class TestScraperIntegration:
 class TestNotifierIntegration:
     """Test notifier message formatting."""
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_notification_message_content(self, mock_post):
         """Verify notification message contains all required info."""
         from notifier import send_message
@@ -0,0 +1,146 @@
+"""Tests for event loop responsiveness measurements."""
+
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+import latency
+from latency import LoopLagMonitor, handler_summary, percentile, summarize, timed
+from pipeline import arun_pipeline
+
+
+class SlowSource:
+    """Source whose scrape blocks like a real HTTP/browser scrape."""
+
+    name = "slow"
+    label = "Slow"
+    needs_browser = False
+
+    def __init__(self, listings=3, delay=0.1):
+        self.listings = listings
+        self.delay = delay
+
+    def scrape(self, max_pages=None):
+        for n in range(self.listings):
+            time.sleep(self.delay)
+            yield {"id": f"slow_{n}", "price": 100000, "source": "slow", "url": f"u{n}"}
+
+
+async def _measure(coro, interval=0.01):
+    """Run a coroutine while sampling loop lag; return its lag summary."""
+    monitor = LoopLagMonitor(interval=interval)
+    monitor.start()
+    try:
+        await coro
+        await asyncio.sleep(interval * 3)
+    finally:
+        monitor.stop()
+    return monitor.summary()
+
+
+class TestSummaries:
+    """Tests for percentile helpers."""
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([], 0.5) is None
+
+    def test_summarize(self):
+        assert summarize([]) is None
+        assert summarize([3, 1, 2]) == {"count": 3, "p50": 2, "p99": 3, "max": 3}
+
+
+class TestLoopLagMonitor:
+    """Tests for loop lag sampling."""
+
+    def test_detects_blocking_call(self):
+        """A blocking call on the loop shows up as lag."""
+        async def _blocking():
+            await asyncio.sleep(0.03)
+            time.sleep(0.2)
+
+        lag = asyncio.run(_measure(_blocking()))
+        assert lag["max"] >= 150
+
+    def test_summary_resets(self):
+        """Samples are cleared after a summary."""
+        monitor = LoopLagMonitor()
+        monitor.samples.extend([1.0, 2.0])
+        assert monitor.summary()["count"] == 2
+        assert monitor.summary() is None
+
+    def test_pipeline_keeps_loop_responsive(self):
+        """Blocking scrapes run off the loop; lag stays in milliseconds."""
+        received = []
+
+        async def sink(item):
+            received.append(item)
+
+        lag = asyncio.run(_measure(arun_pipeline([SlowSource()], stages=[], sink=sink)))
+
+        assert len(received) == 3
+        assert lag["max"] < 50
+
+
+class TestTimed:
+    """Tests for handler timing."""
+
+    def test_records_duration(self):
+        """Each call's duration is recorded under the handler's name."""
+        handler_summary()  # Reset
+
+        @timed
+        async def ping(update, context):
+            await asyncio.sleep(0.01)
+            return "pong"
+
+        assert asyncio.run(ping(None, None)) == "pong"
+        summary = handler_summary()
+        assert summary["ping"]["count"] == 1
+        assert summary["ping"]["max"] >= 10
+        assert handler_summary() == {}
+
+    def test_records_failures(self):
+        """Calls that raise are timed too."""
+        handler_summary()
+
+        @timed
+        async def broken(update, context):
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            asyncio.run(broken(None, None))
+        assert latency.handler_latency["broken"]
+
+
+class TestCheckCycle:
+    """Tests for the bot's scheduled check."""
+
+    def test_state_io_runs_off_the_loop(self, monkeypatch):
+        """Slow state loading and saving don't block the event loop."""
+        main = pytest.importorskip("main")
+
+        enricher = SimpleNamespace(cache={}, close=lambda: time.sleep(0.1))
+        state = {
+            "sent": set(), "user_store": None, "user_configs": [], "fingerprints": None, "snapshots": None,
+            "enricher": enricher, "archive": None, "schedule": {}, "breakers": {}, "specs": [],
+        }
+
+        def slow_load():
+            time.sleep(0.2)
+            return state
+
+        saved = []
+        monkeypatch.setattr(main, "_load_cycle_state", slow_load)
+        monkeypatch.setattr(main, "_save_cycle_state", lambda s: (time.sleep(0.2), saved.append(s)))
+        monkeypatch.setattr(main, "arun_pipeline", AsyncMock())
+
+        lag = asyncio.run(_measure(main.run_check_cycle(SimpleNamespace(bot=None))))
+
+        assert saved == [state]
+        assert lag["max"] < 50
@@ -0,0 +1,86 @@
+"""Tests for the synthetic load generator."""
+
+from dedup import FingerprintIndex
+from location_filter import is_in_casco_urbano
+from load_test import generate_history, generate_listings, generate_user_configs, profile_cycle
+from ranking import MAX_MATCHES_PER_USER
+
+
+class TestGenerators:
+    """Tests for synthetic listings and users."""
+
+    def test_listings_are_deterministic(self):
+        """Same seed, same listings."""
+        assert generate_listings(50, seed=3) == generate_listings(50, seed=3)
+        assert generate_listings(50, seed=3) != generate_listings(50, seed=4)
+
+    def test_listing_ids_are_unique(self):
+        """Every listing gets its own ID."""
+        listings = generate_listings(500)
+        assert len({ap["id"] for ap in listings}) == 500
+
+    def test_addresses_are_understood(self):
+        """Most addresses are placed inside or outside the casco."""
+        listings = generate_listings(500)
+        known = [ap for ap in listings if is_in_casco_urbano(ap["address"]) is not None]
+        assert len(known) > 0.8 * len(listings)
+
+    def test_duplicates_are_detected(self):
+        """Generated cross-source duplicates are caught by dedup."""
+        listings = generate_listings(300, duplicate_rate=0.3)
+        index = FingerprintIndex()
+        duplicates = 0
+        for ap in listings:
+            if index.find(ap) is not None:
+                duplicates += 1
+            else:
+                index.add(ap)
+        assert duplicates > 0.1 * len(listings)
+
+    def test_user_configs(self):
+        """Only active users are returned, with complete criteria."""
+        user_configs = generate_user_configs(200)
+        assert 0 < len(user_configs) <= 200
+        for _, config in user_configs:
+            assert config["active"]
+            assert config["min_price"] < config["max_price"]
+
+    def test_history(self):
+        """The earlier cycle saw roughly the requested share of listings."""
+        listings = generate_listings(400)
+        sent, store = generate_history(listings, seen_rate=0.5)
+        assert len(sent) == len(store)
+        assert 0.3 * len(listings) < len(sent) < 0.7 * len(listings)
+
+
+class TestProfileCycle:
+    """Tests for the stage driver."""
+
+    def test_reports_every_stage(self):
+        """Each stage is timed and reports its output size."""
+        results = profile_cycle(generate_listings(200), generate_user_configs(50))
+
+        names = [name for name, _, _, _ in results]
+        assert names == ["snapshot_diff", "new", "dedup", "match", "top_k", "notify"]
+        assert results[0][3] == 200
+        assert all(elapsed >= 0 and peak is None for _, elapsed, peak, _ in results)
+
+    def test_trace_memory(self):
+        """Peak memory is reported per stage when tracing."""
+        results = profile_cycle(generate_listings(100), generate_user_configs(20), trace_memory=True)
+        assert all(peak is not None and peak >= 0 for _, _, peak, _ in results)
+
+    def test_top_k_bounds_the_messages(self):
+        """Ranking keeps at most each user's budget of the matches."""
+        user_configs = generate_user_configs(10)
+        results = dict((name, count) for name, _, _, count in
+                       profile_cycle(generate_listings(400), user_configs, seen_rate=0))
+        assert 0 < results["top_k"] <= results["match"]
+        assert results["top_k"] <= len(user_configs) * MAX_MATCHES_PER_USER
+
+    def test_sql_matching(self):
+        """The SQLite matcher reaches the same users as the predicates."""
+        listings, user_configs = generate_listings(200), generate_user_configs(50)
+        predicates = profile_cycle(listings, user_configs)
+        sql = profile_cycle(listings, user_configs, sql=True)
+        assert [count for *_, count in predicates] == [count for *_, count in sql]
@@ -0,0 +1,146 @@
+"""Tests for the logging setup."""
+
+import gzip
+import logging
+
+import pytest
+
+import log_setup
+from log_setup import CompressedRotatingFileHandler, SampledWarningsFilter, setup_logging, stop_logging
+
+
+def make_record(level=logging.WARNING, lineno=10, created=1000.0, msg="card failed"):
+    record = logging.LogRecord("scrappers.zonaprop", level, "zonaprop.py", lineno, msg, None, None)
+    record.created = created
+    return record
+
+
+class TestSampledWarningsFilter:
+    """Tests for warning sampling."""
+
+    def test_burst_then_suppress(self):
+        """Only ``burst`` warnings per call site pass in a window."""
+        sampler = SampledWarningsFilter(period=60, burst=3)
+        passed = [sampler.filter(make_record(created=1000.0 + n)) for n in range(10)]
+        assert passed == [True] * 3 + [False] * 7
+
+    def test_reports_suppressed(self):
+        """The first warning of the next window counts the suppressed ones."""
+        sampler = SampledWarningsFilter(period=60, burst=1)
+        for n in range(4):
+            sampler.filter(make_record(created=1000.0 + n))
+
+        record = make_record(created=1061.0)
+        assert sampler.filter(record)
+        assert "3 similar messages suppressed" in record.getMessage()
+
+    def test_call_sites_are_independent(self):
+        sampler = SampledWarningsFilter(period=60, burst=1)
+        assert sampler.filter(make_record(lineno=10))
+        assert sampler.filter(make_record(lineno=20))
+        assert not sampler.filter(make_record(lineno=10))
+
+    def test_errors_and_info_pass(self):
+        """Only warnings are sampled."""
+        sampler = SampledWarningsFilter(period=60, burst=1)
+        assert sampler.filter(make_record(level=logging.WARNING))
+        assert not sampler.filter(make_record(level=logging.WARNING))
+        for _ in range(3):
+            assert sampler.filter(make_record(level=logging.ERROR))
+            assert sampler.filter(make_record(level=logging.INFO))
+
+
+class TestCompressedRotatingFileHandler:
+    """Tests for rotation and compression."""
+
+    def _emit(self, handler, text):
+        handler.emit(logging.LogRecord("x", logging.INFO, "x.py", 1, text, None, None))
+
+    def test_rotates_on_size_and_compresses(self, tmp_path):
+        log_file = tmp_path / "bot.log"
+        handler = CompressedRotatingFileHandler(str(log_file), max_bytes=100, backups=2, max_age=0)
+        for n in range(10):
+            self._emit(handler, f"line {n} " + "x" * 40)
+        handler.close()
+
+        rotated = tmp_path / "bot.log.1.gz"
+        assert rotated.exists()
+        assert b"line" in gzip.decompress(rotated.read_bytes())
+        assert not (tmp_path / "bot.log.3.gz").exists()
+
+    def test_rotates_on_age(self, tmp_path):
+        log_file = tmp_path / "bot.log"
+        handler = CompressedRotatingFileHandler(str(log_file), max_bytes=0, backups=2, max_age=3600)
+        self._emit(handler, "old")
+        handler.started_at -= 7200
+        self._emit(handler, "new")
+        handler.close()
+
+        assert gzip.decompress((tmp_path / "bot.log.1.gz").read_bytes()).strip() == b"old"
+        assert log_file.read_text().strip() == "new"
+
+    def test_age_read_from_existing_file(self, tmp_path):
+        """A new process appending to an old file rotates it (one-shot cron runs)."""
+        log_file = tmp_path / "cron_job.log"
+        log_file.write_text("2020-01-01 00:00:00,000 - INFO - old\n")
+
+        handler = CompressedRotatingFileHandler(str(log_file), max_bytes=0, backups=2, max_age=3600)
+        self._emit(handler, "new")
+        handler.close()
+
+        assert (tmp_path / "cron_job.log.1.gz").exists()
+        assert log_file.read_text().strip() == "new"
+
+
+class TestSetupLogging:
+    """Tests for the queue-based root logger."""
+
+    @pytest.fixture
+    def root_logging(self):
+        root = logging.getLogger()
+        handlers, level = list(root.handlers), root.level
+        logging.disable(logging.NOTSET)
+        yield
+        stop_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in handlers:
+            root.addHandler(handler)
+        root.setLevel(level)
+        logging.disable(logging.CRITICAL)
+
+    def test_records_reach_file(self, tmp_path, root_logging):
+        log_file = tmp_path / "cron_job.log"
+        setup_logging(str(log_file))
+
+        logging.getLogger("test").info("hello %s", "world")
+        stop_logging()
+
+        assert "INFO - hello world" in log_file.read_text()
+
+    def test_lazy_args_not_formatted_below_level(self, tmp_path, root_logging):
+        """Debug records are dropped before their arguments are formatted."""
+        setup_logging(str(tmp_path / "bot.log"))
+
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted")
+
+        logging.getLogger("test").debug("%s", Exploding())
+        stop_logging()
+
+    def test_mutable_args_logged_as_at_call(self, tmp_path, root_logging):
+        log_file = tmp_path / "bot.log"
+        setup_logging(str(log_file))
+
+        listing = {"price": 1}
+        logging.getLogger("test").info("listing %s", listing)
+        listing["price"] = 2
+        stop_logging()
+
+        assert "listing {'price': 1}" in log_file.read_text()
+
+    def test_replaces_previous_listener(self, tmp_path, root_logging):
+        setup_logging(str(tmp_path / "a.log"))
+        listener = setup_logging(str(tmp_path / "b.log"))
+        assert log_setup._listener is listener
@@ -0,0 +1,60 @@
+"""Tests for the memory and shared HTTP session helpers."""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import http_session
+import memory
+
+linux_only = pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+
+
+class TestMemory:
+    """Tests for RSS sampling from /proc."""
+
+    @linux_only
+    def test_process_rss(self):
+        assert memory.process_rss_mb() > 0
+
+    def test_missing_process(self):
+        assert memory.process_rss_mb(pid=-1) is None
+
+    @linux_only
+    def test_no_browser_running(self):
+        """Without Chromium children the browser footprint is zero."""
+        assert memory.chromium_rss_mb() == 0
+
+    @linux_only
+    def test_descendants(self):
+        """Child processes are found by walking parent PIDs."""
+        import subprocess
+
+        child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(5)"])
+        try:
+            assert child.pid in memory.descendant_pids()
+        finally:
+            child.kill()
+            child.wait()
+
+
+class TestHttpSession:
+    """Tests for the shared keep-alive session."""
+
+    def test_falls_back_to_requests(self):
+        with patch("requests.get") as mock_get:
+            http_session.get("https://example.com", timeout=1)
+        mock_get.assert_called_once_with("https://example.com", timeout=1)
+
+    def test_session_reused(self):
+        http_session.use_session()
+        try:
+            with patch.object(http_session._session, "get") as mock_get:
+                http_session.get("https://example.com")
+                http_session.get("https://example.com")
+            assert mock_get.call_count == 2
+        finally:
+            http_session.use_session(False)
+        assert http_session._session is None
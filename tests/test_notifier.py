@@ -19,7 +19,7 @@ class TestSendMessage:
             "url": "https://www.argenprop.com/depto-test"
         }
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_successful_send(self, mock_post, sample_apartment):
         """Successful message send should return API response."""
         mock_response = Mock()
@@ -32,7 +32,7 @@ class TestSendMessage:
         assert result["ok"] is True
         mock_post.assert_called_once()
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_message_format(self, mock_post, sample_apartment):
         """Message should be formatted correctly with HTML."""
         mock_response = Mock()
@@ -52,7 +52,7 @@ class TestSendMessage:
         assert "2 ambientes" in payload["text"]
         assert sample_apartment["url"] in payload["text"]
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_api_url_format(self, mock_post, sample_apartment):
         """API URL should include the bot token."""
         mock_response = Mock()
@@ -68,7 +68,7 @@ class TestSendMessage:
         assert "my_bot_token" in url
         assert "sendMessage" in url
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_retry_on_request_exception(self, mock_post, sample_apartment):
         """Should retry on request exceptions."""
         mock_post.side_effect = [
@@ -83,7 +83,7 @@ class TestSendMessage:
         assert result["ok"] is True
         assert mock_post.call_count == 3
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_raises_after_max_retries(self, mock_post, sample_apartment):
         """Should raise exception after exhausting retries."""
         mock_post.side_effect = requests.exceptions.ConnectionError("Connection failed")
@@ -94,7 +94,7 @@ class TestSendMessage:
 
         assert mock_post.call_count == 3
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_telegram_api_error(self, mock_post, sample_apartment):
         """Should raise exception on Telegram API error response."""
         mock_response = Mock()
@@ -108,7 +108,7 @@ class TestSendMessage:
         assert "Telegram API error" in str(excinfo.value)
         assert "chat not found" in str(excinfo.value)
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_handles_missing_fields(self, mock_post):
         """Should handle apartment with missing fields gracefully."""
         mock_response = Mock()
@@ -125,7 +125,7 @@ class TestSendMessage:
         payload = call_args[1]["json"]
         assert "N/A" in payload["text"]  # Should show N/A for missing fields
 
-    @patch('notifier.requests.post')
+    @patch('requests.post')
     def test_timeout_parameter(self, mock_post, sample_apartment):
         """Should pass timeout to requests."""
         mock_response = Mock()
@@ -0,0 +1,195 @@
+"""Tests for reading listings from structured page data."""
+
+import json
+
+import pytest
+
+import fake_sites
+from fake_sites import FakeSites, make_listing, render
+from scrappers import mercadolibre, zonaprop
+from scrappers.page_state import PARSE_PATHS, ResponseCapture, assigned_json, script_json, to_int
+
+
+class FakeResponse:
+    def __init__(self, url, payload, ok=True):
+        self.url = url
+        self.ok = ok
+        self._body = json.dumps(payload).encode()
+
+    def body(self):
+        return self._body
+
+
+class FakePage:
+    """Serves the stand-in sites' result pages; has no cards to query."""
+
+    def __init__(self, sites, source):
+        self.sites = sites
+        self.source = source
+        self.html = ""
+        self.url = ""
+        self.listeners = []
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+    def goto(self, url, **kwargs):
+        path = url.split("/" + self.source, 1)[1]
+        _, self.html, _ = render(self.sites, self.source, path, "", f"http://x/{self.source}")
+        self.url = url
+
+    def title(self):
+        return "Departamentos en alquiler"
+
+    def content(self):
+        return self.html
+
+    def wait_for_timeout(self, ms):
+        pass
+
+    def wait_for_load_state(self, *args, **kwargs):
+        pass
+
+    def wait_for_selector(self, *args, **kwargs):
+        pass
+
+    def query_selector_all(self, selector):
+        return []
+
+
+@pytest.fixture
+def fake_page(monkeypatch):
+    """Run a scraper on a FakePage; returns (page, listings)."""
+    PARSE_PATHS.clear()
+
+    def _scrape(module, source, max_pages=2, **options):
+        page = FakePage(FakeSites(churn=0, **options), source)
+        monkeypatch.setattr(module, "get_page", lambda name: page)
+        monkeypatch.setattr(module, "release_page", lambda name, **kwargs: None)
+        monkeypatch.setattr(module, "SEARCH_BASE", module.SEARCH_BASE.replace(module.BASE_URL, f"http://x/{source}"))
+        scrape = getattr(module, f"_scrape_{source}_sync")
+        return page, scrape(max_pages, 0)
+
+    return _scrape
+
+
+class TestDecoding:
+    """Tests for finding payloads in pages."""
+
+    def test_assigned_json(self):
+        html = '<script>window.__PRELOADED_STATE__ = {"a": [1, "};"]};\nwindow.other = 1;</script>'
+        assert assigned_json(html, "window.__PRELOADED_STATE__") == {"a": [1, "};"]}
+        assert assigned_json("<html></html>", "window.__PRELOADED_STATE__") is None
+        assert assigned_json("window.__PRELOADED_STATE__ = {broken", "window.__PRELOADED_STATE__") is None
+
+    def test_script_json(self):
+        html = '<script type="application/json" id="__PRELOADED_STATE__">{"a": 1}</script>'
+        assert script_json(html, "__PRELOADED_STATE__") == {"a": 1}
+        assert script_json(html, "other") is None
+
+    @pytest.mark.parametrize("value,expected", [
+        (450000, 450000), (450000.5, 450000), ("450.000", 450000), ("450.000,50", 450000),
+        ("", None), (None, None), (True, None), ({}, None),
+    ])
+    def test_to_int(self, value, expected):
+        assert to_int(value) == expected
+
+    def test_response_capture(self):
+        capture = ResponseCapture("/rplis-api/postings")
+        capture(FakeResponse("https://x/rplis-api/postings", {"listPostings": []}))
+        capture(FakeResponse("https://x/other", {"x": 1}))
+        capture(FakeResponse("https://x/rplis-api/postings?p=2", {}, ok=False))
+
+        assert capture.take() == [{"listPostings": []}]
+        assert capture.take() == []
+
+
+class TestZonaProp:
+    """Tests for ZonaProp postings."""
+
+    def test_posting_fields(self):
+        posting = {
+            "postingId": "58127503",
+            "url": "/propiedades/depto-58127503.html",
+            "priceOperationTypes": [{"prices": [{"amount": 450000, "currency": "$"}]}],
+            "expenses": {"amount": 50000, "currency": "$"},
+            "mainFeatures": {"CFT2": {"label": "Dormitorios", "value": "2"}},
+            "postingLocation": {"address": {"name": "Calle 7 1200"}, "location": {"name": "La Plata"}},
+        }
+        assert zonaprop.parse_posting(posting) == {
+            "id": "zonaprop_58127503",
+            "price": 450000,
+            "rooms": 3,
+            "expensas": 50000,
+            "address": "Calle 7 1200, La Plata",
+            "url": zonaprop.BASE_URL + "/propiedades/depto-58127503.html",
+            "source": "zonaprop",
+        }
+
+    def test_usd_only_posting_is_skipped(self):
+        posting = {"postingId": "1", "priceOperationTypes": [{"prices": [{"amount": 500, "currency": "USD"}]}]}
+        assert zonaprop.parse_posting(posting) is None
+
+    def test_api_payload_wins_over_page_state(self):
+        html = 'window.__PRELOADED_STATE__ = {"listStore": {"listPostings": [{"postingId": "1"}]}};'
+        assert zonaprop.structured_postings(html, [{"listPostings": [{"postingId": "2"}]}]) == [{"postingId": "2"}]
+        assert zonaprop.structured_postings(html) == [{"postingId": "1"}]
+        assert zonaprop.structured_postings("<html></html>") is None
+
+    def test_scrape_reads_page_state(self, fake_page):
+        page, listings = fake_page(zonaprop, "zonaprop")
+
+        newest = make_listing("zonaprop", fake_sites.INITIAL_LISTINGS - 1)
+        assert len(listings) == 2 * fake_sites.PER_PAGE["zonaprop"]
+        assert listings[0]["id"] == f"zonaprop_{newest['id']}"
+        assert (listings[0]["price"], listings[0]["rooms"]) == (newest["price"], newest["rooms"])
+        assert listings[0]["address"] == newest["address"]
+        assert PARSE_PATHS == {("zonaprop", "json"): 2}
+        assert page.listeners == []  # The warm page doesn't keep the capture
+
+    def test_scrape_falls_back_to_cards(self, fake_page):
+        _, listings = fake_page(zonaprop, "zonaprop", embedded_state=False)
+        assert listings == []  # FakePage has no cards to query
+        assert PARSE_PATHS == {("zonaprop", "dom"): 1}
+
+
+class TestMercadoLibre:
+    """Tests for MercadoLibre search results."""
+
+    def test_result_fields(self):
+        result = {"polycard": {
+            "metadata": {"id": "MLA123", "url": "departamento.mercadolibre.com.ar/MLA-123-depto-_JM"},
+            "components": [
+                {"type": "price", "price": {"current_price": {"value": 380000, "currency": "ARS"}}},
+                {"type": "attributes_list", "attributes_list": {"texts": ["1 dormitorio", "40 m² cubiertos"]}},
+                {"type": "location", "location": {"text": " 7 e/ 45 y 46, La Plata "}},
+            ],
+        }}
+        assert mercadolibre.parse_result(result) == {
+            "id": "mercadolibre_MLA-123",
+            "price": 380000,
+            "rooms": 2,
+            "expensas": None,
+            "address": "7 e/ 45 y 46, La Plata",
+            "url": "https://departamento.mercadolibre.com.ar/MLA-123-depto-_JM",
+            "source": "mercadolibre",
+        }
+
+    def test_usd_result_is_skipped(self):
+        result = {"polycard": {
+            "metadata": {"id": "MLA1", "url": "https://x/MLA-1"},
+            "components": [{"type": "price", "price": {"current_price": {"value": 500, "currency": "USD"}}}],
+        }}
+        assert mercadolibre.parse_result(result) is None
+
+    def test_scrape_reads_page_state(self, fake_page):
+        _, listings = fake_page(mercadolibre, "mercadolibre", max_pages=1)
+
+        newest = make_listing("mercadolibre", fake_sites.INITIAL_LISTINGS - 1)
+        assert len(listings) == fake_sites.PER_PAGE["mercadolibre"]
+        assert listings[0]["id"] == f"mercadolibre_MLA-{newest['id']}"
+        assert (listings[0]["price"], listings[0]["rooms"]) == (newest["price"], newest["rooms"])
+        assert PARSE_PATHS == {("mercadolibre", "json"): 1}
@@ -0,0 +1,276 @@
+"""Tests for the pipeline engine and its lazy stages."""
+
+import asyncio
+import pytest
+from functools import partial
+from unittest.mock import patch, Mock
+
+import pipeline
+from pipeline import (
+    run_pipeline, arun_pipeline, scrape_stream, iter_new, iter_matches, notify_sink
+)
+from sources import SOURCES
+
+
+def make_listing(listing_id, source="argenprop", price=450000):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": 2,
+        "expensas": 70000,
+        "url": f"https://example.com/{listing_id}",
+        "source": source
+    }
+
+
+@pytest.fixture
+def criteria():
+    """Default test criteria."""
+    return {
+        "max_price": 600000,
+        "min_rooms": 2,
+        "max_expensas": 100000
+    }
+
+
+class TestStages:
+    """Tests for the individual stages."""
+
+    def test_iter_new_skips_and_marks_seen(self):
+        """Only unseen listings are yielded, and they are added to the set."""
+        sent = {"a"}
+        result = list(iter_new([make_listing("a"), make_listing("b"), make_listing("b")], sent))
+
+        assert [ap["id"] for ap in result] == ["b"]
+        assert sent == {"a", "b"}
+
+    def test_iter_matches(self, criteria):
+        """Each listing is paired with the users it matches."""
+        cheap_only = dict(criteria, max_price=400000)
+        user_configs = [("1", criteria), ("2", cheap_only)]
+
+        result = list(iter_matches([make_listing("a", price=450000)], user_configs))
+
+        assert result[0][1] == ["1"]
+
+    def test_iter_new_without_marking(self):
+        """With mark_seen=False the seen set is left untouched."""
+        sent = set()
+        result = list(iter_new([make_listing("a")], sent, mark_seen=False))
+
+        assert len(result) == 1
+        assert sent == set()
+
+    def test_per_user_source_limit(self, criteria):
+        """Each user gets at most the limit of matches per source."""
+        listings = [make_listing("a1"), make_listing("a2"), make_listing("z1", source="zonaprop")]
+        result = list(iter_matches(listings, [("1", criteria)], per_user_source_limit=1))
+
+        assert [user_ids for _, user_ids in result] == [["1"], [], ["1"]]
+
+
+class FakeSource:
+    """Stand-in for a SourceSpec that yields prepared listings."""
+
+    def __init__(self, name, ids, needs_browser=False, started=None):
+        self.name = name
+        self.label = name
+        self.needs_browser = needs_browser
+        self.ids = ids
+        self.started = started if started is not None else []
+
+    def scrape(self, max_pages=None):
+        self.started.append(self.name)
+        for listing_id in self.ids:
+            yield make_listing(listing_id, source=self.name)
+
+
+class TestEngine:
+    """Tests for the pipeline engine."""
+
+    @pytest.fixture(autouse=True)
+    def no_browser(self, monkeypatch):
+        monkeypatch.setattr(pipeline, "close_browser_if_loaded", Mock())
+
+    def test_sequential_is_lazy(self):
+        """A source is not started until the previous one is exhausted."""
+        started = []
+        specs = [FakeSource("a", ["a1"], started=started), FakeSource("b", ["b1"], started=started)]
+
+        stream = scrape_stream(specs)
+
+        assert next(stream)["id"] == "a1"
+        assert started == ["a"]
+        assert next(stream)["id"] == "b1"
+        assert started == ["a", "b"]
+
+    def test_threaded_yields_all(self):
+        """The threaded policy merges every source's listings."""
+        specs = [
+            FakeSource("a", ["a1", "a2"]),
+            FakeSource("b", ["b1"]),
+            FakeSource("z", ["z1"], needs_browser=True),
+        ]
+
+        ids = {ap["id"] for ap in scrape_stream(specs, policy="threaded")}
+
+        assert ids == {"a1", "a2", "b1", "z1"}
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            scrape_stream([], policy="magic")
+
+    def test_failing_source_does_not_stop_cycle(self):
+        """A scraper error is logged and the next source still runs."""
+        class Broken(FakeSource):
+            def scrape(self, max_pages=None):
+                raise RuntimeError("blocked")
+                yield
+
+        specs = [Broken("a", []), FakeSource("b", ["b1"])]
+
+        assert [ap["id"] for ap in scrape_stream(specs)] == ["b1"]
+
+    def test_browser_closed_after_last_browser_source(self):
+        """The browser is released once the browser sources are done."""
+        specs = [FakeSource("z", ["z1"], needs_browser=True), FakeSource("a", ["a1"])]
+
+        stream = scrape_stream(specs)
+        next(stream)
+        pipeline.close_browser_if_loaded.assert_not_called()
+        next(stream)
+        pipeline.close_browser_if_loaded.assert_called_once()
+
+    def test_run_pipeline_notifies(self, criteria):
+        """run_pipeline sends new matching listings to the sink."""
+        sent_to = []
+        stats = {}
+        seen = {"a1"}
+
+        run_pipeline(
+            [FakeSource("a", ["a1", "a2"])],
+            stages=[partial(iter_new, sent=seen), partial(iter_matches, user_configs=[("1", criteria)])],
+            sink=notify_sink(lambda user_id, ap: sent_to.append((user_id, ap["id"])), stats),
+        )
+
+        assert sent_to == [("1", "a2")]
+        assert stats == {"listings": 1, "sent": 1, "failed": 0}
+
+    def test_arun_pipeline(self, criteria):
+        """The async policy awaits the sink for every item."""
+        received = []
+
+        async def sink(item):
+            received.append(item[0]["id"])
+
+        asyncio.run(arun_pipeline(
+            [FakeSource("a", ["a1", "a2"])],
+            stages=[partial(iter_matches, user_configs=[("1", criteria)])],
+            sink=sink,
+        ))
+
+        assert received == ["a1", "a2"]
+
+
+class TestSourceSpec:
+    """Tests for the source registry declarations."""
+
+    def test_extract_id_matches_scrapers(self):
+        """IDs built from URLs use the same format as the scrapers."""
+        assert SOURCES["argenprop"].extract_id("/departamento-en-alquiler--18809927") == "argenprop_18809927"
+        assert SOURCES["zonaprop"].extract_id("https://www.zonaprop.com.ar/propiedades/x-58127503.html") == "zonaprop_58127503"
+        assert SOURCES["mercadolibre"].extract_id("https://departamento.mercadolibre.com.ar/MLA-123-x") == "mercadolibre_MLA-123"
+        assert SOURCES["inmobusqueda"].extract_id("https://www.inmobusqueda.com.ar/ficha?id=42") == "inmobusqueda_42"
+
+    def test_capabilities(self):
+        assert SOURCES["zonaprop"].needs_browser is True
+        assert SOURCES["argenprop"].needs_browser is False
+        assert all(spec.default_pages >= 1 for spec in SOURCES.values())
+
+
+class TestStreamingScrapers:
+    """Tests for the generator-based scraper API."""
+
+    @patch('scrappers.argenprop.time.sleep')
+    @patch('scrappers.argenprop.requests.get')
+    def test_argenprop_yields_before_next_page(self, mock_get, mock_sleep):
+        """Page 1 listings are yielded before page 2 is requested."""
+        from scrappers.argenprop import iter_argenprop
+
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = """
+        <div class="listing__item">
+            <a href="/departamento/depto--1"><div class="card__price">$450.000+ $70.000 expensas</div></a>
+            <span>2 amb</span>
+        </div>
+        """
+        mock_response.raise_for_status = Mock()
+        mock_get.return_value = mock_response
+
+        stream = iter_argenprop(max_pages=3, delay=0)
+        first = next(stream)
+
+        assert first["id"] == "argenprop_1"
+        assert mock_get.call_count == 1
+
+    def test_stream_in_browser_thread(self):
+        """Listings emitted in the browser thread are yielded in order."""
+        from scrappers.browser_manager import stream_in_browser_thread
+
+        def fake_scrape(count, on_listing=None):
+            for i in range(count):
+                on_listing(make_listing(str(i)))
+
+        result = list(stream_in_browser_thread(fake_scrape, 3))
+
+        assert [ap["id"] for ap in result] == ["0", "1", "2"]
+
+    def test_stream_in_browser_thread_reraises(self):
+        """Errors in the browser thread are raised by the consumer."""
+        from scrappers.browser_manager import stream_in_browser_thread
+
+        def failing_scrape(on_listing=None):
+            on_listing(make_listing("0"))
+            raise RuntimeError("boom")
+
+        stream = stream_in_browser_thread(failing_scrape)
+        assert next(stream)["id"] == "0"
+        with pytest.raises(RuntimeError):
+            next(stream)
+
+    def test_closed_stream_stops_the_browser_scrape(self, monkeypatch):
+        """A consumer that stops early cancels the scrape and frees the browser thread."""
+        from scrappers import browser_manager
+
+        monkeypatch.setattr(browser_manager, "STREAM_QUEUE_SIZE", 2)
+        emitted = []
+
+        def endless_scrape(on_listing=None):
+            for i in range(10000):
+                try:
+                    on_listing(make_listing(str(i)))
+                except Exception:
+                    pass  # Scrapers swallow per-page errors; cancellation must get through
+                emitted.append(i)
+
+        stream = browser_manager.stream_in_browser_thread(endless_scrape)
+        assert next(stream)["id"] == "0"
+        stream.close()
+
+        assert browser_manager._executor.submit(lambda: "free").result(timeout=5) == "free"
+        assert len(emitted) < 10
+
+    def test_timed_out_stream_stops_the_browser_scrape(self):
+        """A timeout cancels a scrape that is blocked on a full queue."""
+        from scrappers import browser_manager
+
+        def endless_scrape(on_listing=None):
+            while True:
+                on_listing(make_listing("0"))
+
+        stream = browser_manager.stream_in_browser_thread(endless_scrape, timeout=0.2)
+        with pytest.raises(TimeoutError):
+            list(stream)
+
+        assert browser_manager._executor.submit(lambda: "free").result(timeout=5) == "free"
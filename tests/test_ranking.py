@@ -0,0 +1,146 @@
+"""Tests for per-user top-k ranking of matches."""
+
+import pytest
+
+from pipeline import iter_top_k
+from ranking import score_match, user_budget
+
+
+def make_listing(listing_id, price=400000, rooms=2, expensas=50000, address="Calle 7 1200", source="argenprop"):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": rooms,
+        "expensas": expensas,
+        "address": address,
+        "source": source,
+    }
+
+
+@pytest.fixture
+def config():
+    return {"max_price": 600000, "min_rooms": 2, "max_expensas": 100000}
+
+
+class TestScore:
+    """Tests for score_match."""
+
+    def test_cheaper_scores_higher(self, config):
+        assert score_match(make_listing("a", price=300000), config) > score_match(make_listing("b", price=500000), config)
+
+    def test_more_rooms_for_the_price_scores_higher(self, config):
+        assert score_match(make_listing("a", rooms=3), config) > score_match(make_listing("b", rooms=2), config)
+
+    def test_location_confidence(self, config):
+        inside = score_match(make_listing("a", address="Calle 7 1200"), config)
+        unknown = score_match(make_listing("b", address=""), config)
+        outside = score_match(make_listing("c", address="City Bell"), config)
+        assert inside > unknown > outside
+
+    def test_unknown_expensas_counts_as_half_the_max(self, config):
+        assert score_match(make_listing("a", expensas=None), config) == score_match(make_listing("b", expensas=50000), config)
+
+    def test_user_budget(self):
+        assert user_budget({}, default=8) == 8
+        assert user_budget({"max_per_cycle": 3}, default=8) == 3
+        assert user_budget({"max_per_cycle": 0}, default=8) == 0
+
+
+class TestTopK:
+    """Tests for iter_top_k."""
+
+    def test_keeps_best_matches_in_original_order(self, config):
+        prices = [500000, 200000, 450000, 300000, 550000]
+        matches = [(make_listing(f"l{n}", price=price), [1]) for n, price in enumerate(prices)]
+
+        result = list(iter_top_k(matches, [(1, config)], k=2))
+
+        assert [ap["id"] for ap, _ in result] == ["l1", "l3"]
+
+    def test_selection_is_per_user(self, config):
+        cheap, mid, dear = (make_listing(n, price=p) for n, p in (("cheap", 200000), ("mid", 400000), ("dear", 550000)))
+        configs = [(1, config), (2, {**config, "max_per_cycle": 3})]
+        matches = [(dear, [1, 2]), (mid, [1, 2]), (cheap, [2])]
+
+        result = {ap["id"]: user_ids for ap, user_ids in iter_top_k(matches, configs, k=1)}
+
+        assert result == {"dear": [2], "mid": [1, 2], "cheap": [2]}
+
+    def test_ties_keep_earlier_listing(self, config):
+        matches = [(make_listing(f"l{n}"), [1]) for n in range(4)]
+        result = list(iter_top_k(matches, [(1, config)], k=2))
+        assert [ap["id"] for ap, _ in result] == ["l0", "l1"]
+
+    def test_overflow_and_unknown_users(self, config):
+        overflow = []
+        matches = [
+            (make_listing("a", price=200000), [1]),
+            (make_listing("b", price=500000), [1, 99]),  # 99 registered mid-cycle
+            (make_listing("c"), []),
+        ]
+
+        result = list(iter_top_k(matches, [(1, config)], k=1, overflow=overflow))
+
+        assert [ap["id"] for ap, _ in result] == ["a"]
+        assert [ap["id"] for ap in overflow] == ["b"]
+
+    def test_zero_budget_mutes_user(self, config):
+        matches = [(make_listing("a"), [1])]
+        assert list(iter_top_k(matches, [(1, {**config, "max_per_cycle": 0})])) == []
+
+    def test_source_matches_emitted_when_source_ends(self, config):
+        """A source's picks come out before the next source is consumed."""
+        consumed = []
+
+        def matches():
+            for n, source in enumerate(["argenprop", "argenprop", "zonaprop", "zonaprop"]):
+                consumed.append(n)
+                yield make_listing(f"l{n}", source=source), [1]
+
+        stream = iter_top_k(matches(), [(1, config)], k=4, sources=2)
+
+        first, _ = next(stream)
+        assert first["id"] == "l0"
+        assert consumed == [0, 1, 2]
+        assert len(list(stream)) == 3
+
+    def test_sources_share_the_budget(self, config):
+        """The first source may use half the budget; later ones keep the rest."""
+        listings = [make_listing(f"a{n}", price=300000) for n in range(4)]
+        listings += [make_listing(f"z{n}", price=200000, source="zonaprop") for n in range(4)]
+
+        result = list(iter_top_k([(ap, [1]) for ap in listings], [(1, config)], k=4, sources=2))
+
+        assert [ap["id"] for ap, _ in result] == ["a0", "a1", "z0", "z1"]
+
+    def test_interleaved_sources_keep_their_share(self, config):
+        """Reordered listings don't let a source that comes back take more than its share."""
+        listings = [
+            make_listing("a0", price=300000),
+            make_listing("z0", price=300000, source="zonaprop"),
+            *(make_listing(f"a{n}", price=200000 + n) for n in range(1, 5)),
+            make_listing("z1", price=250000, source="zonaprop"),
+            make_listing("z2", price=240000, source="zonaprop"),
+        ]
+        overflow = []
+
+        result = list(iter_top_k([(ap, [1]) for ap in listings], [(1, config)], k=4, sources=2, overflow=overflow))
+
+        picks = [ap["id"] for ap, _ in result]
+        assert picks == ["a0", "z0", "a1", "z2"]
+        assert sorted(ap["id"] for ap in overflow) == ["a2", "a3", "a4", "z1"]
+
+    def test_window_bounds_buffered_matches(self, config):
+        """Full windows are ranked and emitted without waiting for the rest."""
+        consumed = []
+
+        def matches():
+            for n in range(10):
+                consumed.append(n)
+                yield make_listing(f"l{n}"), [1]
+
+        stream = iter_top_k(matches(), [(1, config)], k=10, window=3)
+
+        next(stream)
+        assert consumed == [0, 1, 2]
+        assert len(list(stream)) == 9
@@ -0,0 +1,120 @@
+"""Tests for the adaptive polling scheduler."""
+
+import pytest
+
+from scheduler import (
+    choose_interval, is_due, record_poll, ScheduledSource, scheduled_sources,
+    cycle_lock, MIN_INTERVAL, MAX_INTERVAL, DEFAULT_INTERVAL
+)
+
+
+class FakeSpec:
+    """Stand-in for a SourceSpec yielding prepared IDs and counting pulls."""
+
+    def __init__(self, name, ids):
+        self.name = name
+        self.label = name
+        self.needs_browser = False
+        self.ids = ids
+        self.pulled = 0
+
+    def scrape(self, max_pages=None):
+        for listing_id in self.ids:
+            self.pulled += 1
+            yield {"id": listing_id, "source": self.name}
+
+
+class TestChooseInterval:
+    """Tests for choose_interval."""
+
+    def test_busy_source_hits_minimum(self):
+        assert choose_interval(50) == MIN_INTERVAL
+
+    def test_quiet_source_hits_maximum(self):
+        assert choose_interval(0.01) == MAX_INTERVAL
+        assert choose_interval(0) == MAX_INTERVAL
+
+    def test_in_between(self):
+        """One new listing per hour means polling hourly."""
+        assert choose_interval(1.0) == 3600
+
+
+class TestRecordPoll:
+    """Tests for record_poll."""
+
+    def test_first_poll_uses_default_interval(self):
+        schedule = {}
+        record_poll(schedule, "a", ["1", "2"], now=1000)
+
+        assert schedule["a"]["interval"] == DEFAULT_INTERVAL
+        assert schedule["a"]["next_run"] == 1000 + DEFAULT_INTERVAL
+
+    def test_rate_from_new_ids(self):
+        """Two new IDs over two hours is a rate of one per hour."""
+        schedule = {}
+        record_poll(schedule, "a", ["1", "2"], now=0)
+        new_count = record_poll(schedule, "a", ["4", "3", "1", "2"], now=7200)
+
+        assert new_count == 2
+        assert schedule["a"]["rate"] == pytest.approx(1.0)
+        assert schedule["a"]["interval"] == 3600
+
+    def test_empty_poll_retries_soon(self):
+        """A failed or empty poll does not change the rate."""
+        schedule = {}
+        record_poll(schedule, "a", ["1"], now=0)
+        record_poll(schedule, "a", [], now=100)
+
+        assert "rate" not in schedule["a"]
+        assert schedule["a"]["next_run"] == 100 + MIN_INTERVAL
+
+    def test_is_due(self):
+        schedule = {"a": {"next_run": 500}}
+        assert is_due(schedule, "a", now=499) is False
+        assert is_due(schedule, "a", now=500) is True
+        assert is_due(schedule, "b", now=0) is True
+
+
+class TestScheduledSource:
+    """Tests for the poll bookkeeping wrapper."""
+
+    def test_unchanged_source_is_scraped_in_full(self):
+        """The page is already fetched, so known IDs do not cut it short."""
+        spec = FakeSpec("a", ["1", "2", "3", "4", "5"])
+        schedule = {"a": {"known_ids": ["1", "2", "3", "4", "5"], "last_run": 0}}
+
+        result = list(ScheduledSource(spec, schedule).scrape())
+
+        assert len(result) == 5
+        assert schedule["a"]["rate"] == 0
+
+    def test_full_scrape_when_changed(self):
+        spec = FakeSpec("a", ["new", "1", "2", "3", "4"])
+        schedule = {"a": {"known_ids": ["1", "2", "3", "4"], "last_run": 0}}
+
+        result = list(ScheduledSource(spec, schedule).scrape())
+
+        assert len(result) == 5
+        assert schedule["a"]["known_ids"][0] == "new"
+
+    def test_only_due_sources(self):
+        specs = [FakeSpec("a", []), FakeSpec("b", [])]
+        schedule = {"a": {"next_run": 10_000}}
+
+        due = scheduled_sources(specs, schedule, now=0)
+
+        assert [source.name for source in due] == ["b"]
+
+
+class TestCycleLock:
+    """Tests for overlap protection."""
+
+    def test_second_cycle_is_rejected(self, tmp_path):
+        lock_path = tmp_path / "cycle.lock"
+        with cycle_lock(lock_path) as first:
+            with cycle_lock(lock_path) as second:
+                assert first is True
+                assert second is False
+
+        with cycle_lock(lock_path) as again:
+            assert again is True
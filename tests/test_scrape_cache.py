@@ -0,0 +1,218 @@
+"""Tests for the shared scrape cache."""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from dedup import FingerprintIndex
+from pipeline import arun_pipeline, run_pipeline
+from scrape_cache import ScrapeCache, cached_sources
+
+
+class CountingSource:
+    """Source that counts its scrapes."""
+
+    name = "counting"
+    label = "Counting"
+    needs_browser = False
+
+    def __init__(self, listings=3, delay=0.0, error=None):
+        self.listings = listings
+        self.delay = delay
+        self.error = error
+        self.scrapes = 0
+
+    def scrape(self, max_pages=None):
+        self.scrapes += 1
+        for n in range(self.listings):
+            time.sleep(self.delay)
+            yield {"id": f"counting_{n}", "price": 100000, "source": "counting", "url": f"u{n}"}
+        if self.error:
+            raise self.error
+
+
+def collect(specs):
+    results = []
+    run_pipeline(specs, stages=[], sink=results.append)
+    return results
+
+
+class TestScrapeCache:
+    """Tests for TTL caching."""
+
+    def test_fresh_scrape_is_reused(self):
+        source, cache = CountingSource(), ScrapeCache(ttl=60)
+
+        first = collect(cached_sources([source], cache))
+        second = collect(cached_sources([source], cache))
+
+        assert source.scrapes == 1
+        assert first == second and len(first) == 3
+        assert cache.stats == {"misses": 1, "hits": 1}
+
+    def test_cached_listings_are_copies(self):
+        source, cache = CountingSource(), ScrapeCache(ttl=60)
+        collect(cached_sources([source], cache))
+        collect(cached_sources([source], cache))[0]["price"] = 1
+        assert cache.fresh("counting")[0]["price"] == 100000
+
+    def test_expired_scrape_is_repeated(self):
+        source, cache = CountingSource(), ScrapeCache(ttl=60)
+        collect(cached_sources([source], cache))
+        cache.entries["counting"] = (time.time() - 61, cache.entries["counting"][1])
+
+        collect(cached_sources([source], cache))
+        assert source.scrapes == 2
+
+    def test_refresh_always_scrapes_and_stores(self):
+        """The scheduled check scrapes anyway and fills the cache for /run."""
+        source, cache = CountingSource(), ScrapeCache(ttl=60)
+        collect(cached_sources([source], cache, refresh=True))
+        collect(cached_sources([source], cache, refresh=True))
+        collect(cached_sources([source], cache))
+        assert source.scrapes == 2
+
+    def test_failed_scrape_is_not_cached(self):
+        source, cache = CountingSource(error=RuntimeError("blocked")), ScrapeCache(ttl=60)
+        collect(cached_sources([source], cache))  # The engine logs source errors
+        assert cache.fresh("counting") is None
+        assert not cache._inflight
+
+    def test_early_stop_is_not_cached(self):
+        """A scrape closed by its consumer part-way leaves the cache alone."""
+        source, cache = CountingSource(listings=10), ScrapeCache(ttl=60)
+        spec, = cached_sources([source], cache, refresh=True)
+
+        stream = spec.scrape()
+        next(stream)
+        stream.close()
+
+        assert cache.fresh("counting") is None
+        assert not cache._inflight
+
+
+class TestSingleFlight:
+    """Tests for coalescing concurrent scrapes."""
+
+    def test_concurrent_threads_share_one_scrape(self):
+        source, cache = CountingSource(delay=0.05), ScrapeCache(ttl=60)
+        results = []
+
+        threads = [
+            threading.Thread(target=lambda: results.append(collect(cached_sources([source], cache))))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert source.scrapes == 1
+        assert all(len(result) == 3 for result in results)
+        assert cache.stats["coalesced"] == 4
+
+    def test_followers_retry_after_failed_scrape(self):
+        """When the shared scrape fails, the waiting caller scrapes on its own."""
+        source, cache = CountingSource(delay=0.05, error=RuntimeError("boom")), ScrapeCache(ttl=60)
+        results = []
+
+        threads = [
+            threading.Thread(target=lambda: results.append(collect(cached_sources([source], cache))))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert source.scrapes == 2
+        assert cache.stats["coalesced"] == 1
+        assert cache.fresh("counting") is None
+
+    def test_closed_leader_releases_followers(self):
+        """A leader closed part-way does not leave the source marked in flight."""
+        source, cache = CountingSource(), ScrapeCache(ttl=60)
+        spec, = cached_sources([source], cache)
+
+        stream = spec.scrape()
+        next(stream)
+        stream.close()
+
+        assert len(collect(cached_sources([source], cache))) == 3
+        assert source.scrapes == 2
+
+    def test_abandoned_leader_does_not_block_forever(self):
+        """Followers stop waiting for a scrape that never finishes."""
+        source, cache = CountingSource(), ScrapeCache(ttl=60, wait_timeout=0.05)
+        spec, = cached_sources([source], cache)
+        abandoned = spec.scrape()
+        next(abandoned)  # Leader suspended and never resumed or closed
+
+        waiting = cache._inflight["counting"][0]
+        assert len(collect(cached_sources([source], cache))) == 3
+        assert cache.stats["coalesced"] == 1
+        assert not waiting.is_set()
+
+        # Past the timeout the abandoned scrape no longer counts as in flight
+        assert len(collect(cached_sources([source], cache))) == 3
+        assert cache.stats["coalesced"] == 1
+        assert cache.fresh("counting") is not None
+
+    def test_concurrent_run_commands(self):
+        """Several /run-style pipelines at once scrape each source once."""
+        source, cache = CountingSource(delay=0.02), ScrapeCache(ttl=60)
+
+        async def run_command():
+            received = []
+
+            async def sink(item):
+                received.append(item)
+
+            await arun_pipeline(cached_sources([source], cache), stages=[], sink=sink)
+            return received
+
+        async def main():
+            return await asyncio.gather(*(run_command() for _ in range(10)))
+
+        results = asyncio.run(main())
+
+        assert source.scrapes == 1
+        assert all(len(received) == 3 for received in results)
+
+
+class ListingSource(CountingSource):
+    """Counting source whose listings have every field the filters check."""
+
+    def scrape(self, max_pages=None):
+        for ap in super().scrape(max_pages):
+            yield dict(ap, rooms=2, expensas=50000, address="Calle 7 entre 45 y 46")
+
+
+class TestManualSearch:
+    """Tests for /run on top of the bot's scrape cache."""
+
+    def test_run_is_served_from_the_scheduled_scrape(self, monkeypatch):
+        main = pytest.importorskip("main")
+        source = ListingSource(listings=3)
+        cache = ScrapeCache()
+        collect(cached_sources([source], cache, refresh=True))  # The scheduled check
+
+        monkeypatch.setattr(main, "scrape_cache", cache)
+        monkeypatch.setattr(main, "enabled_sources", lambda: [source])
+        monkeypatch.setattr(main, "load_sent", set)
+        monkeypatch.setattr(main, "load_fingerprints", FingerprintIndex)
+        monkeypatch.setattr(main, "save_sent", lambda sent: None)
+        monkeypatch.setattr(main, "get_user_config", lambda user_id: {"max_price": 500000, "min_rooms": 1, "max_expensas": 100000})
+        send = AsyncMock()
+        monkeypatch.setattr(main, "send_telegram_message", send)
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=1), message=SimpleNamespace(reply_text=AsyncMock()))
+
+        asyncio.run(main.run_manual_search(update, SimpleNamespace(bot=None)))
+
+        assert source.scrapes == 1
+        assert send.await_count == 1  # One listing per source
+
@@ -0,0 +1,95 @@
+"""Tests for the listing snapshot store and change events."""
+
+import snapshots
+from snapshots import SnapshotStore, is_price_drop
+from pipeline import iter_snapshot_diff, iter_price_drops
+
+
+def make_listing(listing_id, price=450000, source="argenprop"):
+    return {
+        "id": listing_id,
+        "price": price,
+        "rooms": 2,
+        "expensas": 70000,
+        "url": f"https://example.com/{listing_id}",
+        "source": source
+    }
+
+
+class TestSnapshotStore:
+    """Tests for SnapshotStore."""
+
+    def test_new_then_unchanged(self):
+        store = SnapshotStore()
+
+        assert store.update(make_listing("a"), now=1)["type"] == "new"
+        assert store.update(make_listing("a"), now=2) is None
+        assert store.snapshots["a"]["first_seen"] == 1
+        assert store.snapshots["a"]["last_seen"] == 2
+
+    def test_price_change(self):
+        store = SnapshotStore()
+        store.update(make_listing("a", price=450000))
+
+        event = store.update(make_listing("a", price=400000))
+
+        assert event["type"] == "changed"
+        assert event["previous"]["price"] == 450000
+        assert is_price_drop(event)
+        assert store.snapshots["a"]["price"] == 400000
+
+    def test_price_increase_is_not_drop(self):
+        store = SnapshotStore()
+        store.update(make_listing("a", price=450000))
+
+        assert not is_price_drop(store.update(make_listing("a", price=500000)))
+
+    def test_gone_only_for_polled_sources(self):
+        store = SnapshotStore()
+        store.update(make_listing("a"), now=0)
+        store.update(make_listing("z", source="zonaprop"), now=0)
+        later = (snapshots.GONE_AFTER_DAYS + 1) * 86400
+
+        events = store.gone(["argenprop"], now=later)
+
+        assert [event["listing"]["id"] for event in events] == ["a"]
+        assert "a" not in store.snapshots and "z" in store.snapshots
+
+    def test_round_trip_and_trim(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(snapshots, "SNAPSHOT_FILE", tmp_path / "snapshots.json")
+        monkeypatch.setattr(snapshots, "MAX_SNAPSHOTS", 2)
+        store = SnapshotStore()
+        for i, listing_id in enumerate(["a", "b", "c"]):
+            store.update(make_listing(listing_id), now=i)
+
+        snapshots.save_snapshots(store)
+
+        assert set(snapshots.load_snapshots().snapshots) == {"b", "c"}
+        assert set(store.snapshots) == {"b", "c"}  # Trimmed in memory too (daemon)
+
+
+class TestStages:
+    """Tests for the snapshot pipeline stages."""
+
+    def test_diff_passes_listings_through(self):
+        store = SnapshotStore()
+        store.update(make_listing("a", price=450000))
+        events = []
+
+        result = list(iter_snapshot_diff([make_listing("a", price=400000), make_listing("b")], store, events))
+
+        assert [ap["id"] for ap in result] == ["a", "b"]
+        assert [event["type"] for event in events] == ["changed", "new"]
+
+    def test_price_drops_are_opt_in(self, default_criteria):
+        store = SnapshotStore()
+        store.update(make_listing("a", price=450000))
+        events = [store.update(make_listing("a", price=400000))]
+        user_configs = [("1", default_criteria), ("2", dict(default_criteria, price_drops=True))]
+
+        result = list(iter_price_drops(events, user_configs))
+
+        assert len(result) == 1
+        ap, user_ids = result[0]
+        assert ap["previous_price"] == 450000
+        assert user_ids == ["2"]
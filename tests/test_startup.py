@@ -0,0 +1,54 @@
+"""Tests for cron_job cold start and the lazy source registry."""
+
+import pytest
+
+import preflight
+import sources
+
+
+@pytest.fixture(scope="module")
+def import_profile():
+    """Import profile of cron_job in a fresh interpreter."""
+    return preflight.measure_import_time("cron_job")
+
+
+class TestColdStart:
+    """
+    Cold start regression checks based on -X importtime.
+
+    Only which modules load is checked here; the wall-clock budget depends on
+    the machine and is checked by `python preflight.py --cold-start`.
+    """
+
+    def test_scraper_dependencies_not_imported(self, import_profile):
+        """requests, Playwright, bs4, lxml and scraper modules load only when needed."""
+        _, imported = import_profile
+        eager = [
+            name for name in imported
+            if any(name == lazy or name.startswith(lazy + ".") for lazy in preflight.LAZY_MODULES)
+        ]
+        assert eager == []
+
+
+class TestSourceRegistry:
+    """Tests for the lazy source registry."""
+
+    def test_lazy_scraper_defers_loading(self, monkeypatch):
+        """The scraper is only loaded when the factory is called."""
+        loaded = []
+        monkeypatch.setattr(sources, "load_scraper", lambda name: loaded.append(name) or (lambda **kw: iter([kw])))
+
+        factory = sources.lazy_scraper("argenprop", max_pages=2)
+        assert loaded == []
+
+        assert list(factory()) == [{"max_pages": 2}]
+        assert loaded == ["argenprop"]
+
+    def test_browser_sources_blocked_on_railway(self, monkeypatch):
+        """Browser sources are skipped on Railway, HTTP sources are not."""
+        monkeypatch.setenv("RAILWAY_ENVIRONMENT", "production")
+        assert sources.is_blocked_here("zonaprop") is True
+        assert sources.is_blocked_here("argenprop") is False
+
+        monkeypatch.delenv("RAILWAY_ENVIRONMENT")
+        assert sources.is_blocked_here("zonaprop") is False
@@ -139,3 +139,38 @@ class TestRoundTrip:
         # Third cycle - replace
         storage.save_sent({"url3"})
         assert storage.load_sent() == {"url3"}
+
+
+class TestWarmCache:
+    """Tests for the daemon's warm data cache."""
+
+    def test_reuses_value_until_file_changes(self, tmp_path):
+        """The loader runs again only after the file is modified."""
+        path = tmp_path / "data.json"
+        path.write_text("[1]")
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return json.loads(path.read_text())
+
+        cache = storage.WarmCache()
+        assert cache.get(path, loader) == [1]
+        assert cache.get(path, loader) == [1]
+        assert len(calls) == 1
+
+        path.write_text("[1, 2]")
+        assert cache.get(path, loader) == [1, 2]
+        assert len(calls) == 2
+
+    def test_mark_saved_skips_reload(self, tmp_path, monkeypatch):
+        """A value the process saved itself is not reloaded."""
+        db_file = tmp_path / "sent.json"
+        monkeypatch.setattr(storage, "DB_FILE", db_file)
+        cache = storage.WarmCache()
+
+        sent = cache.get(db_file, storage.load_sent)
+        sent.add("url1")
+        cache.mark_saved(db_file, storage.save_sent(sent))
+
+        assert cache.get(db_file, lambda: pytest.fail("reloaded")) == {"url1"}
@@ -0,0 +1,134 @@
+"""Tests for HTTP-first fetching with browser fallback."""
+
+import pytest
+
+import fake_sites
+from circuit_breaker import SourceBlocked
+from fake_sites import FakeSites, base_urls, make_listing, start_server
+from scrappers import browser_state, mercadolibre, tiered_fetch, zonaprop
+from scrappers.tiered_fetch import BROWSER, HTTP, NeedsBrowser, load_tiers, session_cookies, tiered_scrape
+
+BROWSER_LISTING = {"id": "zonaprop_browser", "price": 1, "source": "zonaprop"}
+
+
+@pytest.fixture(autouse=True)
+def state_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiered_fetch, "TIER_FILE", tmp_path / "fetch_tiers.json")
+    monkeypatch.setattr(browser_state, "STATE_DIR", tmp_path / "browser_state")
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Start the stand-in sites and point the browser sources at them; returns the browser tier's calls."""
+    servers = []
+    browser_calls = []
+
+    def fake_browser(func, max_pages, delay):
+        browser_calls.append(func.__name__)
+        yield BROWSER_LISTING
+
+    def _serve(**options):
+        server = start_server(FakeSites(churn=0, **options))
+        servers.append(server)
+        urls = base_urls(server)
+        for module, source in ((zonaprop, "zonaprop"), (mercadolibre, "mercadolibre")):
+            base = urls[fake_sites.BASE_URL_ENV[source]]
+            monkeypatch.setattr(module, "SEARCH_BASE", module.SEARCH_BASE.replace(module.BASE_URL, base, 1))
+            monkeypatch.setattr(module, "BASE_URL", base)
+            monkeypatch.setattr(module, "stream_in_browser_thread", fake_browser)
+        return browser_calls
+
+    yield _serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def listings_then_fail(count, error):
+    for n in range(count):
+        yield {"id": f"x_{n}"}
+    raise error
+
+
+class TestTieredScrape:
+    """Tests for tier selection and memory."""
+
+    def test_http_success_skips_browser(self):
+        browser = []
+        result = list(tiered_scrape("zonaprop", lambda: iter([{"id": "a"}]), lambda: browser.append(1) or iter([])))
+
+        assert result == [{"id": "a"}]
+        assert browser == []
+        assert load_tiers()["zonaprop"]["tier"] == HTTP
+
+    @pytest.mark.parametrize("error", [NeedsBrowser("no state"), SourceBlocked("HTTP 403")])
+    def test_unusable_http_escalates_to_browser(self, error):
+        result = list(tiered_scrape("zonaprop", lambda: listings_then_fail(0, error), lambda: iter([{"id": "b"}])))
+
+        assert result == [{"id": "b"}]
+        assert load_tiers()["zonaprop"]["tier"] == BROWSER
+
+    def test_partial_http_scrape_is_kept(self):
+        """Listings already yielded are not fetched again by the browser."""
+        browser = []
+        result = list(tiered_scrape(
+            "zonaprop", lambda: listings_then_fail(2, NeedsBrowser("page 2")), lambda: browser.append(1) or iter([])
+        ))
+
+        assert [ap["id"] for ap in result] == ["x_0", "x_1"]
+        assert browser == []
+
+    def test_browser_tier_is_remembered_until_retry_interval(self):
+        http_calls = []
+
+        def http():
+            http_calls.append(1)
+            raise NeedsBrowser("no state")
+
+        list(tiered_scrape("zonaprop", http, lambda: iter([{"id": "b"}]), now=1000))
+        list(tiered_scrape("zonaprop", http, lambda: iter([{"id": "b"}]), now=2000))
+        assert len(http_calls) == 1
+
+        list(tiered_scrape("zonaprop", http, lambda: iter([{"id": "b"}]), now=1000 + tiered_fetch.HTTP_RETRY_INTERVAL))
+        assert len(http_calls) == 2
+
+    def test_browser_block_is_raised(self):
+        with pytest.raises(SourceBlocked):
+            list(tiered_scrape(
+                "zonaprop", lambda: listings_then_fail(0, NeedsBrowser("x")), lambda: listings_then_fail(0, SourceBlocked("captcha"))
+            ))
+
+    def test_session_cookies_match_domain(self):
+        browser_state.save_state("zonaprop", {"cookies": [
+            {"name": "cf_clearance", "value": "1", "domain": ".zonaprop.com.ar", "expires": -1},
+            {"name": "other", "value": "2", "domain": "example.com", "expires": -1},
+        ]})
+        assert session_cookies("zonaprop", "https://www.zonaprop.com.ar/x.html") == {"cf_clearance": "1"}
+        assert session_cookies("mercadolibre", "https://www.zonaprop.com.ar/x.html") == {}
+
+
+class TestSources:
+    """End-to-end tests of the browser sources against the stand-in sites."""
+
+    def test_zonaprop_over_http(self, serve):
+        browser_calls = serve()
+        listings = list(zonaprop.iter_zonaprop(max_pages=2, delay=0))
+
+        newest = make_listing("zonaprop", fake_sites.INITIAL_LISTINGS - 1)
+        assert len(listings) == 2 * fake_sites.PER_PAGE["zonaprop"]
+        assert listings[0]["id"] == f"zonaprop_{newest['id']}"
+        assert listings[0]["price"] == newest["price"]
+        assert browser_calls == []
+
+    def test_mercadolibre_over_http(self, serve):
+        browser_calls = serve()
+        listings = list(mercadolibre.iter_mercadolibre(max_pages=1, delay=0))
+
+        assert len(listings) == fake_sites.PER_PAGE["mercadolibre"]
+        assert browser_calls == []
+
+    @pytest.mark.parametrize("options", [{"embedded_state": False}, {"block_rate": 1.0}, {"error_rate": 1.0}])
+    def test_falls_back_to_browser(self, serve, options):
+        browser_calls = serve(**options)
+        assert list(zonaprop.iter_zonaprop(max_pages=1, delay=0)) == [BROWSER_LISTING]
+        assert browser_calls == ["_scrape_zonaprop_sync"]
@@ -0,0 +1,137 @@
+"""Tests for the SQLite user store."""
+
+import json
+
+import pytest
+
+import user_config
+import user_store
+from filters import matches
+from load_test import generate_listings, generate_user_configs
+from pipeline import iter_indexed_matches, iter_matches
+from user_config import DEFAULT_CONFIG
+from user_store import UserStore
+
+
+@pytest.fixture
+def store():
+    store = UserStore(":memory:", defaults=DEFAULT_CONFIG)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def shared_store(tmp_path, monkeypatch):
+    """Point user_config at a fresh database file."""
+    monkeypatch.setattr(user_store, "USER_DB", tmp_path / "users.db")
+    monkeypatch.setattr(user_config, "CONFIG_FILE", tmp_path / "user_configs.json")
+    monkeypatch.setattr(user_config, "_store", None)
+    monkeypatch.delenv("USER_CONFIGS", raising=False)
+    yield tmp_path
+    if user_config._store is not None:
+        user_config._store.close()
+
+
+class TestUserStore:
+    """Tests for rows, upserts and lookups."""
+
+    def test_new_user_gets_defaults(self, store):
+        """Creating a user fills in the default criteria."""
+        store.set(1, "active", True)
+        config = store.get(1)
+        assert config["max_price"] == DEFAULT_CONFIG["max_price"]
+        assert config["active"] is True
+        assert config["price_drops"] is False
+
+    def test_set_keeps_other_values(self, store):
+        """Setting one key leaves the rest of the row alone."""
+        store.set(1, "max_price", 700000)
+        store.set(1, "min_rooms", 2)
+        config = store.get(1)
+        assert config["max_price"] == 700000
+        assert config["min_rooms"] == 2
+
+    def test_extra_keys_are_merged(self, store):
+        """Keys without a column are kept as JSON."""
+        store.set(1, "language", "es")
+        store.set(1, "nickname", "Ana")
+        config = store.get(1)
+        assert config["language"] == "es"
+        assert config["nickname"] == "Ana"
+
+    def test_unknown_user(self, store):
+        assert store.get(404) is None
+
+    def test_active_configs(self, store):
+        """Only active users are returned, in registration order."""
+        store.set(1, "active", True)
+        store.set(2, "active", False)
+        store.set(3, "active", True)
+        assert [user_id for user_id, _ in store.active_configs()] == ["1", "3"]
+        assert store.user_ids() == ["1", "2", "3"]
+
+    def test_import_configs(self, store):
+        """A config dict is imported in one go, with defaults filled in."""
+        store.import_configs({"1": {"max_price": 400000}, "2": {"active": False}})
+        assert len(store) == 2
+        assert store.get("1")["max_price"] == 400000
+        assert store.get("2")["min_rooms"] == DEFAULT_CONFIG["min_rooms"]
+
+
+class TestMatching:
+    """SQL matching must agree with filters.matches."""
+
+    @pytest.fixture
+    def loaded(self, store):
+        user_configs = generate_user_configs(200)
+        store.import_configs(dict(user_configs))
+        return store, store.active_configs()
+
+    def test_range_query_matches_filters(self, loaded):
+        store, user_configs = loaded
+        for ap in generate_listings(150):
+            expected = [user_id for user_id, config in user_configs if matches(ap, config)]
+            assert store.matching_user_ids(ap) == expected
+
+    def test_batch_join_matches_range_query(self, loaded):
+        store, _ = loaded
+        listings = generate_listings(150)
+        batch = store.match_batch(listings)
+        for ap in listings:
+            assert batch.get(ap["id"], []) == store.matching_user_ids(ap)
+
+    def test_stage_matches_predicate_stage(self, loaded):
+        """iter_indexed_matches yields what iter_matches does, limits included."""
+        store, user_configs = loaded
+        listings = generate_listings(100)
+        expected = list(iter_matches(listings, user_configs, per_user_source_limit=2))
+        assert list(iter_indexed_matches(listings, store, per_user_source_limit=2)) == expected
+
+    def test_no_limits(self, store):
+        """NULL min_price / max_rooms mean no limit."""
+        store.upsert(1, {"min_price": None, "max_rooms": None, "max_price": 900000})
+        ap = {"id": "a", "price": 50000, "rooms": 6, "expensas": None, "address": ""}
+        assert store.matching_user_ids(ap) == ["1"]
+
+
+class TestUserConfig:
+    """Tests for the user_config API on top of the store."""
+
+    def test_roundtrip(self, shared_store):
+        user_config.set_user_config(42, "max_price", 300000)
+        assert user_config.get_user_config(42)["max_price"] == 300000
+        assert user_config.get_all_user_ids() == ["42"]
+
+    def test_unknown_user_gets_defaults(self, shared_store):
+        assert user_config.get_user_config(7) == DEFAULT_CONFIG
+
+    def test_migrates_legacy_json(self, shared_store):
+        """user_configs.json is imported into a new database."""
+        (shared_store / "user_configs.json").write_text(json.dumps({"5": {"max_price": 250000}}))
+        assert user_config.get_user_config(5)["max_price"] == 250000
+
+    def test_env_configs(self, shared_store, monkeypatch):
+        """USER_CONFIGS is applied on startup."""
+        monkeypatch.setenv("USER_CONFIGS", json.dumps({"9": {"min_rooms": 3, "active": True}}))
+        assert [user_id for user_id, _ in user_config.get_active_user_configs()] == ["9"]
+        assert user_config.get_user_config(9)["min_rooms"] == 3
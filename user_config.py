@@ -1,11 +1,23 @@
+"""
+Per-user search configuration.
+
+Users live in a SQLite store (see user_store.py), one row per user, so
+lookups read one row and changes are single-row upserts. On first use the
+store imports the legacy user_configs.json (if the database is new) and
+the USER_CONFIGS env var (Railway), which is applied on every start.
+"""
+
 import json
 import logging
 import os
+import threading
 from pathlib import Path
 
+from filters import compile_criteria, rejections
+
 logger = logging.getLogger(__name__)
 
-CONFIG_FILE = Path("user_configs.json")
+CONFIG_FILE = Path("user_configs.json")  # Legacy JSON store, imported once
 
 DEFAULT_CONFIG = {
     "min_price": 100000,
@@ -15,61 +27,141 @@ DEFAULT_CONFIG = {
     "max_expensas": 100000
 }
 
+_store = None
+_store_lock = threading.Lock()
 
-def load_all_configs():
-    """Load all user configurations from disk or environment variable."""
-    # First try environment variable (for Railway deployment)
-    env_configs = os.getenv("USER_CONFIGS")
-    if env_configs:
-        try:
-            return json.loads(env_configs)
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse USER_CONFIGS env var: {e}")
 
-    # Fall back to file (for local development)
+def get_store(import_env=True):
+    """
+    Get the shared user store, opening (and seeding) it on first use.
+
+    Args:
+        import_env: Apply the USER_CONFIGS env var when the store is opened.
+            Notifier shards pass False: their parent already applied it.
+
+    Returns:
+        user_store.UserStore: Store backed by user_store.USER_DB
+    """
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            from user_store import UserStore, USER_DB  # sqlite3 only loaded when users are needed
+
+            is_new = not USER_DB.exists()
+            store = UserStore(USER_DB, defaults=DEFAULT_CONFIG)
+            if is_new:
+                _import_legacy_file(store)
+            if import_env:
+                _import_env(store)
+            _store = store
+        return _store
+
+
+def _import_legacy_file(store):
+    """Migrate user_configs.json into a new store."""
     try:
         if CONFIG_FILE.exists():
-            content = CONFIG_FILE.read_text(encoding='utf-8')
-            return json.loads(content)
-        return {}
-    except (json.JSONDecodeError, Exception) as e:
+            configs = json.loads(CONFIG_FILE.read_text(encoding='utf-8'))
+            store.import_configs(configs)
+            logger.info(f"Imported {len(configs)} users from {CONFIG_FILE}")
+    except Exception as e:
+        logger.error(f"Failed to import {CONFIG_FILE}: {e}")
+
+
+def _import_env(store):
+    """Apply the USER_CONFIGS env var (for Railway deployment)."""
+    env_configs = os.getenv("USER_CONFIGS")
+    if not env_configs:
+        return
+    try:
+        store.import_configs(json.loads(env_configs))
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.error(f"Failed to parse USER_CONFIGS env var: {e}")
+
+
+def load_all_configs():
+    """Load all user configurations as {user_id: config}."""
+    try:
+        return get_store().all_configs()
+    except Exception as e:
         logger.error(f"Failed to load user configs: {e}")
         return {}
 
 
 def save_all_configs(configs):
-    """Save all user configurations to disk."""
+    """Save user configurations ({user_id: config}), upserting each user."""
     try:
-        CONFIG_FILE.write_text(
-            json.dumps(configs, indent=2, ensure_ascii=False),
-            encoding='utf-8'
-        )
+        get_store().import_configs(configs)
     except Exception as e:
         logger.error(f"Failed to save user configs: {e}")
 
 
 def get_user_config(user_id):
     """Get configuration for a specific user, returning defaults if not set."""
-    configs = load_all_configs()
-    user_id_str = str(user_id)
-    if user_id_str in configs:
-        config = DEFAULT_CONFIG.copy()
-        config.update(configs[user_id_str])
-        return config
-    return DEFAULT_CONFIG.copy()
+    config = DEFAULT_CONFIG.copy()
+    try:
+        stored = get_store().get(user_id)
+    except Exception as e:
+        logger.error(f"Failed to load config for {user_id}: {e}")
+        stored = None
+    if stored is not None:
+        config.update(stored)
+    return config
 
 
 def set_user_config(user_id, key, value):
     """Set a specific configuration value for a user."""
-    configs = load_all_configs()
-    user_id_str = str(user_id)
-    if user_id_str not in configs:
-        configs[user_id_str] = {}
-    configs[user_id_str][key] = value
-    save_all_configs(configs)
+    try:
+        get_store().set(user_id, key, value)
+    except Exception as e:
+        logger.error(f"Failed to save config for {user_id}: {e}")
 
 
 def get_all_user_ids():
     """Get all user IDs that have configurations."""
-    configs = load_all_configs()
-    return list(configs.keys())
+    try:
+        return get_store().user_ids()
+    except Exception as e:
+        logger.error(f"Failed to load user IDs: {e}")
+        return []
+
+
+def get_active_user_configs():
+    """Get (user_id, config) pairs for every active user (one query)."""
+    try:
+        return get_store().active_configs()
+    except Exception as e:
+        logger.error(f"Failed to load active users: {e}")
+        return []
+
+
+# Compiled predicates: user_id -> (config version, rejections at compile time, predicate),
+# least recently compiled first. The oldest are dropped past MAX_CACHED_PREDICATES.
+MAX_CACHED_PREDICATES = 1024
+_predicates = {}
+_predicates_lock = threading.Lock()
+
+
+def get_user_predicate(user_id, config):
+    """
+    Get the compiled matching predicate for a user's config.
+
+    The predicate is compiled once per config version and recompiled when
+    the observed rejection counts have doubled, so its check order follows
+    the current listings.
+    """
+    version = json.dumps(config, sort_keys=True, default=str)
+    observed = sum(rejections.values())
+    with _predicates_lock:
+        cached = _predicates.get(str(user_id))
+    if cached is not None and cached[0] == version and observed < 2 * cached[1] + 100:
+        return cached[2]
+
+    predicate = compile_criteria(config)
+    with _predicates_lock:
+        _predicates.pop(str(user_id), None)
+        _predicates[str(user_id)] = (version, observed, predicate)
+        while len(_predicates) > MAX_CACHED_PREDICATES:
+            del _predicates[next(iter(_predicates))]
+    return predicate
@@ -0,0 +1,238 @@
+"""
+SQLite-backed user store.
+
+One row per user with typed criteria columns, replacing the single
+user_configs.json blob that was re-read on every lookup and rewritten on
+every change. Writes are single-row upserts, and the range columns are
+indexed so matching can be pushed down to SQL:
+
+- matching_user_ids(ap): range query for one listing (streaming pipeline)
+- match_batch(listings): join of a temp table of listings against users
+
+Columns hold the effective criteria (defaults are filled in when a user is
+created). NULL min_price / max_rooms mean "no limit", like a missing key
+in filters.matches. Keys without a column are kept as JSON in ``extra``.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+
+from filters import location_ok
+
+logger = logging.getLogger(__name__)
+
+USER_DB = Path("users.db")
+
+# Criteria columns (INTEGER) and flag columns (stored as 0/1)
+CRITERIA_COLUMNS = ("min_price", "max_price", "min_rooms", "max_rooms", "max_expensas")
+FLAG_COLUMNS = ("active", "price_drops")
+COLUMNS = CRITERIA_COLUMNS + FLAG_COLUMNS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id      TEXT PRIMARY KEY,
+    min_price    INTEGER,
+    max_price    INTEGER NOT NULL,
+    min_rooms    INTEGER NOT NULL,
+    max_rooms    INTEGER,
+    max_expensas INTEGER NOT NULL,
+    active       INTEGER NOT NULL DEFAULT 1,
+    price_drops  INTEGER NOT NULL DEFAULT 0,
+    extra        TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS users_active_max_price ON users (active, max_price);
+CREATE INDEX IF NOT EXISTS users_min_price ON users (min_price);
+CREATE INDEX IF NOT EXISTS users_rooms ON users (min_rooms, max_rooms);
+CREATE INDEX IF NOT EXISTS users_max_expensas ON users (max_expensas);
+"""
+
+# Listing -> matching active users. Location is checked in Python once per
+# listing (it does not depend on the user).
+_MATCH_SQL = """
+SELECT user_id FROM users
+WHERE active = 1
+  AND max_price >= :price AND (min_price IS NULL OR min_price <= :price)
+  AND min_rooms <= :rooms AND (max_rooms IS NULL OR max_rooms >= :rooms)
+  AND (:expensas IS NULL OR max_expensas >= :expensas)
+ORDER BY rowid
+"""
+
+_MATCH_BATCH_SQL = """
+SELECT l.listing_id, u.user_id FROM batch_listings l
+JOIN users u
+  ON u.active = 1
+ AND u.max_price >= l.price AND (u.min_price IS NULL OR u.min_price <= l.price)
+ AND u.min_rooms <= l.rooms AND (u.max_rooms IS NULL OR u.max_rooms >= l.rooms)
+ AND (l.expensas IS NULL OR u.max_expensas >= l.expensas)
+ORDER BY l.position, u.rowid
+"""
+
+
+class UserStore:
+    """
+    Users and their search criteria in a SQLite database.
+
+    The connection is shared between threads (the bot runs store calls in
+    worker threads), so every call holds the store's lock.
+
+    Args:
+        path: Database file (":memory:" for a throwaway store)
+        defaults: Criteria given to users when they are created
+    """
+
+    def __init__(self, path=USER_DB, defaults=None):
+        self.defaults = dict(defaults or {})
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def _row_to_config(self, row):
+        config = dict(json.loads(row["extra"]))
+        for column in COLUMNS:
+            value = row[column]
+            config[column] = bool(value) if column in FLAG_COLUMNS else value
+        return config
+
+    def get(self, user_id):
+        """
+        Get a user's config.
+
+        Returns:
+            dict: Criteria, flags and extra keys, or None for unknown users
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+        return self._row_to_config(row) if row is not None else None
+
+    def _upsert_statement(self, user_id, values):
+        """Build the INSERT ... ON CONFLICT statement setting only ``values``."""
+        columns = {key: value for key, value in values.items() if key in COLUMNS}
+        extra = {key: value for key, value in values.items() if key not in COLUMNS}
+        for flag in FLAG_COLUMNS:
+            if flag in columns:
+                columns[flag] = int(bool(columns[flag]))
+
+        insert = {column: self.defaults.get(column) for column in CRITERIA_COLUMNS}
+        insert.update(columns)
+        names = ["user_id", *insert, "extra"]
+        params = [str(user_id), *insert.values(), json.dumps(extra, ensure_ascii=False)]
+
+        updates = [f"{column} = excluded.{column}" for column in columns]
+        if extra:
+            # Merge new extra keys into the stored ones
+            updates.append("extra = json_patch(users.extra, excluded.extra)")
+        conflict = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+
+        sql = (
+            f"INSERT INTO users ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+            f"ON CONFLICT(user_id) {conflict}"
+        )
+        return sql, params
+
+    def upsert(self, user_id, values):
+        """
+        Create or update one user, setting only the given keys.
+
+        Args:
+            user_id: Telegram user/chat ID
+            values: Dict of config keys to set (others keep their value,
+                or the defaults for a new user)
+        """
+        sql, params = self._upsert_statement(user_id, values)
+        with self._lock:
+            self._conn.execute(sql, params)
+
+    def set(self, user_id, key, value):
+        """Set one config value for a user (single-row upsert)."""
+        self.upsert(user_id, {key: value})
+
+    def user_ids(self):
+        """Get every registered user ID, in registration order."""
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM users ORDER BY rowid").fetchall()
+        return [row["user_id"] for row in rows]
+
+    def all_configs(self):
+        """Get {user_id: config} for every user."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM users ORDER BY rowid").fetchall()
+        return {row["user_id"]: self._row_to_config(row) for row in rows}
+
+    def active_configs(self):
+        """Get (user_id, config) pairs for active users."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM users WHERE active = 1 ORDER BY rowid").fetchall()
+        return [(row["user_id"], self._row_to_config(row)) for row in rows]
+
+    def import_configs(self, configs):
+        """
+        Upsert users from a {user_id: config} dict in one transaction.
+
+        Used for the USER_CONFIGS env var and for migrating user_configs.json.
+        """
+        statements = [self._upsert_statement(user_id, config) for user_id, config in configs.items()]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def matching_user_ids(self, ap):
+        """
+        Get the active users whose criteria a listing matches.
+
+        Same result as filters.matches for each user, as one indexed query.
+
+        Returns:
+            list: Matching user IDs, in registration order
+        """
+        if ap.get("price") is None or ap.get("rooms") is None:
+            return []
+        if not location_ok(ap.get("address", "")):
+            return []
+        params = {"price": ap["price"], "rooms": ap["rooms"], "expensas": ap.get("expensas")}
+        with self._lock:
+            rows = self._conn.execute(_MATCH_SQL, params).fetchall()
+        return [row["user_id"] for row in rows]
+
+    def match_batch(self, listings):
+        """
+        Match many listings at once with a join against a temp table.
+
+        Returns:
+            dict: Listing ID -> matching user IDs (only listings with matches)
+        """
+        batch = [
+            (position, ap["id"], ap["price"], ap["rooms"], ap.get("expensas"))
+            for position, ap in enumerate(listings)
+            if ap.get("price") is not None and ap.get("rooms") is not None
+            and location_ok(ap.get("address", ""))
+        ]
+        result = {}
+        with self._lock:
+            self._conn.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS batch_listings "
+                "(position INTEGER, listing_id TEXT, price INTEGER, rooms INTEGER, expensas INTEGER)"
+            )
+            self._conn.execute("DELETE FROM batch_listings")
+            self._conn.executemany("INSERT INTO batch_listings VALUES (?, ?, ?, ?, ?)", batch)
+            for row in self._conn.execute(_MATCH_BATCH_SQL):
+                result.setdefault(row["listing_id"], []).append(row["user_id"])
+            self._conn.execute("DELETE FROM batch_listings")
+        return result